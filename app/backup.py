@@ -5,59 +5,82 @@ Authors:  Yoshi Fu
 Date:     July 24th 2022
 
 Summary:
-- Backup the records of the trampeltier Discord server.
-- [TODO]
+- Restore the records of a Discord server from a JSON data file.
+- Participants, admins and history are each imported in one transaction.
+- Example data file: database/trampeltier.json
+
+Data file format:
+    {
+        "server": <server id>,
+        "participants": [{"id": <user id>, "name": <name>}, ...],
+        "admins": [<user id>, ...],
+        "history": [{"user": <user id>, "date": "YYYY-MM-DD"}, ...]
+    }
 """
 
+import argparse
 import asyncio
+import json
 import os
+import time
 
 from dotenv import load_dotenv
 
 import minion_meister
+import tools
 
 load_dotenv()
 DB_FILE = os.getenv('DATABASE_FILE')
 
 
-MM = minion_meister.MinionMeister(DB_FILE)
+def argparser():
+    """ Check for commandline arguments. """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_file', help="JSON file with the records.")
+    args = parser.parse_args()
+    return args
 
 
-async def add_participants(server_id: int):
-    await MM.add_user(server_id, 284044128449462272, 'Jord')
-    await MM.add_user(server_id, 174470439848902657, 'Reno')
-    await MM.add_user(server_id, 171666048196673536, 'Wouter')
-    await MM.add_user(server_id, 400140550503923713, 'Luke')
-    await MM.add_user(server_id, 172703726123876353, 'Joppe')
-    await MM.add_user(server_id, 476081297777754112, 'Mark')
-    await MM.add_user(server_id, 285380929126531072, 'Yoshi')
-    await MM.add_user(server_id, 196556170897522688, 'Luka')
-    await MM.add_user(server_id, 510416926946754580, 'Evert')
-    await MM.add_user(server_id, 175728174712356864, 'Stefan')
+async def restore(MM, data: dict) -> dict:
+    """ Import the records of one server into the database.
 
+        Parameters:
+            :MM: MinionMeister, required
+                MinionMeister of the database to restore into.
+            :data: dict, required
+                records of the server (see the data file format).
 
-async def add_admins(server_id: int):
-    await MM.admin_user(server_id, 172703726123876353, 'Joppe')
-    await MM.admin_user(server_id, 284044128449462272, 'Jord')
+        Returns:
+            :added: dict
+                amount of participants, admins and history records added.
+    """
+    server_id = data['server']
+    participants = ((user['id'], user['name'])
+                    for user in data.get('participants', []))
+    history = ((record['user'], record['date'])
+               for record in data.get('history', []))
 
-
-async def insert_records(server_id: int):
-    await MM.insert_history(server_id, 172703726123876353, '2022-05-28')
-    await MM.insert_history(server_id, 476081297777754112, '2022-06-04')
-    await MM.insert_history(server_id, 285380929126531072, '2022-06-11')
-    await MM.insert_history(server_id, 196556170897522688, '2022-06-18')
-    await MM.insert_history(server_id, 510416926946754580, '2022-06-25')
-    await MM.insert_history(server_id, 175728174712356864, '2022-07-02')
-    await MM.insert_history(server_id, 174470439848902657, '2022-07-09')
-    await MM.insert_history(server_id, 510416926946754580, '2022-07-16')
-    await MM.insert_history(server_id, 171666048196673536, '2022-07-23')
+    return {
+        'participants': await MM.bulk_add_users(server_id, participants),
+        'admins': await MM.bulk_admin_users(server_id,
+                                            data.get('admins', [])),
+        'history': await MM.bulk_insert_history(server_id, history),
+    }
 
 
 async def main():
-    server_id = 431135841671315467
-    await add_participants(server_id)
-    await add_admins(server_id)
-    await insert_records(server_id)
+    args = argparser()
+    with open(args.data_file) as data_file:
+        data = json.load(data_file)
+
+    start = time.perf_counter()
+    MM = minion_meister.MinionMeister(DB_FILE)
+    added = await restore(MM, data)
+    await tools.close_pools()
+
+    print(f"restored {added['participants']} participants, "
+          f"{added['admins']} admins and {added['history']} history records "
+          f"in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_concurrency.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Mixed !list / !roll traffic against a rollback journal and against WAL.
+- Report read latency, so stalls of reads behind writes become visible.
+- !list runs with an empty guild cache, so every read hits SQLite.
+- Run from the app directory: python3 -m benchmarks.bench_concurrency
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import minion_meister
+import tools
+from benchmarks.common import create_database, report, seed_guilds
+
+# The only guild that seed_guilds adds.
+SERVER_ID = 1
+
+
+async def run(journal_mode: str, readers: int, writers: int,
+              duration: float, participants: int, interval: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'bench.db')
+        create_database(db_filename)
+        seed_guilds(db_filename, 1, participants, 0, admins=0,
+                    journal_mode=journal_mode)
+        tools.JOURNAL_MODE = journal_mode
+
+        mm = minion_meister.MinionMeister(db_filename)
+        await mm.show_participants(SERVER_ID)
+        reads, writes = [], []
+        stop = time.perf_counter() + duration
+
+        async def list_participants():
+            while time.perf_counter() < stop:
+                mm.cache.clear()
+                start = time.perf_counter()
+                await mm.show_participants(SERVER_ID)
+                reads.append(time.perf_counter() - start)
+                await asyncio.sleep(interval)
+
+        async def roll():
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                await mm.select_winner(SERVER_ID)
+                writes.append(time.perf_counter() - start)
+                await asyncio.sleep(interval)
+
+        await asyncio.gather(*(list_participants() for _ in range(readers)),
+                             *(roll() for _ in range(writers)))
+        await tools.close_pools()
+
+        report(f'{journal_mode} !list', reads)
+        report(f'{journal_mode} !roll', writes)
+
+
+async def main(args):
+    for journal_mode in ('DELETE', 'WAL'):
+        await run(journal_mode, args.readers, args.writers, args.duration,
+                  args.participants, args.interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--readers', type=int, default=4,
+                        help="Amount of concurrent !list loops.")
+    parser.add_argument('-w', '--writers', type=int, default=2,
+                        help="Amount of concurrent !roll loops.")
+    parser.add_argument('-d', '--duration', type=float, default=5.0,
+                        help="Seconds to run every journal mode.")
+    parser.add_argument('-p', '--participants', type=int, default=50,
+                        help="Amount of participants in the guild.")
+    parser.add_argument('-i', '--interval', type=float, default=0.002,
+                        help="Seconds every loop waits between commands.")
+    asyncio.run(main(parser.parse_args()))
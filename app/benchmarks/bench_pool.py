@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_pool.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Compare per-query latency of connect-per-query against the shared pool.
+- Run from the app directory: python3 -m benchmarks.bench_pool
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+from aiosqlite import connect
+
+import minion_meister
+import statements
+import tools
+from benchmarks.common import create_database, measure, report
+
+SERVER_ID = 1
+
+
+async def connect_per_query(db_filename: str, sql: str, values) -> list:
+    """ The old read_from_db: one fresh connection for every query. """
+    con = await connect(db_filename)
+    cur = await con.cursor()
+    await cur.execute(sql, values)
+    await con.commit()
+    res = await cur.fetchall()
+    await cur.close()
+    await con.close()
+    return res
+
+
+async def main(iterations: int):
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'bench.db')
+        create_database(db_filename)
+
+        mm = minion_meister.MinionMeister(db_filename)
+        for user_id in range(100):
+            await mm.add_user(SERVER_ID, user_id, f'user{user_id}')
+
+        sql = ("SELECT EXISTS("
+               "SELECT 1 FROM users WHERE server = (?) AND id = (?))")
+        values = (SERVER_ID, 50)
+
+        report('connect-per-query', await measure(
+            lambda: connect_per_query(db_filename, sql, values), iterations))
+        report('pooled read_from_db', await measure(
+            lambda: tools.read_from_db(db_filename, sql, values), iterations))
+        # The storage pool itself, MinionMeister.is_user would be answered
+        # from the guild cache.
+        pool = mm.storage.pools[0]
+        report('pooled storage read', await measure(
+            lambda: pool.read(statements.IN_USERS, values), iterations))
+
+        await tools.close_pools()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', type=int, default=1000,
+                        help="Amount of queries per measurement.")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_scheduler.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Schedule a weekly roll in N guilds at random times on the memory engine.
+- Load the schedules into the timer heap and replay one week of rolls on a
+  simulated clock.
+- Report the load time, the wakeups of the timer against the rolls and the
+  latency of every wakeup.
+- Run from the app directory: python3 -m benchmarks.bench_scheduler
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import minion_meister
+import scheduler
+from benchmarks.common import report
+
+# Monday 2022-07-25 00:00 UTC.
+START = scheduler.timestamp('2022-07-25 00:00')
+WEEK = 7 * 24 * 3600
+
+
+async def announce(channel_id: int, message: str) -> None:
+    pass
+
+
+async def main(args):
+    mm = minion_meister.MinionMeister(':bench_scheduler:', engine='memory')
+    rng = random.Random(0)
+    for server_id in range(1, args.guilds + 1):
+        await mm.bulk_add_users(server_id, [(1, 'alice'), (2, 'bob')])
+        time_ = f'{rng.randrange(24):02}:{rng.randrange(60):02}'
+        weekday = rng.randrange(7)
+        await mm.set_schedule(server_id, server_id, weekday, time_, None,
+                              scheduler.next_run(weekday, time_, START))
+
+    timer = scheduler.Scheduler(mm, announce, now=lambda: START)
+    start = time.perf_counter()
+    await timer.load()
+    print(f'loaded {len(timer)} schedules in '
+          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+    # Every iteration is one wakeup of the running task.
+    wakeups = []
+    rolls = 0
+    due = timer.next_due()
+    while due is not None and due < START + WEEK:
+        start = time.perf_counter()
+        rolls += await timer.run_due(due)
+        wakeups.append(time.perf_counter() - start)
+        due = timer.next_due()
+    report('wakeup', wakeups)
+    print(f'{rolls} rolls in {len(wakeups)} wakeups')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-g', '--guilds', type=int, default=100000,
+                        help="Amount of guilds with a schedule.")
+    asyncio.run(main(parser.parse_args()))
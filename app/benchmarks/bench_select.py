@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_select.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Compare ORDER BY RANDOM() with the in-memory Sampler for winner selection.
+- Measure guilds with 10, 1k and 100k participants.
+- Run from the app directory: python3 -m benchmarks.bench_select
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+import minion_meister
+import tools
+from benchmarks.common import create_database, measure, report, seed_guilds
+
+GUILD_SIZES = (10, 1000, 100000)
+
+ORDER_BY_RANDOM = (
+    "SELECT id "
+    "FROM users "
+    "WHERE server = (?) "
+    "ORDER BY RANDOM() "
+    "LIMIT 1"
+)
+
+
+async def main(iterations: int):
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'bench.db')
+        create_database(db_filename)
+        # One guild per size, the size is the guild id.
+        for size in GUILD_SIZES:
+            seed_guilds(db_filename, 1, size, 0, admins=0, first=size)
+
+        mm = minion_meister.MinionMeister(db_filename)
+        for server_id in GUILD_SIZES:
+            state = await mm._guild_(server_id)
+
+            async def order_by_random():
+                await mm.storage.pools[0].read(ORDER_BY_RANDOM, (server_id,))
+
+            async def sampler():
+                state.sampler.choice()
+
+            async def select_winner():
+                await mm.select_winner(server_id)
+
+            report(f'ORDER BY RANDOM() n={server_id}',
+                   await measure(order_by_random, iterations))
+            report(f'Sampler.choice n={server_id}',
+                   await measure(sampler, iterations))
+            report(f'select_winner n={server_id}',
+                   await measure(select_winner, iterations))
+
+        await tools.close_pools()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', type=int, default=200,
+                        help="Amount of selections per measurement.")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_shards.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Concurrent !roll and insert_history traffic across many guilds against
+  1, 2, 4 and 8 shard files.
+- Report write latency and write throughput per amount of shards, so the
+  gain of committing the shards in parallel becomes visible.
+- Run from the app directory: python3 -m benchmarks.bench_shards
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+import minion_meister
+import sharding
+import tools
+from benchmarks.common import report, seed_guilds
+
+FIRST_DAY = date(2100, 1, 1).toordinal()
+
+
+async def run(shards: int, guilds: int, participants: int, writers: int,
+              duration: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'bench.db')
+        sharding.create_shards(db_filename, shards)
+        router = sharding.ShardRouter(
+            sharding.shard_filenames(db_filename, shards))
+        for filename in router.filenames:
+            seed_guilds(filename, guilds, participants, 0)
+
+        mm = minion_meister.MinionMeister(db_filename, shards)
+        rng = random.Random(shards)
+        writes = []
+        day = 0
+        stop = time.perf_counter() + duration
+
+        async def write():
+            nonlocal day
+            while time.perf_counter() < stop:
+                server_id = rng.randint(1, guilds)
+                day += 1
+                start = time.perf_counter()
+                if day % 2:
+                    await mm.select_winner(server_id)
+                else:
+                    await mm.insert_history(
+                        server_id, rng.randint(1, participants),
+                        date.fromordinal(FIRST_DAY + day).isoformat())
+                writes.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(write() for _ in range(writers)))
+        elapsed = time.perf_counter() - start
+        await tools.close_pools()
+
+        report(f'{shards} shards writes', writes)
+        print(f"{'':<32} {len(writes) / elapsed:.0f} writes/s")
+
+
+async def main(args):
+    for shards in args.shards:
+        await run(shards, args.guilds, args.participants, args.writers,
+                  args.duration)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--shards', type=int, nargs='*',
+                        default=[1, 2, 4, 8],
+                        help="Amounts of shards to compare.")
+    parser.add_argument('-g', '--guilds', type=int, default=1000,
+                        help="Amount of guilds.")
+    parser.add_argument('-p', '--participants', type=int, default=20,
+                        help="Amount of participants per guild.")
+    parser.add_argument('-w', '--writers', type=int, default=64,
+                        help="Amount of concurrent write loops.")
+    parser.add_argument('-d', '--duration', type=float, default=5.0,
+                        help="Seconds to run every amount of shards.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_suite.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Measure every public MinionMeister method and tools.read_from_db /
+  push_to_db on a synthetic database of N guilds x M participants x K
+  history records.
+- Report latency percentiles and throughput per operation.
+- Measure the SQLite or the memory storage engine.
+- Write the results as JSON and compare them with a previous run.
+- Run from the app directory: python3 -m benchmarks.bench_suite
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date
+
+import error
+import minion_meister
+import tools
+from benchmarks.common import (LAST_DAY, create_database, seed_guilds,
+                               summarise)
+
+FIRST_NEW_USER = 10 ** 9
+BULK_SIZE = 100
+
+
+def operations(mm: minion_meister.MinionMeister, guilds: int,
+               participants: int, history: int) -> list:
+    """ Get the measured operations in the order they run.
+
+        Every operation is called with the index of the call, which picks
+        the guild and user. Operations that undo an earlier one, like
+        remove_user after add_user, get the same index for the same record.
+
+        Returns:
+            :operations: list
+                (name, operation) pairs.
+    """
+    db = mm.database
+
+    def guild(i):
+        return 1 + i % guilds
+
+    def participant(i):
+        return 1 + (i // guilds) % participants
+
+    def new_user(i):
+        return FIRST_NEW_USER + i
+
+    def new_date(i):
+        return date.fromordinal(date(2100, 1, 1).toordinal() + i).isoformat()
+
+    # Key of the record halfway through the history of every guild.
+    middle = (date.fromordinal(LAST_DAY.toordinal() - history // 2)
+              .isoformat(), 0)
+
+    async def rank(i):
+        await mm.show_rank(guild(i), participant(i), '')
+
+    async def bulk_add_users(i):
+        users = [(new_user(i * BULK_SIZE + j), f'bulk{j}')
+                 for j in range(BULK_SIZE)]
+        await mm.bulk_add_users(guild(i) + guilds, users)
+
+    async def bulk_admin_users(i):
+        await mm.bulk_admin_users(
+            guild(i) + guilds,
+            [new_user(i * BULK_SIZE + j) for j in range(BULK_SIZE)])
+
+    async def bulk_insert_history(i):
+        records = [(new_user(i * BULK_SIZE + j), new_date(j))
+                   for j in range(BULK_SIZE)]
+        await mm.bulk_insert_history(guild(i) + guilds, records)
+
+    return [
+        ('show_participants (cold)', lambda i: mm.show_participants(guild(i))),
+        ('show_participants', lambda i: mm.show_participants(guild(i))),
+        ('is_user', lambda i: mm.is_user(guild(i), participant(i))),
+        ('show_admins', lambda i: mm.show_admins(guild(i))),
+        ('is_admin', lambda i: mm.is_admin(guild(i), participant(i))),
+        ('show_history', lambda i: mm.show_history(guild(i), 5)),
+        ('history_page', lambda i: mm.history_page(guild(i))),
+        ('history_page (deep)',
+         lambda i: mm.history_page(guild(i), before=middle)),
+        ('show_count', lambda i: mm.show_count(guild(i), 10)),
+        ('show_rank', rank),
+        ('select_winner', lambda i: mm.select_winner(guild(i))),
+        ('select_winner (fair)',
+         lambda i: mm.select_winner(guild(i), fair=True)),
+        ('add_user', lambda i: mm.add_user(guild(i), new_user(i), 'new')),
+        ('remove_user',
+         lambda i: mm.remove_user(guild(i), new_user(i), 'new')),
+        ('admin_user', lambda i: mm.admin_user(guild(i), new_user(i), 'new')),
+        ('unadmin_user',
+         lambda i: mm.unadmin_user(guild(i), new_user(i), 'new')),
+        ('insert_history', lambda i: mm.insert_history(
+            guild(i), participant(i), new_date(i))),
+        ('delete_history', lambda i: mm.delete_history(
+            guild(i), participant(i), new_date(i))),
+        ('bulk_add_users', bulk_add_users),
+        ('bulk_admin_users', bulk_admin_users),
+        ('bulk_insert_history', bulk_insert_history),
+        ('list_servers', lambda i: mm.list_servers(after=guild(i))),
+        ('reconcile_counts', lambda i: mm.reconcile_counts([guild(i)])),
+        ('read_from_db', lambda i: tools.read_from_db(
+            db, "SELECT name FROM users WHERE id = (?) AND server = (?)",
+            (participant(i), guild(i)))),
+        ('push_to_db', lambda i: tools.push_to_db(
+            db, "UPDATE users SET name = (?) WHERE id = (?) AND server = (?)",
+            (f'user{participant(i)}', participant(i), guild(i)))),
+    ]
+
+
+async def measure(operation, iterations: int, concurrency: int) -> dict:
+    """ Call operation iterations times from concurrency workers.
+
+        Returns:
+            :result: dict
+                latency summary in milliseconds, throughput in operations
+                per second and the amount of calls that raised a
+                DatabaseError.
+    """
+    samples = []
+    errors = 0
+    indices = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for i in indices:
+            start = time.perf_counter()
+            try:
+                await operation(i)
+            except error.DatabaseError:
+                errors += 1
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = summarise(samples)
+    result['throughput'] = len(samples) / elapsed
+    result['errors'] = errors
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """ Find the operations that got slower than a baseline run.
+
+        An operation regressed if its p95 latency grew, or its throughput
+        shrank, by more than a factor threshold.
+
+        Returns:
+            :regressions: list
+                one line per regressed operation.
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get('results', dict()).get(name)
+        if old is None:
+            continue
+        if result['p95'] > old['p95'] * threshold:
+            regressions.append(f"{name}: p95 {old['p95']:.3f}ms -> "
+                               f"{result['p95']:.3f}ms")
+        if result['throughput'] * threshold < old['throughput']:
+            regressions.append(f"{name}: throughput "
+                               f"{old['throughput']:.0f}/s -> "
+                               f"{result['throughput']:.0f}/s")
+    return regressions
+
+
+async def main(args) -> int:
+    config = {
+        'guilds': args.guilds,
+        'participants': args.participants,
+        'history': args.history,
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'engine': args.engine,
+    }
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'bench.db')
+        create_database(db_filename)
+        start = time.perf_counter()
+        seed_guilds(db_filename, args.guilds, args.participants,
+                    args.history)
+        print(f"seeded {args.guilds} guilds x {args.participants} "
+              f"participants x {args.history} history records in "
+              f"{time.perf_counter() - start:.2f}s")
+
+        mm = minion_meister.MinionMeister(db_filename, engine=args.engine)
+        if args.engine == 'memory':
+            mm.storage.load(db_filename)
+        for name, operation in operations(mm, args.guilds,
+                                          args.participants, args.history):
+            if args.only and not any(only in name for only in args.only):
+                continue
+            if args.engine == 'memory' and name.endswith('_db'):
+                continue
+            iterations = args.iterations
+            if name.endswith('(cold)'):
+                iterations = min(iterations, args.guilds)
+            result = await measure(operation, iterations, args.concurrency)
+            results[name] = result
+            print(f"{name:<28} n={result['n']:<6} "
+                  f"p50={result['p50']:8.3f}ms p95={result['p95']:8.3f}ms "
+                  f"p99={result['p99']:8.3f}ms "
+                  f"{result['throughput']:9.0f}/s errors={result['errors']}")
+        await tools.close_pools()
+
+    run = {
+        'config': config,
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(run, output, indent=2)
+        print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-N', '--guilds', type=int, default=100,
+                        help="Amount of guilds.")
+    parser.add_argument('-M', '--participants', type=int, default=50,
+                        help="Amount of participants per guild.")
+    parser.add_argument('-K', '--history', type=int, default=500,
+                        help="Amount of history records per guild.")
+    parser.add_argument('-n', '--iterations', type=int, default=500,
+                        help="Amount of calls per operation.")
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help="Amount of concurrent callers.")
+    parser.add_argument('-e', '--engine', default='sqlite',
+                        choices=('sqlite', 'memory'),
+                        help="Storage engine to measure.")
+    parser.add_argument('-o', '--output', default='bench_suite.json',
+                        help="JSON file the results are written to.")
+    parser.add_argument('-b', '--baseline',
+                        help="JSON file of a previous run to compare with.")
+    parser.add_argument('-t', '--threshold', type=float, default=1.25,
+                        help="Slowdown factor reported as a regression.")
+    parser.add_argument('--only', nargs='*',
+                        help="Only measure operations containing these names.")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Filename: bench_webserver.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Compare a web server in its own thread (like the old Flask keep alive)
+  with the aiohttp server on the event loop of the bot.
+- HTTP clients in another process poll /health while the bot handles a
+  stream of commands from the load generator.
+- Report the latency of the health checks and of the commands.
+- Run from the app directory: python3 -m benchmarks.bench_webserver
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import tools
+import webserver
+
+from benchmarks.common import create_database, seed_guilds, summarise
+
+MODES = ('thread', 'loop')
+
+
+def threaded_server(bot, db_filename: str, port: int) -> ThreadingHTTPServer:
+    """ Serve /health from threads, with a blocking database probe. """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = time.perf_counter()
+            con = sqlite3.connect(db_filename)
+            con.execute("SELECT 1").fetchall()
+            con.close()
+            body = json.dumps({
+                'status': 'ok',
+                'gateway_latency_seconds': bot.latency,
+                'database': 'ok',
+                'database_seconds': time.perf_counter() - start,
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def poll(url: str, clients: int, duration: float, results) -> None:
+    """ Poll url from clients concurrent clients for duration seconds. """
+    async def main():
+        samples = []
+        deadline = time.perf_counter() + duration
+
+        async def client(session):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                async with session.get(url) as response:
+                    await response.read()
+                samples.append(time.perf_counter() - start)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(client(session) for _ in range(clients)))
+        return samples
+
+    results.put(asyncio.run(main()))
+
+
+async def run(mode: str, db_filename: str, args) -> dict:
+    """ Measure one mode, with the load generator as the bot. """
+    from benchmarks.load_generator import MIXES, LoadGenerator
+
+    generator = LoadGenerator(args.guilds, args.participants, MIXES['read'])
+    bot = generator.bot
+    port = args.port
+    if mode == 'thread':
+        server = threaded_server(bot, db_filename, port)
+    else:
+        runner = await webserver.start(bot, '127.0.0.1', port)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    poller = context.Process(target=poll, args=(
+        f'http://127.0.0.1:{port}/health', args.clients, args.duration,
+        results))
+    poller.start()
+    # Give the poller time to start before the bot is measured.
+    await asyncio.sleep(1.0)
+    generator.samples.clear()
+    while poller.is_alive() and results.empty():
+        await generator.closed_loop(100, args.concurrency)
+        await asyncio.sleep(0)
+    http = results.get()
+    poller.join()
+
+    if mode == 'thread':
+        server.shutdown()
+        server.server_close()
+    else:
+        await runner.cleanup()
+
+    commands = [sample for samples in generator.samples.values()
+                for sample in samples]
+    return {
+        'http': dict(summarise(http), per_second=len(http) / args.duration),
+        'commands': summarise(commands),
+    }
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'web.db')
+        create_database(db_filename)
+        seed_guilds(db_filename, args.guilds, args.participants, 50)
+        os.environ['DATABASE_FILE'] = db_filename
+        os.environ['BACKUP_INTERVAL_HOURS'] = '0'
+
+        for mode in MODES:
+            result = await run(mode, db_filename, args)
+            await tools.close_pools()
+            for name, s in result.items():
+                print(f"{mode:<6} {name:<8} n={s['n']:<7} "
+                      f"p50={s['p50']:8.3f}ms p95={s['p95']:8.3f}ms "
+                      f"p99={s['p99']:8.3f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-g', '--guilds', type=int, default=1000,
+                        help="Amount of simulated guilds.")
+    parser.add_argument('-p', '--participants', type=int, default=20,
+                        help="Amount of participants per guild.")
+    parser.add_argument('-c', '--concurrency', type=int, default=16,
+                        help="Concurrent command invokers.")
+    parser.add_argument('-n', '--clients', type=int, default=16,
+                        help="Concurrent HTTP clients polling /health.")
+    parser.add_argument('-d', '--duration', type=float, default=5.0,
+                        help="Seconds the clients poll.")
+    parser.add_argument('--port', type=int, default=8089,
+                        help="Port of the measured web server.")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Filename: common.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Helpers shared by the benchmark scripts.
+- Create a fresh database with the project schema.
+- Fill a database with synthetic guilds, participants and history.
+- Time an operation and summarise latency samples.
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date
+
+CREATE_SCRIPT = os.path.join(os.path.dirname(__file__), '..', '..',
+                             'database', 'create_database.py')
+LAST_DAY = date(2022, 7, 24)
+
+
+def create_database(db_filename: str) -> None:
+    """ Create a database with the project schema at db_filename. """
+    env = dict(os.environ, DATABASE_FILE=db_filename)
+    subprocess.run([sys.executable, CREATE_SCRIPT], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def seed_guilds(db_filename: str, guilds: int, participants: int,
+                history: int, admins: int = 1, seed: int = 0,
+                journal_mode: str = None, first: int = 1) -> None:
+    """ Fill a database with synthetic guilds.
+
+        Guild ids are first..first + guilds - 1 and user ids
+        1..participants in every guild, like Discord users that are in many
+        guilds. The history records of a guild are one day apart, newest on
+        the last day, and pick a random participant. The triggers on history
+        fill in the counts.
+
+        Parameters:
+            :db_filename: str, required
+                filename of a database with the project schema.
+            :guilds: int, required
+                amount of guilds (N).
+            :participants: int, required
+                amount of participants per guild (M).
+            :history: int, required
+                amount of history records per guild (K).
+            :admins: int, optional
+                amount of admins per guild, the first participants
+                (default: 1).
+            :seed: int, optional
+                seed of the random participant picks (default: 0).
+            :journal_mode: str, optional
+                journal mode to switch the database to, e.g. WAL (default:
+                keep the journal mode of the database).
+            :first: int, optional
+                id of the first guild (default: 1).
+    """
+    rng = random.Random(seed)
+    start = LAST_DAY.toordinal() - history
+    con = sqlite3.connect(db_filename)
+    if journal_mode is not None:
+        con.execute(f"PRAGMA journal_mode={journal_mode}")
+    for server_id in range(first, first + guilds):
+        user_ids = range(1, participants + 1)
+        con.executemany(
+            "INSERT INTO users (id, server, name) VALUES (?, ?, ?)",
+            ((user_id, server_id, f'user{user_id}') for user_id in user_ids))
+        con.executemany(
+            "INSERT INTO counts (server, user, count) VALUES (?, ?, 0)",
+            ((server_id, user_id) for user_id in user_ids))
+        con.executemany(
+            "INSERT INTO admins (server, user) VALUES (?, ?)",
+            ((server_id, user_id)
+             for user_id in range(1, min(admins, participants) + 1)))
+        con.executemany(
+            "INSERT INTO history (server, user, date) VALUES (?, ?, ?)",
+            ((server_id, rng.randint(1, participants),
+              date.fromordinal(start + day).isoformat())
+             for day in range(history)))
+    con.commit()
+    con.close()
+
+
+async def measure(operation, iterations: int) -> list:
+    """ Await operation iterations times, one call after the other.
+
+        Returns:
+            :samples: list
+                latency of every call in seconds.
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarise(samples: list) -> dict:
+    """ Summarise latency samples (seconds) in milliseconds.
+
+        Parameters:
+            :samples: list, required
+                latencies of the measured operation in seconds.
+
+        Returns:
+            :summary: dict
+                mean, p50, p95 and p99 latency in milliseconds.
+    """
+    ordered = sorted(samples)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered) * 1000,
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+    }
+
+
+def report(name: str, samples: list) -> None:
+    """ Print a one line latency summary of samples. """
+    s = summarise(samples)
+    print(f"{name:<32} n={s['n']:<6} mean={s['mean']:8.3f}ms "
+          f"p50={s['p50']:8.3f}ms p95={s['p95']:8.3f}ms "
+          f"p99={s['p99']:8.3f}ms")
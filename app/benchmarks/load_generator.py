@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Filename: load_generator.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Drive the MemberCog, AdminCog and OwnerCog commands offline with stub
+  Discord contexts, across thousands of simulated guilds.
+- Mix the commands by weight, with a closed loop of concurrent invokers or
+  an open loop at a fixed arrival rate.
+- Report p50/p95/p99 latency, rejected and failed commands per command.
+- Run from the app directory: python3 -m benchmarks.load_generator
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import minion_meister
+import tools
+from discord.ext import commands
+from discord.utils import maybe_coroutine
+
+from benchmarks.common import create_database, seed_guilds, summarise
+
+OWNER_ID = 10 ** 12
+
+# Weights of the commands, the names are the names of the bot commands.
+MIXES = {
+    'read': {'list': 40, 'count': 20, 'rank': 20, 'history': 10,
+             'admin_list': 10},
+    'default': {'list': 30, 'count': 15, 'rank': 15, 'history': 10,
+                'admin_list': 5, 'roll': 10, 'add': 5, 'remove': 5,
+                'insert': 3, 'delete': 2},
+    'write': {'add': 20, 'remove': 20, 'add_user': 10, 'remove_user': 10,
+              'roll': 20, 'admin': 5, 'unadmin': 5, 'insert': 5,
+              'delete': 5},
+}
+
+
+# Cog and typed arguments of every command that can be mixed in.
+COMMANDS = {
+    'add': ('member', ()),
+    'remove': ('member', ()),
+    'list': ('member', ()),
+    'history': ('member', ()),
+    'count': ('member', ()),
+    'rank': ('member', ('none',)),
+    'admin_list': ('member', ()),
+    'add_user': ('admin', ('member',)),
+    'remove_user': ('admin', ('member',)),
+    'roll': ('admin', ()),
+    'admin': ('owner', ('member',)),
+    'unadmin': ('owner', ('member',)),
+    'insert': ('owner', ('member', 'date')),
+    'delete': ('owner', ('member', 'date')),
+}
+
+
+class StubUser:
+    """ Member of a simulated guild. """
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+        self.display_name = f'user{user_id}'
+        self.mention = f'<@{user_id}>'
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StubUser) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+class StubGuild:
+    """ Simulated guild, only the id is used by the cogs. """
+    def __init__(self, guild_id: int) -> None:
+        self.id = guild_id
+
+
+class StubMessage:
+    """ Sent message that accepts, and ignores, reactions and edits. """
+    def __init__(self, content: str) -> None:
+        self.id = id(self)
+        self.content = content
+
+    async def add_reaction(self, emoji) -> None:
+        pass
+
+    async def remove_reaction(self, emoji, member) -> None:
+        pass
+
+    async def clear_reactions(self) -> None:
+        pass
+
+    async def edit(self, content: str = None) -> None:
+        self.content = content
+
+
+class StubContext:
+    """ Invocation context of one command in a simulated guild. """
+    def __init__(self, guild: StubGuild, author: StubUser) -> None:
+        self.guild = guild
+        self.author = author
+        self.sent = []
+
+    async def send(self, content) -> StubMessage:
+        self.sent.append(str(content))
+        return StubMessage(str(content))
+
+
+class StubBot:
+    """ Bot the cogs are attached to, nobody ever reacts to a message. """
+    def __init__(self, MM, owner_id: int = OWNER_ID) -> None:
+        self.MM = MM
+        self.owner_id = owner_id
+        self.latency = 0.05
+
+    def is_closed(self) -> bool:
+        return False
+
+    async def is_owner(self, user) -> bool:
+        return user.id == self.owner_id
+
+    async def wait_for(self, event, timeout=None, check=None):
+        raise asyncio.TimeoutError
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+
+class LoadGenerator:
+    """ Invoke randomly mixed commands on the cogs of a StubBot.
+
+        Every invocation picks a random guild and member, runs the cog
+        check like the bot does, and calls the command callback with
+        arguments that a user could have typed. Commands that raise a
+        CommandError are counted as rejected, like the bot would answer
+        them with an error message; other exceptions as failed.
+    """
+    def __init__(self, guilds: int, participants: int, mix: dict,
+                 seed: int = 0) -> None:
+        """ Create the cogs, DATABASE_FILE has to be set before. """
+        # The cogs read their configuration when they are imported.
+        from cogs.admin import AdminCog
+        from cogs.member import MemberCog
+        from cogs.owner import OwnerCog
+
+        self.guilds = guilds
+        self.participants = participants
+        self.rng = random.Random(seed)
+        self.bot = StubBot(
+            minion_meister.MinionMeister(os.getenv('DATABASE_FILE')))
+        self.member = MemberCog(self.bot)
+        self.admin = AdminCog(self.bot)
+        self.owner = OwnerCog(self.bot)
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.samples = defaultdict(list)
+        self.rejected = defaultdict(int)
+        self.failed = defaultdict(int)
+        self.failures = dict()
+
+    def _member(self) -> StubUser:
+        # Twice the participants, so half of the members do not take part.
+        return StubUser(self.rng.randint(1, 2 * self.participants))
+
+    def _date(self) -> str:
+        month, day = self.rng.randint(1, 12), self.rng.randint(1, 28)
+        return f'2023-{month:02}-{day:02}'
+
+    def invocation(self, name: str) -> tuple:
+        """ Get the cog, context and arguments of one invocation of name. """
+        cog_name, arguments = COMMANDS[name]
+        cog = getattr(self, cog_name)
+        guild = StubGuild(self.rng.randint(1, self.guilds))
+        if cog_name == 'admin':
+            # The first participant of every simulated guild is an admin.
+            author = StubUser(1)
+        elif cog_name == 'owner':
+            author = StubUser(OWNER_ID)
+        else:
+            author = self._member()
+        args = tuple({'member': self._member, 'date': self._date,
+                      'none': lambda: None}[argument]()
+                     for argument in arguments)
+        return cog, StubContext(guild, author), args
+
+    async def invoke(self, name: str) -> None:
+        """ Invoke the command name once and record its latency. """
+        cog, ctx, args = self.invocation(name)
+        command = self.bot_command(cog, name)
+        start = time.perf_counter()
+        try:
+            if not await maybe_coroutine(cog.cog_check, ctx):
+                raise commands.CheckFailure(name)
+            await command.callback(cog, ctx, *args)
+        except commands.CommandError:
+            self.rejected[name] += 1
+        except Exception as exc:
+            self.failed[name] += 1
+            self.failures.setdefault(name, repr(exc))
+        self.samples[name].append(time.perf_counter() - start)
+
+    @staticmethod
+    def bot_command(cog, name: str) -> commands.Command:
+        for command in cog.get_commands():
+            if command.name == name:
+                return command
+        raise KeyError(name)
+
+    async def closed_loop(self, invocations: int, concurrency: int) -> None:
+        """ Invoke commands back to back from concurrency invokers. """
+        remaining = iter(range(invocations))
+
+        async def invoker():
+            for _ in remaining:
+                await self.invoke(self.choice())
+
+        await asyncio.gather(*(invoker() for _ in range(concurrency)))
+
+    async def open_loop(self, invocations: int, rate: float) -> None:
+        """ Start invocations at rate per second, Poisson distributed. """
+        tasks = []
+        for _ in range(invocations):
+            tasks.append(asyncio.ensure_future(self.invoke(self.choice())))
+            await asyncio.sleep(self.rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+
+    def choice(self) -> str:
+        return self.rng.choices(self.names, self.weights)[0]
+
+    def results(self) -> dict:
+        """ Get the latency summary and error counts per command. """
+        results = dict()
+        for name in sorted(self.samples):
+            result = summarise(self.samples[name])
+            result['rejected'] = self.rejected[name]
+            result['failed'] = self.failed[name]
+            if name in self.failures:
+                result['failure'] = self.failures[name]
+            results[name] = result
+        return results
+
+
+def parse_mix(mix: str) -> dict:
+    """ Get a named mix, or parse a mix given as name=weight,... """
+    if mix in MIXES:
+        return MIXES[mix]
+    weights = dict()
+    for item in mix.split(','):
+        name, _sep, weight = item.partition('=')
+        if name.strip() not in COMMANDS:
+            raise SystemExit(f"unknown command {name.strip()} in mix")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        db_filename = os.path.join(directory, 'load.db')
+        create_database(db_filename)
+        seed_guilds(db_filename, args.guilds, args.participants,
+                    args.history)
+        os.environ['DATABASE_FILE'] = db_filename
+        os.environ['BACKUP_INTERVAL_HOURS'] = '0'
+
+        generator = LoadGenerator(args.guilds, args.participants,
+                                  parse_mix(args.mix), args.seed)
+        start = time.perf_counter()
+        if args.rate:
+            await generator.open_loop(args.invocations, args.rate)
+        else:
+            await generator.closed_loop(args.invocations, args.concurrency)
+        elapsed = time.perf_counter() - start
+        await tools.close_pools()
+
+    results = generator.results()
+    for name, result in results.items():
+        print(f"{name:<12} n={result['n']:<6} "
+              f"p50={result['p50']:8.3f}ms p95={result['p95']:8.3f}ms "
+              f"p99={result['p99']:8.3f}ms rejected={result['rejected']:<5} "
+              f"failed={result['failed']}")
+        if 'failure' in result:
+            print(f"{'':<12} first failure: {result['failure']}")
+    print(f"{args.invocations} commands in {elapsed:.2f}s, "
+          f"{args.invocations / elapsed:.0f} commands/s")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'config': vars(args), 'elapsed': elapsed,
+                       'results': results}, output, indent=2)
+    return 1 if any(result['failed'] for result in results.values()) else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-g', '--guilds', type=int, default=2000,
+                        help="Amount of simulated guilds.")
+    parser.add_argument('-p', '--participants', type=int, default=20,
+                        help="Amount of participants per guild.")
+    parser.add_argument('-k', '--history', type=int, default=50,
+                        help="Amount of history records per guild.")
+    parser.add_argument('-n', '--invocations', type=int, default=10000,
+                        help="Amount of commands to invoke.")
+    parser.add_argument('-c', '--concurrency', type=int, default=32,
+                        help="Concurrent invokers of the closed loop.")
+    parser.add_argument('-r', '--rate', type=float,
+                        help="Commands per second, open loop instead.")
+    parser.add_argument('-m', '--mix', default='default',
+                        help=f"One of {', '.join(MIXES)} or name=weight,...")
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help="Seed of the random guilds, members and mix.")
+    parser.add_argument('-o', '--output',
+                        help="JSON file the results are written to.")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
@@ -7,30 +7,143 @@ Date:     July 24th 2022
 
 Summary:
 - Discord bot that handles commands in the text channel of a server.
-- Create a MinionMeister object that can handle database calls.
+- Create the MinionMeister object that handles the database calls of every
+  cog and of the web server.
+- Warm up the storage and the guild cache while logging in to Discord.
+- Report the startup time from process launch until ready, per phase.
 - Send notification messages on command errors.
+- Close the shared database connections when the bot shuts down.
+- Record the latency and errors of every command in the metrics.
+- Serve the web server on the event loop of the bot (-w).
+- Roll the scheduled weekly rolls of every server once it is ready.
 - [TODO]
 """
 
 import argparse
+import asyncio
 import os
+import time
 
 from discord.ext import commands
 from dotenv import load_dotenv
 
+import metrics
+import minion_meister
+import scheduler
+import startup
+import tools
 import webserver
 
-bot = commands.Bot(command_prefix='!')
+
+class MinionMeisterBot(commands.Bot):
+    """ Discord bot that closes its database connections on shutdown.
+
+        :MM: is the MinionMeister that every cog and the web server share,
+        set it before the cogs are loaded. It is warmed up while the bot
+        logs in. Its :scheduler: rolls the scheduled rolls once the bot is
+        ready. With :web: set, the web server is served on the event loop
+        of the bot while it runs.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.MM = None
+        self.scheduler = None
+        self.scheduling = None
+        self.web = False
+        self.web_runner = None
+        self.warm_up_guilds = minion_meister.WARM_UP_GUILDS
+        self.warming = None
+        self.logged_in = None
+        self.startup = startup.StartupTimer()
+
+    async def start(self, *args, **kwargs):
+        if self.warming is None:
+            self.warming = asyncio.ensure_future(self.warm_up())
+        if self.scheduler is not None and self.scheduling is None:
+            self.scheduling = asyncio.ensure_future(self.run_scheduler())
+        if self.web and self.web_runner is None:
+            with self.startup.phase('web'):
+                self.web_runner = await webserver.start(self)
+        await super().start(*args, **kwargs)
+
+    async def login(self, *args, **kwargs):
+        with self.startup.phase('login'):
+            await super().login(*args, **kwargs)
+        self.logged_in = time.monotonic()
+
+    async def warm_up(self):
+        """ Warm up the storage and the guild cache, concurrently with the
+            login. The bot is closed if the database has no schema.
+        """
+        try:
+            with self.startup.phase('warm_up'):
+                guilds = await self.MM.warm_up(self.warm_up_guilds)
+        except RuntimeError as exc:
+            print(f'Warm-up failed: {exc}')
+            await self.close()
+            return
+        print(f'warmed up the database and {guilds} guilds')
+
+    async def run_scheduler(self):
+        """ Roll the scheduled rolls when they are due, once the bot is
+            ready to announce the winners.
+        """
+        await self.wait_until_ready()
+        await self.scheduler.run()
+
+    async def announce(self, channel_id: int, message: str):
+        """ Send the message of a scheduled roll in the channel. """
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            print(f'Scheduled roll channel {channel_id} is unknown.')
+            return
+        await channel.send(message)
+
+    async def close(self):
+        # warm_up closes the bot from its own task, which must finish the
+        # shutdown instead of cancelling itself.
+        current = asyncio.current_task()
+        for task in (self.warming, self.scheduling):
+            if task is not None and task is not current and not task.done():
+                task.cancel()
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+            self.web_runner = None
+        await super().close()
+        await tools.close_pools()
+
+
+bot = MinionMeisterBot(command_prefix='!')
 
 
 @bot.event
 async def on_ready():
     print(f'{bot.user.name} has connected to Discord!')
+    if bot.logged_in is not None and bot.startup.ready():
+        bot.startup.record('gateway', bot.logged_in)
+        print(bot.startup.report())
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    """ Remember when the command started, for the command metrics. """
+    ctx.started = time.perf_counter()
+
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    """ Record the latency of the command, also when it failed. """
+    started = getattr(ctx, 'started', None)
+    if started is not None:
+        metrics.COMMAND_SECONDS.observe(time.perf_counter() - started,
+                                        ctx.command.qualified_name)
 
 
 @bot.event
 async def on_command_error(ctx, err):
     """ Send the error message in text channel. """
+    command = ctx.command.qualified_name if ctx.command else ''
+    metrics.COMMAND_ERRORS.inc(command, type(err).__name__)
     await ctx.send(err)
 
 
@@ -44,6 +157,7 @@ def argparser():
 
 
 if __name__ == '__main__':
+    bot.startup.record('imports', bot.startup.launched)
     load_dotenv()
     TOKEN = os.getenv('DISCORD_TOKEN')
 
@@ -53,11 +167,15 @@ if __name__ == '__main__':
         'cogs.owner'
     ]
 
-    for cog in cogs:
-        bot.load_extension(cog)
+    with bot.startup.phase('extensions'):
+        bot.MM = minion_meister.MinionMeister(os.getenv('DATABASE_FILE'))
+        bot.scheduler = scheduler.Scheduler(bot.MM, bot.announce)
+        bot.warm_up_guilds = int(os.getenv('WARM_UP_GUILDS',
+                                           minion_meister.WARM_UP_GUILDS))
+        for cog in cogs:
+            bot.load_extension(cog)
 
     args = argparser()
-    if args.webserver:
-        webserver.keep_alive()
+    bot.web = args.webserver
 
     bot.run(TOKEN)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Filename: cache.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- GuildState class that holds the cached participants and admins of a guild.
+- GuildCache class that keeps a bounded amount of guilds in memory (LRU).
+- TTLCache class that remembers values for a limited time (permissions).
+- Functions to get the caches that are shared by all users of a database file.
+- [TODO]
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+from leaderboard import Leaderboard
+from selection import FairSampler, Sampler
+
+CACHE_SIZE = 1024
+PERMISSION_TTL = 60.0
+PERMISSION_CACHE_SIZE = 4096
+
+_caches = dict()
+_permission_caches = dict()
+
+
+class GuildState:
+    """ In-memory copy of the membership of one guild.
+
+        Attributes:
+            :participants: dict
+                maps the user id of every participant to its name.
+            :admins: set
+                user ids of all admins.
+            :counts: dict
+                maps the user id of every participant to its count.
+            :sampler: Sampler
+                user ids of all participants, to pick a winner in O(1).
+            :fair: FairSampler
+                participants weighted by count, to pick a fair winner in O(1).
+            :leaderboard: Leaderboard
+                participants sorted by count, built on first access.
+    """
+    def __init__(self, participants: dict, admins: set,
+                 counts: dict = None) -> None:
+        """ Initialise the state with rows loaded from the database. """
+        self.participants = participants
+        self.admins = admins
+        self.counts = {user_id: (counts or dict()).get(user_id, 0)
+                       for user_id in participants}
+        self.sampler = Sampler(participants)
+        self.fair = FairSampler(self.counts)
+        self._leaderboard = None
+
+    @property
+    def leaderboard(self) -> Leaderboard:
+        """ Get the leaderboard, sorting the participants on first access.
+        """
+        if self._leaderboard is None:
+            self._leaderboard = Leaderboard(self.participants, self.counts)
+        return self._leaderboard
+
+    def add_participant(self, user_id: int, name: str,
+                        count: int = 0) -> None:
+        """ Add a participant that was added to the database. """
+        self.participants[user_id] = name
+        self.counts[user_id] = count
+        self.sampler.add(user_id)
+        self.fair.add(user_id, count)
+        if self._leaderboard is not None:
+            self._leaderboard.add(user_id, name, count)
+
+    def remove_participant(self, user_id: int) -> None:
+        """ Remove a participant that was removed from the database. """
+        self.participants.pop(user_id, None)
+        self.counts.pop(user_id, None)
+        self.sampler.remove(user_id)
+        self.fair.remove(user_id)
+        if self._leaderboard is not None:
+            self._leaderboard.remove(user_id)
+
+    def update_count(self, user_id: int, delta: int) -> None:
+        """ Apply a committed change of the count of a participant. """
+        if user_id in self.counts:
+            self.counts[user_id] += delta
+            self.fair.update(user_id, self.counts[user_id])
+            if self._leaderboard is not None:
+                self._leaderboard.update(user_id, self.counts[user_id])
+
+
+class GuildCache:
+    """ Least recently used cache of GuildState objects keyed by guild id.
+
+        Callers keep the cached states current by writing through every
+        change they commit to the database. The hit and miss counters show
+        how many lookups were served without touching the database.
+
+        Every committed change also moves the version of its guild, cached
+        or not, so readers can tell if a guild changed since they looked.
+    """
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+        """ Initialise an empty cache that holds at most :size: guilds. """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.epoch = 0
+        self._guilds = OrderedDict()
+        self._versions = dict()
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def get(self, server_id: int):
+        """ Get the cached state of a guild.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+
+            Returns:
+                :state: GuildState or None
+                    None if the guild is not cached.
+        """
+        state = self._guilds.get(server_id)
+        if state is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._guilds.move_to_end(server_id)
+        return state
+
+    def peek(self, server_id: int):
+        """ Get the cached state of a guild without counting a lookup. """
+        return self._guilds.get(server_id)
+
+    def put(self, server_id: int, state: GuildState) -> None:
+        """ Cache the state of a guild, evicting the least recently used. """
+        self._guilds[server_id] = state
+        self._guilds.move_to_end(server_id)
+        while len(self._guilds) > self.size:
+            self._guilds.popitem(last=False)
+            self.evictions += 1
+
+    def updated(self, server_id: int):
+        """ Record a committed change of a guild and get its cached state.
+
+            Loads that were running while the change was committed see the
+            epoch move and do not cache their possibly stale result.
+
+            Returns:
+                :state: GuildState or None
+                    None if the guild is not cached.
+        """
+        self.epoch += 1
+        self._versions[server_id] = self._versions.get(server_id, 0) + 1
+        return self._guilds.get(server_id)
+
+    def version(self, server_id: int) -> int:
+        """ Get the amount of changes committed to a guild so far. """
+        return self._versions.get(server_id, 0)
+
+    def discard(self, server_id: int) -> None:
+        """ Remove a guild from the cache if it is cached. """
+        self._guilds.pop(server_id, None)
+
+    def clear(self) -> None:
+        """ Remove all guilds from the cache. """
+        self._guilds.clear()
+
+    def stats(self) -> dict:
+        """ Get the size and hit/miss counters of the cache. """
+        lookups = self.hits + self.misses
+        return {
+            'guilds': len(self._guilds),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache:
+    """ Bounded cache whose entries expire :ttl: seconds after they are put.
+
+        Used to remember the outcome of permission checks, keyed by
+        (guild id, user id), so commands do not wait on Discord or the
+        database for every invocation.
+    """
+    def __init__(self, ttl: float = PERMISSION_TTL,
+                 size: int = PERMISSION_CACHE_SIZE,
+                 clock=time.monotonic) -> None:
+        """ Initialise an empty cache. """
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        """ Get the value of key, or None if it is missing or expired. """
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value) -> None:
+        """ Remember value for key until the ttl has passed. """
+        self._entries.pop(key, None)
+        self._entries[key] = (value, self._clock() + self.ttl)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key) -> None:
+        """ Forget key, if it is remembered. """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """ Forget all keys. """
+        self._entries.clear()
+
+
+def get_cache(db_filename: str, size: int = None) -> GuildCache:
+    """ Get the guild cache that is shared by all users of a database file.
+
+        Params:
+            db_filename: str, required
+                filename of the database the cache mirrors.
+            size: int, optional
+                maximum amount of cached guilds (default: GUILD_CACHE_SIZE
+                environment variable or CACHE_SIZE).
+    """
+    cache = _caches.get(db_filename)
+    if cache is None:
+        if size is None:
+            size = int(os.getenv('GUILD_CACHE_SIZE', CACHE_SIZE))
+        cache = GuildCache(size)
+        _caches[db_filename] = cache
+    return cache
+
+
+def get_permission_cache(db_filename: str) -> TTLCache:
+    """ Get the permission cache that is shared by all cogs of a database file.
+
+        Params:
+            db_filename: str, required
+                filename of the database that holds the admins.
+    """
+    permissions = _permission_caches.get(db_filename)
+    if permissions is None:
+        ttl = float(os.getenv('PERMISSION_CACHE_TTL', PERMISSION_TTL))
+        permissions = TTLCache(ttl)
+        _permission_caches[db_filename] = permissions
+    return permissions
@@ -8,31 +8,34 @@ Date:     July 24th 2022
 Summary:
 - AdminCog class that contains all commands for an admin.
 - Check if the command invoker is an admin before executing command.
+- Remember the outcome of that check for a short time.
+- Schedule a weekly roll in a channel.
 - [TODO]
 """
 
-import os
-
+import cache
 import discord
-import minion_meister
+import error
+import scheduler
 from discord.ext import commands
-from dotenv import load_dotenv
-
-load_dotenv()
-DB_FILE = os.getenv('DATABASE_FILE')
 
 
 class AdminCog(commands.Cog, name='Admin Commands'):
     """ Cog with all the commands of an admin. """
     def __init__(self, bot):
         self.bot = bot
-        self.MM = minion_meister.MinionMeister(DB_FILE)
+        self.MM = bot.MM
+        self.permissions = cache.get_permission_cache(self.MM.database)
 
     async def cog_check(self, ctx):
         """ Check if the user is an admin (or the owner of the bot). """
-        if await self.bot.is_owner(ctx.author):
-            return True
-        return await self.MM.is_admin(ctx.guild.id, ctx.author.id)
+        key = (ctx.guild.id, ctx.author.id)
+        allowed = self.permissions.get(key)
+        if allowed is None:
+            allowed = (await self.bot.is_owner(ctx.author)
+                       or await self.MM.is_admin(ctx.guild.id, ctx.author.id))
+            self.permissions.put(key, allowed)
+        return allowed
 
     @commands.command(name='add_user', hidden=True,
                       help="Add user to participants.")
@@ -73,11 +76,55 @@ class AdminCog(commands.Cog, name='Admin Commands'):
         await ctx.send(f'User {user.display_name} is no longer participating.')
 
     @commands.command(name='roll', help="Select winner from participants.")
-    async def select_winner(self, ctx):
-        """ Select a random winner from the participants list. """
-        user_id = await self.MM.select_winner(ctx.guild.id)
+    async def select_winner(self, ctx, mode: str = None):
+        """ Select a random winner from the participants list.
+
+            Parameters:
+                :mode: str, optional
+                    'fair' favours participants that became Minion Meister
+                    less often. If :mode: is not given, every participant is
+                    equally likely.
+        """
+        if mode not in (None, 'fair'):
+            raise error.InvalidRollModeError(mode)
+
+        user_id = await self.MM.select_winner(ctx.guild.id, mode == 'fair')
         await ctx.send(f'The Minion Meister is now <@{user_id}>')
 
+    @commands.command(name='schedule',
+                      help="Schedule a weekly roll in this channel (UTC).")
+    async def schedule(self, ctx, weekday: str = None, time: str = None,
+                       mode: str = None):
+        """ Schedule a weekly roll in the channel, replacing the schedule of
+            the server. Without arguments, show the schedule.
+
+            Parameters:
+                :weekday: str, optional
+                    day of the roll, e.g. saturday or sat (UTC).
+                :time: str, optional
+                    time of the roll, HH:MM (UTC). Required with :weekday:.
+                :mode: str, optional
+                    'fair' favours participants that became Minion Meister
+                    less often, like the roll command.
+        """
+        if weekday is None:
+            schedule = await self.MM.show_schedule(ctx.guild.id)
+            await ctx.send(scheduler.describe(schedule))
+            return
+
+        if mode not in (None, 'fair'):
+            raise error.InvalidRollModeError(mode)
+        day, time = scheduler.parse_schedule(weekday, time)
+        schedule = await self.bot.scheduler.schedule(
+            ctx.guild.id, ctx.channel.id, day, time, mode)
+        await ctx.send(scheduler.describe(schedule))
+
+    @commands.command(name='unschedule', help="Remove the weekly roll.")
+    async def unschedule(self, ctx):
+        """ Remove the scheduled weekly roll of the server. """
+        await self.bot.scheduler.unschedule(ctx.guild.id)
+        await ctx.send('The weekly roll is no longer scheduled.')
+
 
 def setup(bot):
     bot.add_cog(AdminCog(bot))
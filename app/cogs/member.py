@@ -7,24 +7,30 @@ Date:     July 24th 2022
 
 Summary:
 - MemberCog class that contains all commands for a member.
+- Page through the history with reactions, one page per reaction.
+- Show counts and ranks from the in-memory leaderboard.
+- Stream long lists as several messages below the Discord size limit.
 - [TODO]
 """
 
-import os
+import asyncio
+import functools
 
-import minion_meister
+import discord
+import render
 from discord.ext import commands
-from dotenv import load_dotenv
 
-load_dotenv()
-DB_FILE = os.getenv('DATABASE_FILE')
+MAX_PAGE_SIZE = 25
+PAGE_TIMEOUT = 60.0
+PREVIOUS = '\u2b05\ufe0f'
+NEXT = '\u27a1\ufe0f'
 
 
 class MemberCog(commands.Cog, name='Commands'):
     """ Cog with all the commands of a member. """
     def __init__(self, bot):
         self.bot = bot
-        self.MM = minion_meister.MinionMeister(DB_FILE)
+        self.MM = bot.MM
 
     @commands.command(name='add',
                       help="Add yourself to participants with name.")
@@ -52,43 +58,123 @@ class MemberCog(commands.Cog, name='Commands'):
     @commands.command(name='list', help="Show list with all participants.")
     async def list_participants(self, ctx):
         """ Show a list with all participants. """
-        participants = await self.MM.show_participants(ctx.guild.id)
-        participants_str = '\n'.join(participants)
-        await ctx.send(f'Participants:\n{participants_str}')
+        rows = render.rows(
+            functools.partial(self.MM.participants_page, ctx.guild.id),
+            key=lambda row: (row[1], row[0]))
+        await render.send_lines(ctx, 'Participants:',
+                                (str(name) async for _id, name in rows))
 
     @commands.command(name='history',
-                      help="Show list with recent Minion Meisters.")
-    async def show_history(self, ctx, limit: int = 5):
-        """ Show a list with previous Minion Masters.
+                      help="Show pages with recent Minion Meisters.")
+    async def show_history(self, ctx, size: int = 5):
+        """ Show a paged list with previous Minion Masters.
+
+            The invoker pages with the PREVIOUS and NEXT reactions until
+            nobody pages for PAGE_TIMEOUT seconds. Every reaction fetches
+            only the page it shows.
 
             Parameters:
-                :limit: int, optional
-                    amount of history records to show (default: 5).
+                :size: int, optional
+                    amount of history records per page (default: 5, at
+                    most MAX_PAGE_SIZE).
         """
-        names, dates = await self.MM.show_history(ctx.guild.id, limit)
-
+        size = max(1, min(size, MAX_PAGE_SIZE))
+        page = await self.MM.history_page(ctx.guild.id, size)
+        message = await ctx.send(self._format_history(page))
+        for emoji in (PREVIOUS, NEXT):
+            await message.add_reaction(emoji)
+
+        def check(reaction, user):
+            return (reaction.message.id == message.id
+                    and user == ctx.author
+                    and str(reaction.emoji) in (PREVIOUS, NEXT))
+
+        while True:
+            try:
+                reaction, user = await self.bot.wait_for(
+                    'reaction_add', timeout=PAGE_TIMEOUT, check=check)
+            except asyncio.TimeoutError:
+                break
+            if str(reaction.emoji) == NEXT:
+                last_id, _name, last_date = page[-1]
+                turned = await self.MM.history_page(
+                    ctx.guild.id, size, before=(last_date, last_id))
+            else:
+                first_id, _name, first_date = page[0]
+                turned = await self.MM.history_page(
+                    ctx.guild.id, size, after=(first_date, first_id))
+            if turned:
+                page = turned
+                await message.edit(content=self._format_history(page))
+            try:
+                await message.remove_reaction(reaction, user)
+            except discord.HTTPException:
+                pass
+
+        try:
+            await message.clear_reactions()
+        except discord.HTTPException:
+            pass
+
+    @staticmethod
+    def _format_history(page: list) -> str:
         history_str = ""
-        for i, _ in enumerate(names):
-            history_str += f"\n{dates[i]}, {names[i]}"
-        await ctx.send(f'Previous Minion Meisters:{history_str}')
+        for _id, name, date in page:
+            history_str += f"\n{date}, {name}"
+        return f'Previous Minion Meisters:{history_str}'
 
     @commands.command(name='count',
                       help="Show Minion Meister frequency of participants.")
-    async def show_count(self, ctx):
-        """ Show the Minion Meister frequency count. """
-        names, count = await self.MM.show_count(ctx.guild.id)
+    async def show_count(self, ctx, limit: int = None):
+        """ Show the Minion Meister frequency count.
 
-        count_str = ""
-        for i, _ in enumerate(names):
-            count_str += f"\n{count[i]}, {names[i]}"
-        await ctx.send(f'Times selected as Minion Meister:{count_str}')
+            Parameters:
+                :limit: int, optional
+                    amount of participants to show, highest count first
+                    (default: all participants).
+        """
+        size = render.PAGE_SIZE
+        if limit is not None:
+            limit = max(1, limit)
+            size = min(limit, size)
+        rows = render.rows(
+            functools.partial(self.MM.count_page, ctx.guild.id),
+            key=lambda row: (row[2], row[1], row[0]), size=size)
+
+        async def lines():
+            shown = 0
+            async for _id, name, count in rows:
+                yield f'{count}, {name}'
+                shown += 1
+                if shown == limit:
+                    return
+
+        await render.send_lines(ctx, 'Times selected as Minion Meister:',
+                                lines())
+
+    @commands.command(name='rank',
+                      help="Show your Minion Meister rank, or of a member.")
+    async def show_rank(self, ctx, member: discord.Member = None):
+        """ Show the rank of a participant by Minion Meister count.
+
+            Parameters:
+                :member: discord.Member, optional
+                    member to show the rank of (default: command invoker).
+        """
+        user = ctx.author if member is None else member
+        rank, count, total = await self.MM.show_rank(ctx.guild.id, user.id,
+                                                     user.display_name)
+        await ctx.send(f'{user.display_name} is ranked {rank} of {total}, '
+                       f'selected {count} times as Minion Meister.')
 
     @commands.command(name='admin_list', help="Show list with all admins.")
     async def show_admins(self, ctx):
         """ Show a list with all admins. """
-        admins = await self.MM.show_admins(ctx.guild.id)
-        admins_str = '\n'.join(admins)
-        await ctx.send(f'Admins:\n{admins_str}')
+        rows = render.rows(
+            functools.partial(self.MM.admins_page, ctx.guild.id),
+            key=lambda row: (row[1], row[0]))
+        await render.send_lines(ctx, 'Admins:',
+                                (str(name) async for _id, name in rows))
 
 
 def setup(bot):
@@ -8,20 +8,25 @@ Date:     July 24th 2022
 Summary:
 - OwnerCog class that contains all commands for an owner.
 - Check if the command invoker is the owner before executing command.
+- Remember the outcome of permission checks for a short time.
+- Take online snapshots of every database shard periodically and on
+  demand, unless the database engine keeps no file.
 - [TODO]
 """
 
 import os
+import time
 from datetime import datetime
 
+import cache
 import discord
 import error
-import minion_meister
-from discord.ext import commands
-from dotenv import load_dotenv
+import snapshot
+from discord.ext import commands, tasks
 
-load_dotenv()
-DB_FILE = os.getenv('DATABASE_FILE')
+BACKUP_DIR = os.getenv('BACKUP_DIRECTORY')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', snapshot.BACKUP_KEEP))
+BACKUP_INTERVAL = float(os.getenv('BACKUP_INTERVAL_HOURS', 24))
 
 
 def is_date(date: str) -> bool:
@@ -44,11 +49,50 @@ class OwnerCog(commands.Cog, name='Owner Commands'):
     """ Cog with all the commands of an owner. """
     def __init__(self, bot):
         self.bot = bot
-        self.MM = minion_meister.MinionMeister(DB_FILE)
+        self.MM = bot.MM
+        self.permissions = cache.get_permission_cache(self.MM.database)
+        directory = BACKUP_DIR or os.path.join(
+            os.path.dirname(self.MM.database or '.'), 'backups')
+        # The memory engine keeps no file, there is nothing to snapshot.
+        router = getattr(self.MM.storage, 'router', None)
+        filenames = router.filenames if router else []
+        self.snapshots = [snapshot.Snapshotter(filename, directory,
+                                               BACKUP_KEEP)
+                          for filename in filenames]
+        if self.snapshots and BACKUP_INTERVAL > 0:
+            self.scheduled_backup.change_interval(hours=BACKUP_INTERVAL)
+            self.scheduled_backup.start()
+
+    def cog_unload(self):
+        """ Stop the periodic snapshots when the cog is unloaded. """
+        self.scheduled_backup.cancel()
+
+    @tasks.loop(hours=24)
+    async def scheduled_backup(self):
+        """ Take a snapshot of every shard in the background. """
+        await self.take_snapshots()
+
+    @scheduled_backup.before_loop
+    async def before_scheduled_backup(self):
+        await self.bot.wait_until_ready()
+
+    async def take_snapshots(self) -> list:
+        """ Take a snapshot of every shard, one shard after the other.
+
+            Returns:
+                :filenames: list
+                    filenames of the new snapshots, in shard order.
+        """
+        return [await snapshots.snapshot() for snapshots in self.snapshots]
 
     async def cog_check(self, ctx):
         """ Check if the user is the owner of the bot. """
-        return await self.bot.is_owner(ctx.author)
+        key = (None, ctx.author.id)
+        allowed = self.permissions.get(key)
+        if allowed is None:
+            allowed = await self.bot.is_owner(ctx.author)
+            self.permissions.put(key, allowed)
+        return allowed
 
     @commands.command(name='admin', hidden=True,
                       help="Give permissions to user for certain commands.")
@@ -60,6 +104,7 @@ class OwnerCog(commands.Cog, name='Owner Commands'):
                     user to add to the admins of the server.
         """
         await self.MM.admin_user(ctx.guild.id, user.id, user.display_name)
+        self.permissions.discard((ctx.guild.id, user.id))
         await ctx.send(f'User {user.display_name} is now an admin.')
 
     @commands.command(name='unadmin', hidden=True,
@@ -72,6 +117,7 @@ class OwnerCog(commands.Cog, name='Owner Commands'):
                     user to remove from the admins of the server.
         """
         await self.MM.unadmin_user(ctx.guild.id, user.id, user.display_name)
+        self.permissions.discard((ctx.guild.id, user.id))
         await ctx.send(f'User {user.display_name} is no longer an admin.')
 
     @commands.command(name='insert', hidden=True,
@@ -121,6 +167,22 @@ class OwnerCog(commands.Cog, name='Owner Commands'):
 
         await self.MM.delete_history(ctx.guild.id, user.id, date)
 
+    @commands.command(name='backup', hidden=True,
+                      help="Take a snapshot of the database now.")
+    async def backup(self, ctx):
+        """ Take a snapshot of every live shard without pausing the bot. """
+        if not self.snapshots:
+            await ctx.send('This database engine keeps no file, it has no '
+                           'snapshots.')
+            return
+        if any(snapshots.running for snapshots in self.snapshots):
+            await ctx.send('A backup is already running, waiting for it.')
+        start = time.perf_counter()
+        filenames = await self.take_snapshots()
+        duration = time.perf_counter() - start
+        names = ', '.join(os.path.basename(name) for name in filenames)
+        await ctx.send(f'Backup {names} written in {duration:.2f}s.')
+
 
 def setup(bot):
     bot.add_cog(OwnerCog(bot))
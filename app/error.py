@@ -81,14 +81,52 @@ class NoParticipantsError(SelectError):
         super().__init__('There are no participants.')
 
 
+class NotParticipatingError(SelectError):
+    """ Exception raised when a user is not participating. """
+    def __init__(self, user):
+        super().__init__(f'User {user} is not participating.')
+
+
 class NoAdminsError(SelectError):
     """ Exception raised when there are no admins. """
     def __init__(self):
         super().__init__('There are no admins.')
 
 
+class NoScheduleError(SelectError):
+    """ Exception raised when a server has no scheduled roll. """
+    def __init__(self):
+        super().__init__('There is no scheduled roll.')
+
+
+class InvalidRollModeError(UserInputError):
+    """ Exception raised when the roll mode is unknown. """
+    def __init__(self, mode):
+        self.mode = mode
+        super().__init__(f'Roll mode {mode} is unknown, use fair or nothing.')
+
+
 class InvalidDateError(UserInputError):
     """ Exception raised date is not the right format (YYYY-MM-DD). """
     def __init__(self, date):
         self.date = date
         super().__init__(f'Date {date} is not of format YYYY-MM-DD.')
+
+
+class InvalidScheduleError(UserInputError):
+    """ Exception raised when the weekday or time of a schedule is unknown.
+    """
+    def __init__(self, weekday, time):
+        self.weekday = weekday
+        self.time = time
+        super().__init__(f'Schedule {weekday} {time} is unknown, use a '
+                         f'weekday and a time of format HH:MM (UTC).')
+
+
+class InvalidLimitError(UserInputError):
+    """ Exception raised when the amount of entries to show is not positive.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        super().__init__(f'Limit {limit} is invalid, use a number of at '
+                         f'least 1.')
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Filename: leaderboard.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- SortedKeys class, a sorted list with O(log n) inserts and removals.
+- Leaderboard class that keeps the participants of a guild sorted by count.
+- [TODO]
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain, islice
+
+# Keys per block of a SortedKeys, a block splits when it doubles.
+BLOCK_SIZE = 512
+
+
+class SortedKeys:
+    """ Sorted list of keys, stored in blocks of at most 2 * BLOCK_SIZE.
+
+        A key is found in O(log n): one binary search over the last key of
+        every block and one inside the block. Adding or removing a key only
+        shifts its block of at most 2 * BLOCK_SIZE keys, never the whole
+        list. A Fenwick tree over the block lengths turns a block and an
+        offset into a position, and back, in O(log n). It is rebuilt in
+        O(n / BLOCK_SIZE) when a block splits or empties, which happens at
+        most once every BLOCK_SIZE changes.
+    """
+    def __init__(self, keys=()) -> None:
+        """ Initialise the list with keys, in any order. """
+        keys = sorted(keys)
+        self._blocks = [keys[start:start + BLOCK_SIZE]
+                        for start in range(0, len(keys), BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(keys)
+        self._build()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def add(self, key) -> None:
+        """ Insert key at its sorted position. """
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._build()
+            return
+        index = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, key)
+        self._maxes[index] = block[-1]
+        if len(block) > 2 * BLOCK_SIZE:
+            self._blocks[index:index + 1] = [block[:BLOCK_SIZE],
+                                             block[BLOCK_SIZE:]]
+            self._maxes[index:index + 1] = [block[BLOCK_SIZE - 1],
+                                            block[-1]]
+            self._build()
+        else:
+            self._grow(index, 1)
+
+    def remove(self, key) -> None:
+        """ Remove key, which must be in the list. """
+        index = bisect_left(self._maxes, key)
+        block = self._blocks[index]
+        del block[bisect_left(block, key)]
+        self._len -= 1
+        if block:
+            self._maxes[index] = block[-1]
+            self._grow(index, -1)
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+            self._build()
+
+    def bisect_left(self, key) -> int:
+        """ Get the position of the first key that is not below key. """
+        index = bisect_left(self._maxes, key)
+        if index == len(self._blocks):
+            return self._len
+        return self._before(index) + bisect_left(self._blocks[index], key)
+
+    def bisect_right(self, key) -> int:
+        """ Get the position of the first key that is above key. """
+        index = bisect_right(self._maxes, key)
+        if index == len(self._blocks):
+            return self._len
+        return self._before(index) + bisect_right(self._blocks[index], key)
+
+    def slice(self, start: int, stop: int = None) -> list:
+        """ Get the keys from position start up to position stop. """
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return []
+        index, offset = self._locate(start)
+        keys = chain(islice(self._blocks[index], offset, None),
+                     *self._blocks[index + 1:])
+        return list(islice(keys, stop - start))
+
+    def _build(self) -> None:
+        tree = [0] * (len(self._blocks) + 1)
+        for position, block in enumerate(self._blocks, 1):
+            tree[position] += len(block)
+            parent = position + (position & -position)
+            if parent < len(tree):
+                tree[parent] += tree[position]
+        self._tree = tree
+
+    def _grow(self, index: int, amount: int) -> None:
+        position = index + 1
+        while position < len(self._tree):
+            self._tree[position] += amount
+            position += position & -position
+
+    def _before(self, index: int) -> int:
+        """ Count the keys in the blocks before block index. """
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def _locate(self, position: int) -> tuple:
+        """ Get the (block index, offset) of a position below len. """
+        index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            following = index + step
+            if (following < len(self._tree)
+                    and self._tree[following] <= position):
+                index = following
+                position -= self._tree[following]
+            step >>= 1
+        return index, position
+
+
+class Leaderboard:
+    """ Participants sorted by count, highest first, then by name and id.
+
+        Every participant is kept as a (-count, name, user_id) key in a
+        SortedKeys, with a dict that maps its user id to its key. Changing
+        a count removes the old key and adds the new one, both in
+        O(log n).
+
+        The rank of a participant is one more than the amount of
+        participants with a higher count, so ties share a rank.
+    """
+    def __init__(self, participants: dict = None,
+                 counts: dict = None) -> None:
+        """ Initialise the leaderboard with a dict that maps user id to name
+            and a dict that maps user id to count.
+        """
+        participants = participants or dict()
+        counts = counts or dict()
+        self._keys = dict()
+        for user_id, name in participants.items():
+            self._keys[user_id] = (-counts.get(user_id, 0), str(name), user_id)
+        self._sorted = SortedKeys(self._keys.values())
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._keys
+
+    def add(self, user_id: int, name: str, count: int = 0) -> None:
+        """ Add user_id with name and count, or move it if it is added. """
+        self.remove(user_id)
+        key = (-count, str(name), user_id)
+        self._keys[user_id] = key
+        self._sorted.add(key)
+
+    def remove(self, user_id: int) -> None:
+        """ Remove user_id, removing a missing id has no effect. """
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            self._sorted.remove(key)
+
+    def update(self, user_id: int, count: int) -> None:
+        """ Change the count of user_id, if it is added. """
+        key = self._keys.get(user_id)
+        if key is not None and -key[0] != count:
+            self.add(user_id, key[1], count)
+
+    def top(self, k: int = None) -> list:
+        """ Get the participants with the highest counts.
+
+            Parameters:
+                :k: int, optional
+                    amount of participants (default: all participants).
+
+            Returns:
+                :top: list
+                    (name, count) of the participants, highest count first.
+        """
+        keys = self._sorted.slice(0, k)
+        return [(name, -count) for count, name, _user_id in keys]
+
+    def page(self, size: int, after: tuple = None) -> list:
+        """ Get one page of participants, in the order of top.
+
+            Parameters:
+                :size: int, required
+                    maximum amount of participants on the page.
+                :after: tuple, optional
+                    (count, name, user_id) key of the last participant of
+                    the previous page (default: the first page).
+
+            Returns:
+                :page: list
+                    (user_id, name, count) of the participants.
+        """
+        start = 0
+        if after is not None:
+            count, name, user_id = after
+            start = self._sorted.bisect_right((-count, str(name), user_id))
+        return [(user_id, name, -count) for count, name, user_id
+                in self._sorted.slice(start, start + size)]
+
+    def rank(self, user_id: int):
+        """ Get the rank and count of a participant.
+
+            Returns:
+                :rank: tuple or None
+                    (rank, count), None if user_id is not added.
+        """
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._sorted.bisect_left((key[0],)) + 1, -key[0]
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Filename: metrics.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Counter and Histogram classes that render in the Prometheus text format.
+- Latency, row and error metrics of database statements, labelled by the
+  MinionMeister method that runs them and the registered statement name.
+- Collected class for values that are counted elsewhere, read when the
+  metrics are rendered.
+- Latency and error metrics of bot commands.
+- Failures of the scheduled rolls.
+- [TODO]
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+import statements
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Name of the MinionMeister method the current task is running.
+_method = ContextVar('method', default='')
+
+
+def _escape(value) -> str:
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """ Monotonically increasing value per combination of label values. """
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple = ()) -> None:
+        """ Initialise the counter without any samples. """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = dict()
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        """ Add amount to the counter of labelvalues. """
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        """ Get the counter of labelvalues. """
+        return self._values.get(labelvalues, 0)
+
+    def samples(self) -> list:
+        return [f'{self.name}{_labels(self.labelnames, labelvalues)} '
+                f'{_number(value)}'
+                for labelvalues, value in list(self._values.items())]
+
+
+class Histogram:
+    """ Observations counted in cumulative buckets per label values. """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple = (), buckets: tuple = BUCKETS) -> None:
+        """ Initialise the histogram without any observations. """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = dict()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        """ Count value in the histogram of labelvalues. """
+        counts = self._values.get(labelvalues)
+        if counts is None:
+            counts = self._values[labelvalues] = [[0] * len(self.buckets), 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[0][i] += 1
+                break
+        counts[1] += value
+
+    def count(self, *labelvalues) -> int:
+        """ Get the amount of observations of labelvalues. """
+        counts = self._values.get(labelvalues)
+        return sum(counts[0]) if counts else 0
+
+    def samples(self) -> list:
+        lines = []
+        for labelvalues, (buckets, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, buckets):
+                cumulative += count
+                labels = _labels(self.labelnames, labelvalues,
+                                 f'le="{_number(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Collected:
+    """ Values read from a callback whenever the metrics are rendered.
+
+        Exports numbers that are already counted elsewhere, like the stats
+        of the writers and caches, without keeping a second copy.
+    """
+    def __init__(self, name: str, documentation: str, collect,
+                 labelnames: tuple = (), kind: str = 'gauge') -> None:
+        """ Initialise the metric.
+
+            Parameters:
+                :collect: function, required
+                    returns (labelvalues, value) pairs of every sample.
+                :kind: str, optional
+                    gauge or counter (default: gauge).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self) -> list:
+        return [f'{self.name}{_labels(self.labelnames, labelvalues)} '
+                f'{_number(value)}'
+                for labelvalues, value in self.collect()]
+
+
+class Registry:
+    """ Metrics that are exposed together on the /metrics endpoint. """
+    def __init__(self) -> None:
+        self._metrics = []
+
+    def register(self, metric):
+        """ Add metric to the registry and return it. """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """ Render all metrics in the Prometheus text format. """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    'minion_meister_query_seconds',
+    'Latency of database statements.',
+    ('method', 'statement', 'operation')))
+QUERY_ROWS = REGISTRY.register(Counter(
+    'minion_meister_query_rows_total',
+    'Rows read or changed by database statements.',
+    ('method', 'statement', 'operation')))
+QUERY_ERRORS = REGISTRY.register(Counter(
+    'minion_meister_query_errors_total',
+    'Database statements that raised an error.',
+    ('method', 'statement', 'operation')))
+COMMAND_SECONDS = REGISTRY.register(Histogram(
+    'minion_meister_command_seconds',
+    'Latency of bot commands, from invoke to reply.',
+    ('command',)))
+COMMAND_ERRORS = REGISTRY.register(Counter(
+    'minion_meister_command_errors_total',
+    'Bot commands that ended in an error.',
+    ('command', 'error')))
+SCHEDULED_ROLL_FAILURES = REGISTRY.register(Counter(
+    'minion_meister_scheduled_roll_failures_total',
+    'Scheduled rolls that raised an error.',
+    ('error',)))
+
+
+def current_method() -> str:
+    """ Get the MinionMeister method the current task is running. """
+    return _method.get()
+
+
+def labelled(cls):
+    """ Class decorator that labels the statements of every public coroutine
+        method with the name of the method.
+
+        A method that is called by another labelled method keeps the label
+        of the outermost one, the method the caller asked for.
+    """
+    for name, function in list(vars(cls).items()):
+        if name.startswith('_') or not iscoroutinefunction(function):
+            continue
+        setattr(cls, name, _labelled(function))
+    return cls
+
+
+def _labelled(function):
+    @wraps(function)
+    async def method(*args, **kwargs):
+        if _method.get():
+            return await function(*args, **kwargs)
+        token = _method.set(function.__name__)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            _method.reset(token)
+    return method
+
+
+class _Query:
+    rows = 0
+
+
+@contextmanager
+def query(operation: str, sql: str):
+    """ Context manager that records one database statement.
+
+        Set the rows attribute of the yielded object to the amount of rows
+        the statement read or changed.
+
+        Parameters:
+            :operation: str, required
+                kind of statement, e.g. read or push.
+            :sql: str, required
+                the statement, labelled with its name in the statements
+                registry, or with '' if it is not registered.
+    """
+    labels = (_method.get(), statements.NAMES.get(sql, ''), operation)
+    record = _Query()
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        QUERY_ERRORS.inc(*labels)
+        raise
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, *labels)
+    if record.rows > 0:
+        QUERY_ROWS.inc(*labels, amount=record.rows)
@@ -10,21 +10,70 @@ Summary:
 - Add and remove users from the database.
 - Select a random winner from the participands of a server.
 - Show how many times every participant has become Minion Meister.
+- Import users, admins and history in bulk.
+- Page through the history with a keyset on (date, id).
+- Page through participants, admins and counts, to stream long lists.
+- Rebuild the counts of servers from their history.
+- Keep the weekly scheduled rolls of every server.
+- Keep the records in SQLite shards or in memory (storage.py).
 - [TODO]
 """
 
+import asyncio
+
+import cache
 import error
-import tools
+import metrics
+import storage
+
+HISTORY_PAGE = 10
+STREAM_PAGE = 100
+RECONCILE_BATCH = 100
+WARM_UP_GUILDS = 256
 
 
+@metrics.labelled
 class MinionMeister:
     """ Create a Minion Meister Object that handles database calls.
 
-        [TODO]
+        The records are kept by a Storage engine: SQLite database files,
+        partitioned over shards by server id, or memory. Every public
+        operation that alters the records runs in one transaction of the
+        storage, reads use its reader. The private helpers take the records
+        of the transaction (or of the reader) as :records:.
+
+        The participants and admins of recently used guilds are kept in a
+        GuildCache that every write operation updates after it commits, so
+        membership lookups are served from memory. The cached guild also
+        holds a Sampler, so a winner is picked in constant time instead of
+        sorting the participants with ORDER BY RANDOM(), and a FairSampler
+        for rolls that favour participants with low counts. Its Leaderboard
+        serves counts and ranks without sorting in the database.
+
+        The statements of every public method are recorded in the query
+        metrics, labelled with the name of the method.
     """
-    def __init__(self, database_filename: str) -> None:
-        """ Initialise the database to connect to. """
+    def __init__(self, database_filename: str, shards: int = None,
+                 engine: str = None) -> None:
+        """ Initialise the database to connect to.
+
+            Every MinionMeister of the same database file shares its
+            storage: the pools and writers of the SQLite shards, or the
+            records of the memory engine.
+
+            Parameters:
+                :database_filename: str, required
+                    filename of the database.
+                :shards: int, optional
+                    amount of shard files the servers are partitioned over
+                    (default: DATABASE_SHARDS environment variable or 1).
+                :engine: str, optional
+                    storage engine, sqlite or memory (default:
+                    DATABASE_ENGINE environment variable or sqlite).
+        """
         self.database = database_filename
+        self.storage = storage.get_storage(database_filename, shards, engine)
+        self.cache = cache.get_cache(database_filename)
 
     async def add_user(self, server_id: int, user_id: int,
                        display_name: str) -> None:
@@ -44,10 +93,16 @@ class MinionMeister:
             Raises:
                 InsertError, if record already exists.
         """
-        if await self._in_users_(server_id, user_id):
-            raise error.InsertUserError(display_name)
-        await self._insert_user_(server_id, user_id, display_name)
-        await self._initialise_count_(server_id, user_id)
+        async with self.storage.transaction(server_id) as records:
+            if await records.in_users(server_id, user_id):
+                raise error.InsertUserError(display_name)
+            await records.insert_user(server_id, user_id, display_name)
+            await records.initialise_count(server_id, user_id)
+            count = await records.get_count(server_id, user_id)
+
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.add_participant(user_id, display_name, count)
 
     async def remove_user(self, server_id: int, user_id: int,
                           display_name: str) -> None:
@@ -67,16 +122,24 @@ class MinionMeister:
             Raises:
                 DeleteError, if record does not exist.
         """
-        if not await self._in_users_(server_id, user_id):
-            raise error.DeleteUserError(display_name)
-        await self._delete_user_(server_id, user_id)
+        async with self.storage.transaction(server_id) as records:
+            if not await records.in_users(server_id, user_id):
+                raise error.DeleteUserError(display_name)
+            await records.delete_user(server_id, user_id)
+
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.remove_participant(user_id)
 
-    async def select_winner(self, server_id: int) -> int:
+    async def select_winner(self, server_id: int, fair: bool = False) -> int:
         """ Select a random user in the participants list.
 
             Parameters:
                 :server_id: int, required
                     unique id of the server.
+                :fair: bool, optional
+                    favour users that became Minion Meister less often
+                    (default: False, every user is equally likely).
 
             Returns:
                 :user_id:
@@ -85,9 +148,13 @@ class MinionMeister:
             Raises:
                 NoParticipantsError, if there are no participants.
         """
-        user_id = await self._select_winner_(server_id)
-        await self._update_history_(server_id, user_id)
-        await self._update_count_(server_id, user_id)
+        async with self.storage.transaction(server_id) as records:
+            user_id = await self._select_winner_(records, server_id, fair)
+            await records.insert_history(server_id, user_id)
+
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.update_count(user_id, 1)
         return user_id
 
     async def show_participants(self, server_id: int) -> list:
@@ -104,10 +171,95 @@ class MinionMeister:
             Raises:
                 NoParticipantsError, if there are no participants.
         """
-        names = await self._list_participants_(server_id)
-        names = [str(name[0]) for name in names]
+        state = await self._guild_(server_id)
+        if not state.participants:
+            raise error.NoParticipantsError
+        names = sorted(str(name) for name in state.participants.values())
         return names
 
+    async def participants_page(self, server_id: int,
+                                size: int = STREAM_PAGE,
+                                after: tuple = None) -> list:
+        """ Get one page of participants, ordered on name.
+
+            Pages are read from the database with a keyset on (name, id),
+            so a long list is streamed without holding it in memory.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :size: int, optional
+                    maximum amount of participants on the page (default:
+                    STREAM_PAGE).
+                :after: tuple, optional
+                    (name, id) key of the last participant of the previous
+                    page (default: the first page).
+
+            Returns:
+                :page: list
+                    (user_id, name) of every participant on the page.
+
+            Raises:
+                NoParticipantsError, if the first page is requested and
+                there are no participants.
+        """
+        page = await self.storage.reader(server_id).page_users(
+            server_id, size, after)
+        if not page and after is None:
+            raise error.NoParticipantsError
+        return page
+
+    async def admins_page(self, server_id: int, size: int = STREAM_PAGE,
+                          after: tuple = None) -> list:
+        """ Get one page of admins, ordered on name like
+            participants_page.
+
+            Returns:
+                :page: list
+                    (user_id, name) of every admin on the page.
+
+            Raises:
+                NoAdminsError, if the first page is requested and there
+                are no admins.
+        """
+        page = await self.storage.reader(server_id).page_admins(
+            server_id, size, after)
+        if not page and after is None:
+            raise error.NoAdminsError
+        return page
+
+    async def count_page(self, server_id: int, size: int = STREAM_PAGE,
+                         after: tuple = None) -> list:
+        """ Get one page of counts, highest count first like show_count.
+
+            Served from the leaderboard of the cached guild with a keyset
+            on (count, name, id), so participants that move while the list
+            is streamed are not repeated.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :size: int, optional
+                    maximum amount of participants on the page (default:
+                    STREAM_PAGE).
+                :after: tuple, optional
+                    (count, name, id) key of the last participant of the
+                    previous page (default: the first page).
+
+            Returns:
+                :page: list
+                    (user_id, name, count) of every participant on the page.
+
+            Raises:
+                NoMinionMeisterError, if the first page is requested and
+                there are no participants.
+        """
+        state = await self._guild_(server_id)
+        page = state.leaderboard.page(size, after)
+        if not page and after is None:
+            raise error.NoMinionMeisterError
+        return page
+
     async def show_history(self, server_id: int, limit: int) -> tuple:
         """ Show the previous Minion Meisters of the server.
 
@@ -128,16 +280,60 @@ class MinionMeister:
         """
         if limit is None:
             limit = 5
-        history = await self._list_history(server_id, limit)
+        history = await self.storage.reader(server_id).list_history(
+            server_id, limit)
+        if not history:
+            raise error.NoMinionMeisterError
         names, dates = zip(*history)
         return names, dates
 
-    async def show_count(self, server_id: int) -> tuple:
+    async def history_page(self, server_id: int, size: int = HISTORY_PAGE,
+                           before: tuple = None, after: tuple = None) -> list:
+        """ Get one page of previous Minion Meisters, newest first.
+
+            Pages are found with a keyset on (date, id) instead of an
+            OFFSET, so every page costs one index seek and :size: rows no
+            matter how deep it is. Pass the key of the last row of a page as
+            :before: to get the older page after it, or the key of the first
+            row as :after: to get the newer page before it.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :size: int, optional
+                    maximum amount of records on the page (default:
+                    HISTORY_PAGE).
+                :before: tuple, optional
+                    (date, id) key, only records older than it are returned.
+                :after: tuple, optional
+                    (date, id) key, only records newer than it are returned.
+
+            Returns:
+                :page: list
+                    (id, name, date) of every record on the page, newest
+                    first. Empty if there is no page in that direction.
+
+            Raises:
+                NoMinionMeisterError, if the first page is requested and
+                there are no previous Minion Meisters.
+        """
+        page = await self.storage.reader(server_id).page_history(
+            server_id, size, before, after)
+        if not page and before is None and after is None:
+            raise error.NoMinionMeisterError
+        return page
+
+    async def show_count(self, server_id: int, limit: int = None) -> tuple:
         """ Show how many times the participants became Minion Meister.
 
+            Served from the leaderboard of the cached guild.
+
             Parameters:
                 :server_id: int, required
                     unique id of the server.
+                :limit: int, optional
+                    amount of participants to show, highest count first
+                    (default: all participants).
 
             Returns:
                 :names:
@@ -146,12 +342,49 @@ class MinionMeister:
                     amount of times the user got chosen as Minion Meister.
 
             Raises:
+                InvalidLimitError, if limit is below 1.
                 NoMinionMeisterError, if there are no previous Minion Meisters.
         """
-        result = await self._list_counts_(server_id)
+        if limit is not None and limit < 1:
+            raise error.InvalidLimitError(limit)
+        state = await self._guild_(server_id)
+        result = state.leaderboard.top(limit)
+        if not result:
+            raise error.NoMinionMeisterError
         names, count = zip(*result)
         return names, count
 
+    async def show_rank(self, server_id: int, user_id: int,
+                        display_name: str) -> tuple:
+        """ Show the rank of a participant by Minion Meister count.
+
+            Participants with the same count share a rank.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :user_id: int, required
+                    unique id of the user.
+                :display_name: str, required
+                    display name of the user.
+
+            Returns:
+                :rank:
+                    rank of the user, 1 for the highest count.
+                :count:
+                    amount of times the user got chosen as Minion Meister.
+                :participants:
+                    amount of participants in the server.
+
+            Raises:
+                NotParticipatingError, if the user is not participating.
+        """
+        state = await self._guild_(server_id)
+        rank = state.leaderboard.rank(user_id)
+        if rank is None:
+            raise error.NotParticipatingError(display_name)
+        return (*rank, len(state.leaderboard))
+
     async def insert_history(self, server_id: int, user_id: int,
                              date: str) -> None:
         """ Insert a record with custom date into the history table.
@@ -167,8 +400,12 @@ class MinionMeister:
             Returns:
                 None
         """
-        await self._insert_history_(server_id, user_id, date)
-        await self._update_count_(server_id, user_id)
+        async with self.storage.transaction(server_id) as records:
+            await records.insert_history(server_id, user_id, date)
+
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.update_count(user_id, 1)
 
     async def delete_history(self, server_id: int, user_id: int,
                              date: str) -> None:
@@ -183,10 +420,16 @@ class MinionMeister:
                     date the user became Minion Meister.
 
             Returns:
-                None
+                :deleted: int
+                    amount of records that were deleted.
         """
-        await self._delete_history_(server_id, user_id, date)
-        await self._update_count_(server_id, user_id, delete=True)
+        async with self.storage.transaction(server_id) as records:
+            deleted = await records.delete_history(server_id, user_id, date)
+
+        state = self.cache.updated(server_id)
+        if state is not None and deleted:
+            state.update_count(user_id, -deleted)
+        return deleted
 
     async def is_user(self, server_id: int, user_id: int) -> bool:
         """ Check if a user is in the database for the given server.
@@ -200,7 +443,8 @@ class MinionMeister:
             Returns:
                 bool
         """
-        return await self._in_users_(server_id, user_id)
+        state = await self._guild_(server_id)
+        return user_id in state.participants
 
     async def show_admins(self, server_id):
         """ List all admins in the server.
@@ -214,10 +458,14 @@ class MinionMeister:
                     list with the names of all admins.
 
             Raises:
-                NoParticipantsError, if there are no admins.
+                NoAdminsError, if there are no admins.
         """
-        names = await self._list_admins_(server_id)
-        names = [str(name[0]) for name in names]
+        state = await self._guild_(server_id)
+        names = sorted(str(state.participants[user_id])
+                       for user_id in state.admins
+                       if user_id in state.participants)
+        if not names:
+            raise error.NoAdminsError
         return names
 
     async def is_admin(self, server_id: int, user_id: int) -> bool:
@@ -230,7 +478,8 @@ class MinionMeister:
             Returns:
                 bool
         """
-        return await self._in_admins_(server_id, user_id)
+        state = await self._guild_(server_id)
+        return user_id in state.admins
 
     async def admin_user(self, server_id: int, user_id: int,
                          display_name: str) -> None:
@@ -247,9 +496,14 @@ class MinionMeister:
             Returns:
                 None
         """
-        if await self._in_admins_(server_id, user_id):
-            raise error.InsertAdminError(display_name)
-        await self._insert_admin_(server_id, user_id)
+        async with self.storage.transaction(server_id) as records:
+            if await records.in_admins(server_id, user_id):
+                raise error.InsertAdminError(display_name)
+            await records.insert_admin(server_id, user_id)
+
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.admins.add(user_id)
 
     async def unadmin_user(self, server_id: int, user_id: int,
                            display_name: str) -> None:
@@ -266,195 +520,279 @@ class MinionMeister:
             Returns:
                 None
         """
-        if not await self._in_admins_(server_id, user_id):
-            raise error.DeleteAdminError(display_name)
-        await self._delete_admin_(server_id, user_id)
-
-    async def _insert_user_(self, server_id: int, user_id: int,
-                            display_name: str) -> None:
-        sql = (
-            "INSERT INTO users (id, server, name) "
-            "VALUES (?, ?, ?)"
-        )
-        values = (user_id, server_id, display_name)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _delete_user_(self, server_id: int, user_id: int) -> None:
-        sql = (
-            "DELETE FROM users "
-            "WHERE server = (?) "
-            "AND id = (?)"
-        )
-        values = (server_id, user_id)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _in_users_(self, server_id: int, user_id: int) -> bool:
-        sql = (
-            "SELECT EXISTS("
-            "SELECT 1 "
-            "FROM users "
-            "WHERE server = (?) "
-            "AND id = (?) "
-            "LIMIT 1"
-            ")"
-        )
-        values = (server_id, user_id)
-        result = await tools.read_from_db(self.database, sql, values)
-        return bool(result[0][0])
-
-    async def _select_winner_(self, server_id: int) -> int:
-        sql = (
-            "SELECT id "
-            "FROM users "
-            "WHERE server = (?) "
-            "ORDER BY RANDOM() "
-            "LIMIT 1"
-        )
-        values = (server_id,)
-        user_id = await tools.read_from_db(self.database, sql, values)
-        if not user_id:
-            raise error.NoParticipantsError
-        return user_id[0][0]
-
-    async def _list_participants_(self, server_id: int) -> list:
-        sql = (
-            "SELECT name "
-            "FROM users "
-            "WHERE server = (?) "
-            "ORDER BY name ASC"
-        )
-        values = (server_id,)
-        names = await tools.read_from_db(self.database, sql, values)
-        if not names:
-            raise error.NoParticipantsError
-        return names
+        async with self.storage.transaction(server_id) as records:
+            if not await records.in_admins(server_id, user_id):
+                raise error.DeleteAdminError(display_name)
+            await records.delete_admin(server_id, user_id)
 
-    async def _update_history_(self, server_id: int, user_id: int) -> None:
-        sql = (
-            "INSERT INTO history (server, user, date) "
-            "VALUES (?, ?, DATE())"
-        )
-        values = (server_id, user_id)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _insert_history_(self, server_id: int, user_id: int,
-                               date: str) -> None:
-        sql = (
-            "INSERT INTO history (server, user, date) "
-            "VALUES (?, ?, ?)"
-        )
-        values = (server_id, user_id, date)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _delete_history_(self, server_id: int, user_id: int,
-                               date: str) -> None:
-        sql = (
-            "DELETE FROM history "
-            "WHERE server = (?) "
-            "AND user = (?) "
-            "AND date = (?)"
-        )
-        values = (server_id, user_id, date)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _list_history(self, server_id: int, limit: int) -> list:
-        sql = (
-            "SELECT users.name, history.date "
-            "FROM history "
-            "INNER JOIN users ON history.user = users.id "
-            "WHERE history.server = (?) "
-            "ORDER BY date DESC "
-            "LIMIT (?)"
-        )
-        values = (server_id, limit)
-        history = await tools.read_from_db(self.database, sql, values)
-        if not history:
-            raise error.NoMinionMeisterError
-        return history
-
-    async def _initialise_count_(self, server_id: int, user_id: int) -> None:
-        sql = (
-            "INSERT OR IGNORE INTO counts (server, user, count) "
-            "VALUES (?, ?, ?)"
-        )
-        values = (server_id, user_id, 0)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _update_count_(self, server_id: int, user_id: int,
-                             delete: bool = False) -> None:
-        sql = (
-            "UPDATE counts "
-            "SET count = count + 1 "
-            "WHERE server = (?) "
-            "AND user = (?)"
-        )
-        if delete:
-            sql = (
-                "UPDATE counts "
-                "SET count = count - 1 "
-                "WHERE server = (?) "
-                "AND user = (?)"
-            )
-        values = (server_id, user_id)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _list_counts_(self, server_id: int) -> list:
-        sql = (
-            "SELECT users.name, counts.count "
-            "FROM counts "
-            "INNER JOIN users ON counts.user = users.id "
-            "AND counts.server = users.server "
-            "WHERE counts.server = (?) "
-            "ORDER BY counts.count DESC"
-        )
-        values = (server_id,)
-        counts = await tools.read_from_db(self.database, sql, values)
-        if not counts:
-            raise error.NoMinionMeisterError
-        return counts
-
-    async def _list_admins_(self, server_id):
-        sql = (
-            "SELECT users.name "
-            "FROM users "
-            "INNER JOIN admins ON users.id = admins.user "
-            "AND users.server = admins.server "
-            "WHERE users.server = (?) "
-            "ORDER BY name ASC"
-        )
-        values = (server_id,)
-        names = await tools.read_from_db(self.database, sql, values)
-        if not names:
-            raise error.NoAdminsError
-        return names
+        state = self.cache.updated(server_id)
+        if state is not None:
+            state.admins.discard(user_id)
+
+    async def bulk_add_users(self, server_id: int, users) -> int:
+        """ Add many users to the database in one transaction.
+
+            Users that are already participating are skipped.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :users: iterable, required
+                    (user_id, display_name) pairs.
+
+            Returns:
+                :added: int
+                    amount of users that were added.
+        """
+        users = list(users)
+        async with self.storage.transaction(server_id) as records:
+            added = await records.insert_users(server_id, users)
+            await records.initialise_counts(
+                server_id, [user_id for user_id, _name in users])
+
+        self.cache.updated(server_id)
+        self.cache.discard(server_id)
+        return added
+
+    async def bulk_admin_users(self, server_id: int, user_ids) -> int:
+        """ Add many users to the admins of a server in one transaction.
+
+            Users that are already admin are skipped.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :user_ids: iterable, required
+                    unique ids of the users.
+
+            Returns:
+                :added: int
+                    amount of admins that were added.
+        """
+        async with self.storage.transaction(server_id) as records:
+            added = await records.insert_admins(server_id, list(user_ids))
+
+        self.cache.updated(server_id)
+        self.cache.discard(server_id)
+        return added
+
+    async def bulk_insert_history(self, server_id: int, records) -> int:
+        """ Insert many records into the history table in one transaction.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :records: iterable, required
+                    (user_id, date) pairs, date formatted as YYYY-MM-DD.
+
+            Returns:
+                :inserted: int
+                    amount of records that were inserted.
+        """
+        records = list(records)
+        async with self.storage.transaction(server_id) as txn:
+            inserted = await txn.insert_histories(server_id, records)
+
+        self.cache.updated(server_id)
+        self.cache.discard(server_id)
+        return inserted
+
+    async def list_servers(self, after: int = None,
+                           limit: int = RECONCILE_BATCH) -> list:
+        """ List ids of servers with counts or history, in ascending order.
+
+            Parameters:
+                :after: int, optional
+                    only servers with a higher id are listed (default: all).
+                :limit: int, optional
+                    maximum amount of servers (default: RECONCILE_BATCH).
+
+            Returns:
+                :server_ids: list
+                    unique ids of the servers.
+        """
+        return await self.storage.list_servers(after, limit)
+
+    async def reconcile_counts(self, server_ids) -> int:
+        """ Rebuild the counts of servers from their history.
+
+            Only counts that differ from the amount of history records of
+            their user are written, so reconciling correct counts is read
+            only. The servers of every shard are reconciled in one
+            transaction.
+
+            Parameters:
+                :server_ids: iterable, required
+                    unique ids of the servers.
+
+            Returns:
+                :fixed: int
+                    amount of counts that were corrected or added.
+        """
+        fixed = dict()
+        for group in self.storage.partition(server_ids):
+            async with self.storage.transaction(group[0]) as records:
+                for server_id in group:
+                    fixed[server_id] = await records.recount(server_id)
+
+        for server_id, count in fixed.items():
+            if count:
+                self.cache.updated(server_id)
+                self.cache.discard(server_id)
+        return sum(fixed.values())
+
+    async def set_schedule(self, server_id: int, channel_id: int,
+                           weekday: int, time: str, mode: str,
+                           next_run: str) -> tuple:
+        """ Schedule a weekly roll, replacing the schedule of the server.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :channel_id: int, required
+                    unique id of the channel the winner is announced in.
+                :weekday: int, required
+                    day of the roll, 0 is Monday (UTC).
+                :time: str, required
+                    time of the roll, HH:MM (UTC).
+                :mode: str, required
+                    roll mode, 'fair' or None.
+                :next_run: str, required
+                    datetime of the first roll, YYYY-MM-DD HH:MM (UTC).
+
+            Returns:
+                :schedule: tuple
+                    (server_id, channel_id, weekday, time, mode, next_run)
+        """
+        async with self.storage.transaction(server_id) as records:
+            await records.set_schedule(server_id, channel_id, weekday,
+                                       time, mode, next_run)
+        return (server_id, channel_id, weekday, time, mode, next_run)
+
+    async def remove_schedule(self, server_id: int) -> None:
+        """ Remove the scheduled roll of the server.
+
+            Raises:
+                NoScheduleError, if the server has no schedule.
+        """
+        async with self.storage.transaction(server_id) as records:
+            if not await records.delete_schedule(server_id):
+                raise error.NoScheduleError()
+
+    async def show_schedule(self, server_id: int) -> tuple:
+        """ Get the scheduled roll of the server.
 
-    async def _insert_admin_(self, server_id: int, user_id: int) -> None:
-        sql = (
-            "INSERT INTO admins (server, user) "
-            "VALUES (?, ?)"
-        )
-        values = (server_id, user_id)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _delete_admin_(self, server_id: int, user_id: int) -> None:
-        sql = (
-            "DELETE FROM admins "
-            "WHERE server = (?) "
-            "AND user = (?)"
-        )
-        values = (server_id, user_id)
-        await tools.push_to_db(self.database, sql, values)
-
-    async def _in_admins_(self, server_id: int, user_id: int) -> bool:
-        sql = (
-            "SELECT EXISTS("
-            "SELECT 1 "
-            "FROM admins "
-            "WHERE server = (?) "
-            "AND user = (?) "
-            "LIMIT 1"
-            ")"
-        )
-        values = (server_id, user_id)
-        result = await tools.read_from_db(self.database, sql, values)
-        return bool(result[0][0])
+            Returns:
+                :schedule: tuple
+                    (server_id, channel_id, weekday, time, mode, next_run)
+
+            Raises:
+                NoScheduleError, if the server has no schedule.
+        """
+        schedule = await self.storage.reader(server_id).get_schedule(
+            server_id)
+        if schedule is None:
+            raise error.NoScheduleError()
+        return schedule
+
+    async def advance_schedule(self, server_id: int, previous: str,
+                               next_run: str) -> bool:
+        """ Move the next roll of the server from previous to next_run.
+
+            Returns:
+                bool, False if the schedule was changed or removed since
+                previous was read.
+        """
+        async with self.storage.transaction(server_id) as records:
+            advanced = await records.advance_schedule(server_id, previous,
+                                                      next_run)
+        return bool(advanced)
+
+    async def list_schedules(self, after: int = None,
+                             limit: int = RECONCILE_BATCH) -> list:
+        """ List the scheduled rolls, in ascending order of server id.
+
+            Parameters:
+                :after: int, optional
+                    only servers with a higher id are listed (default: all).
+                :limit: int, optional
+                    maximum amount of schedules (default: RECONCILE_BATCH).
+
+            Returns:
+                :schedules: list
+                    (server_id, channel_id, weekday, time, mode, next_run)
+                    of every schedule.
+        """
+        return await self.storage.list_schedules(after, limit)
+
+    async def ping(self) -> None:
+        """ Probe the storage, to check if the database can be read.
+
+            Raises:
+                the error of the storage if it cannot be read.
+        """
+        await self.storage.ping()
+
+    async def warm_up(self, guilds: int = WARM_UP_GUILDS) -> int:
+        """ Prepare the storage and fill the cache before the first command.
+
+            Checks the schema and opens the connections of the storage, then
+            loads the participants and admins of the first servers into the
+            cache, as many as fit.
+
+            Parameters:
+                :guilds: int, optional
+                    maximum amount of servers to load (default:
+                    WARM_UP_GUILDS).
+
+            Returns:
+                :loaded: int
+                    amount of servers that were loaded into the cache.
+
+            Raises:
+                RuntimeError, if the database has no schema.
+        """
+        await self.storage.warm_up()
+        server_ids = await self.storage.list_servers(
+            None, min(guilds, self.cache.size))
+        await asyncio.gather(*(self._guild_(server_id)
+                               for server_id in server_ids))
+        return len(server_ids)
+
+    async def _guild_(self, server_id: int) -> cache.GuildState:
+        state = self.cache.get(server_id)
+        if state is None:
+            state = await self._load_guild_(self.storage.reader(server_id),
+                                            server_id)
+        return state
+
+    async def _load_guild_(self, records,
+                           server_id: int) -> cache.GuildState:
+        epoch = self.cache.epoch
+        users = await records.list_users(server_id)
+        admins = await records.list_admin_ids(server_id)
+        participants = {user_id: name for user_id, name, _count in users}
+        counts = {user_id: count or 0 for user_id, _name, count in users}
+        state = cache.GuildState(participants, set(admins), counts)
+        if self.cache.epoch == epoch:
+            self.cache.put(server_id, state)
+        return state
+
+    async def _select_winner_(self, records, server_id: int,
+                              fair: bool = False) -> int:
+        state = self.cache.get(server_id)
+        if state is None:
+            state = await self._load_guild_(records, server_id)
+        sampler = state.fair if fair else state.sampler
+        user_id = sampler.choice()
+        if user_id is not None \
+                and await records.in_users(server_id, user_id):
+            return user_id
+
+        # The cached guild is out of step with the database, reload it.
+        state = await self._load_guild_(records, server_id)
+        sampler = state.fair if fair else state.sampler
+        user_id = sampler.choice()
+        if user_id is None:
+            raise error.NoParticipantsError
+        return user_id
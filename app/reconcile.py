@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Filename: reconcile.py
+Authors:  Yoshi Fu
+Date:     July 24th 2022
+
+Summary:
+- Rebuild the counts table from the history table, one batch of servers
+  per transaction, so the bot keeps serving commands while it runs.
+- Only counts that drifted are written.
+- Reconcile every server, or only the servers given on the command line.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+import minion_meister
+import tools
+
+load_dotenv()
+DB_FILE = os.getenv('DATABASE_FILE')
+
+
+def argparser():
+    """ Check for commandline arguments. """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('servers', nargs='*', type=int,
+                        help="ids of the servers to reconcile (default: all).")
+    parser.add_argument('-b', '--batch', type=int,
+                        default=minion_meister.RECONCILE_BATCH,
+                        help="servers reconciled per transaction.")
+    args = parser.parse_args()
+    return args
+
+
+async def reconcile(MM, server_ids=None,
+                    batch: int = minion_meister.RECONCILE_BATCH) -> dict:
+    """ Rebuild the counts of servers from their history in batches.
+
+        Parameters:
+            :MM: MinionMeister, required
+                MinionMeister of the database to reconcile.
+            :server_ids: iterable, optional
+                unique ids of the servers (default: every server).
+            :batch: int, optional
+                servers reconciled per transaction (default:
+                RECONCILE_BATCH).
+
+        Returns:
+            :result: dict
+                amount of servers reconciled and counts fixed.
+    """
+    result = {'servers': 0, 'fixed': 0}
+    if server_ids is not None:
+        server_ids = sorted(set(server_ids))
+        batches = (server_ids[i:i + batch]
+                   for i in range(0, len(server_ids), batch))
+        for servers in batches:
+            result['fixed'] += await MM.reconcile_counts(servers)
+            result['servers'] += len(servers)
+        return result
+
+    servers = await MM.list_servers(limit=batch)
+    while servers:
+        result['fixed'] += await MM.reconcile_counts(servers)
+        result['servers'] += len(servers)
+        servers = await MM.list_servers(after=servers[-1], limit=batch)
+    return result
+
+
+async def main():
+    args = argparser()
+
+    start = time.perf_counter()
+    MM = minion_meister.MinionMeister(DB_FILE)
+    result = await reconcile(MM, args.servers or None, args.batch)
+    await tools.close_pools()
+
+    print(f"reconciled {result['servers']} servers, fixed {result['fixed']} "
+          f"counts in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
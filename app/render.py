@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Filename: render.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Stream the rows of a paged MinionMeister list, one page at a time.
+- Render streamed lines into messages below the Discord size limit.
+- Send the messages paced below the Discord rate limit of a channel.
+- [TODO]
+"""
+
+import asyncio
+import time
+
+MESSAGE_LIMIT = 2000
+PAGE_SIZE = 100
+# Discord allows 5 messages per 5 seconds in a channel.
+SEND_INTERVAL = 1.0
+MAX_MESSAGES = 10
+MORE = '...'
+
+
+async def rows(fetch, key, size: int = PAGE_SIZE):
+    """ Stream the rows of a paged list.
+
+        Parameters:
+            :fetch: coroutine function, required
+                called with (size=size, after=key) to get the page after
+                the row with that key, or the first page without a key.
+            :key: function, required
+                gets the key of a row.
+            :size: int, optional
+                amount of rows per page (default: PAGE_SIZE).
+
+        Yields:
+            every row of every page, in order.
+    """
+    after = None
+    while True:
+        page = await fetch(size=size, after=after)
+        for row in page:
+            yield row
+        if len(page) < size:
+            return
+        after = key(page[-1])
+
+
+async def chunks(header: str, lines, limit: int = MESSAGE_LIMIT,
+                 max_messages: int = MAX_MESSAGES):
+    """ Render lines into messages of at most limit characters.
+
+        Only the message that is filled is kept in memory. The first
+        message starts with the header. A line that does not fit in a
+        message on its own is cut off. After max_messages the rest of the
+        lines is left out and the last message ends with MORE.
+
+        Parameters:
+            :header: str, required
+                first line of the first message.
+            :lines: async iterable, required
+                lines to render, without newlines.
+            :limit: int, optional
+                maximum length of a message (default: MESSAGE_LIMIT).
+            :max_messages: int, optional
+                maximum amount of messages (default: MAX_MESSAGES).
+
+        Yields:
+            :message: str
+    """
+    # Every message keeps room to end with MORE.
+    room = limit - len(MORE) - 1
+    message = header[:room]
+    sent = 0
+    async for line in lines:
+        line = line[:room]
+        joined = f'{message}\n{line}' if message else line
+        if len(joined) <= room:
+            message = joined
+            continue
+        sent += 1
+        if sent == max_messages:
+            yield f'{message}\n{MORE}'
+            return
+        yield message
+        message = line
+    yield message
+
+
+class Pacer:
+    """ Spaces out the messages sent to one channel. """
+    def __init__(self, interval: float = SEND_INTERVAL) -> None:
+        """ Initialise the pacer, the first message is sent right away. """
+        self.interval = interval
+        self.last = None
+
+    async def wait(self) -> None:
+        """ Wait until the next message may be sent. """
+        now = time.monotonic()
+        if self.last is not None and now - self.last < self.interval:
+            await asyncio.sleep(self.interval - (now - self.last))
+        self.last = time.monotonic()
+
+
+async def send_lines(destination, header: str, lines,
+                     interval: float = SEND_INTERVAL,
+                     max_messages: int = MAX_MESSAGES) -> int:
+    """ Send streamed lines as paced messages below the size limit.
+
+        Parameters:
+            :destination: discord.abc.Messageable, required
+                channel or context to send the messages to.
+            :header: str, required
+                first line of the first message.
+            :lines: async iterable, required
+                lines to send, without newlines.
+            :interval: float, optional
+                minimum seconds between two messages (default:
+                SEND_INTERVAL).
+            :max_messages: int, optional
+                maximum amount of messages (default: MAX_MESSAGES).
+
+        Returns:
+            :sent: int
+                amount of messages that were sent.
+    """
+    pacer = Pacer(interval)
+    sent = 0
+    async for message in chunks(header, lines, max_messages=max_messages):
+        await pacer.wait()
+        await destination.send(message)
+        sent += 1
+    return sent
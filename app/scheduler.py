@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Filename: scheduler.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Scheduler class that rolls the weekly scheduled rolls of every server.
+- One timer heap for all servers: a single task sleeps until the earliest
+  roll is due, so every due roll costs one wakeup, not one task per server.
+- Rolls that were missed while the bot was down are caught up once when it
+  starts, rolls that fail before they are stored are retried.
+- Functions to parse and describe the weekday and time of a schedule.
+- [TODO]
+"""
+
+import asyncio
+import heapq
+import itertools
+import time as clock
+from datetime import datetime, timedelta, timezone
+
+import error
+import metrics
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+            'saturday', 'sunday')
+DATETIME_FORMAT = '%Y-%m-%d %H:%M'
+SCHEDULE_PAGE = 1000
+ROLL_BATCH = 64
+# The clock is checked at least this often, so the wall clock may jump.
+MAX_SLEEP = 3600.0
+# Seconds until a roll that failed before its next run was stored is tried
+# again.
+RETRY_DELAY = 60.0
+
+
+def parse_schedule(weekday: str, time: str) -> tuple:
+    """ Parse the weekday and time of a schedule.
+
+        Parameters:
+            :weekday: str, required
+                name of the day, at least its first three letters.
+            :time: str, required
+                time of the day, HH:MM (UTC).
+
+        Returns:
+            :schedule: tuple
+                (weekday, time), weekday 0 is Monday and time is HH:MM.
+
+        Raises:
+            InvalidScheduleError, if the weekday or time is unknown.
+    """
+    day = (weekday or '').lower()
+    days = [number for number, name in enumerate(WEEKDAYS)
+            if len(day) >= 3 and name.startswith(day)]
+    try:
+        parsed = datetime.strptime(time or '', '%H:%M')
+    except ValueError:
+        days = []
+    if not days:
+        raise error.InvalidScheduleError(weekday, time)
+    return days[0], parsed.strftime('%H:%M')
+
+
+def next_run(weekday: int, time: str, after: float) -> str:
+    """ Get the first roll of a schedule after a moment.
+
+        Parameters:
+            :weekday: int, required
+                day of the roll, 0 is Monday (UTC).
+            :time: str, required
+                time of the roll, HH:MM (UTC).
+            :after: float, required
+                moment as a time.time() timestamp, the roll is later.
+
+        Returns:
+            :next_run: str
+                datetime of the roll, YYYY-MM-DD HH:MM (UTC).
+    """
+    moment = datetime.fromtimestamp(after, timezone.utc)
+    hour, minute = (int(part) for part in time.split(':'))
+    run = moment.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    run += timedelta(days=(weekday - moment.weekday()) % 7)
+    if run <= moment:
+        run += timedelta(days=7)
+    return run.strftime(DATETIME_FORMAT)
+
+
+def timestamp(run: str) -> float:
+    """ Get the time.time() timestamp of a datetime of a schedule. """
+    moment = datetime.strptime(run, DATETIME_FORMAT)
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def describe(schedule: tuple) -> str:
+    """ Describe a schedule (server_id, channel_id, weekday, time, mode,
+        next_run) in a message.
+    """
+    _server_id, channel_id, weekday, time, mode, run = schedule
+    roll = 'A fair roll' if mode == 'fair' else 'A roll'
+    return (f'{roll} is scheduled every {WEEKDAYS[weekday].capitalize()} '
+            f'at {time} UTC in <#{channel_id}>, next on {run} UTC.')
+
+
+class Scheduler:
+    """ Rolls the scheduled rolls of every server when they are due.
+
+        The schedules are kept in a heap ordered on their next run. A
+        single task sleeps until the top of the heap is due, rolls every
+        due schedule and pushes it back with its next run. A changed or
+        removed schedule leaves its old entry in the heap, it is skipped
+        when it is popped.
+
+        The next run of a schedule is stored before its roll, so a crash
+        during the roll skips it instead of rolling twice. A schedule whose
+        next run passed while the bot was down is rolled once when the
+        scheduler starts, not once for every week it missed.
+    """
+    def __init__(self, MM, announce, now=None) -> None:
+        """ Initialise the scheduler, no schedule is loaded yet.
+
+            Parameters:
+                :MM: MinionMeister, required
+                    MinionMeister that keeps the schedules and rolls.
+                :announce: coroutine function, required
+                    called with (channel_id, message) after every roll.
+                :now: function, optional
+                    clock that returns a time.time() timestamp (default:
+                    time.time).
+        """
+        self.MM = MM
+        self.announce = announce
+        self.now = now or clock.time
+        self.schedules = dict()
+        self.heap = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.schedules)
+
+    def push(self, schedule: tuple, due: float = None) -> None:
+        """ Add a schedule to the heap, replacing the schedule of its
+            server.
+
+            Parameters:
+                :schedule: tuple, required
+                    (server_id, channel_id, weekday, time, mode, next_run)
+                :due: float, optional
+                    timestamp to roll it at (default: its next run).
+        """
+        self.schedules[schedule[0]] = schedule
+        if due is None:
+            due = timestamp(schedule[5])
+        if not self.heap or due < self.heap[0][0]:
+            # The sleeping task has to wake up earlier.
+            self._changed.set()
+        heapq.heappush(self.heap, (due, next(self._order), schedule))
+        if len(self.heap) > 2 * len(self.schedules) + ROLL_BATCH:
+            self._compact()
+
+    def drop(self, server_id: int) -> None:
+        """ Remove the schedule of a server from the heap. """
+        self.schedules.pop(server_id, None)
+
+    def _compact(self) -> None:
+        """ Rebuild the heap without the entries of old schedules. """
+        self.heap = [entry for entry in self.heap
+                     if self.schedules.get(entry[2][0]) is entry[2]]
+        heapq.heapify(self.heap)
+
+    def _current(self, schedule: tuple) -> bool:
+        return self.schedules.get(schedule[0]) is schedule
+
+    def next_due(self) -> float:
+        """ Get the timestamp of the earliest roll, None if there is none.
+        """
+        while self.heap and not self._current(self.heap[0][2]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    async def load(self) -> int:
+        """ Load every schedule from the storage into the heap.
+
+            Returns:
+                :loaded: int
+                    amount of schedules.
+        """
+        after = None
+        while True:
+            page = await self.MM.list_schedules(after, SCHEDULE_PAGE)
+            for schedule in page:
+                self.schedules[schedule[0]] = schedule
+            if len(page) < SCHEDULE_PAGE:
+                break
+            after = page[-1][0]
+        self.heap = [(timestamp(schedule[5]), next(self._order), schedule)
+                     for schedule in self.schedules.values()]
+        heapq.heapify(self.heap)
+        self._changed.set()
+        return len(self.schedules)
+
+    async def schedule(self, server_id: int, channel_id: int, weekday: int,
+                       time: str, mode: str = None) -> tuple:
+        """ Schedule a weekly roll, replacing the schedule of the server.
+
+            Parameters:
+                :server_id: int, required
+                    unique id of the server.
+                :channel_id: int, required
+                    unique id of the channel the winner is announced in.
+                :weekday: int, required
+                    day of the roll, 0 is Monday (UTC).
+                :time: str, required
+                    time of the roll, HH:MM (UTC).
+                :mode: str, optional
+                    roll mode, 'fair' or None (default: None).
+
+            Returns:
+                :schedule: tuple
+                    (server_id, channel_id, weekday, time, mode, next_run)
+        """
+        run = next_run(weekday, time, self.now())
+        schedule = await self.MM.set_schedule(server_id, channel_id,
+                                              weekday, time, mode, run)
+        self.push(schedule)
+        return schedule
+
+    async def unschedule(self, server_id: int) -> None:
+        """ Remove the scheduled roll of the server.
+
+            Raises:
+                NoScheduleError, if the server has no schedule.
+        """
+        await self.MM.remove_schedule(server_id)
+        self.drop(server_id)
+
+    async def run_due(self, now: float = None) -> int:
+        """ Roll every schedule that is due.
+
+            Parameters:
+                :now: float, optional
+                    time.time() timestamp (default: the clock).
+
+            Returns:
+                :rolled: int
+                    amount of schedules that were rolled.
+        """
+        now = self.now() if now is None else now
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _due, _order, schedule = heapq.heappop(self.heap)
+            if self._current(schedule):
+                due.append(schedule)
+
+        rolled = 0
+        for start in range(0, len(due), ROLL_BATCH):
+            batch = due[start:start + ROLL_BATCH]
+            results = await asyncio.gather(
+                *(self._roll(schedule, now) for schedule in batch),
+                return_exceptions=True)
+            for schedule, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    metrics.SCHEDULED_ROLL_FAILURES.inc(
+                        type(result).__name__)
+                    print(f'Scheduled roll of server {schedule[0]} '
+                          f'failed: {result!r}')
+                    # Failed before its next run was stored, the schedule
+                    # left the heap and would never roll again.
+                    if self._current(schedule):
+                        self.push(schedule, now + RETRY_DELAY)
+                rolled += result is True
+        return rolled
+
+    async def run(self) -> None:
+        """ Load the schedules and roll them when they are due, until the
+            task is cancelled. Missed rolls are rolled right away.
+        """
+        await self.load()
+        while True:
+            self._changed.clear()
+            await self.run_due()
+            due = self.next_due()
+            delay = MAX_SLEEP if due is None else due - self.now()
+            try:
+                await asyncio.wait_for(self._changed.wait(),
+                                       min(max(delay, 0.0), MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _roll(self, schedule: tuple, now: float) -> bool:
+        server_id, channel_id, weekday, time, mode, previous = schedule
+        following = next_run(weekday, time, now)
+        if not await self.MM.advance_schedule(server_id, previous,
+                                              following):
+            # Changed or removed in the meantime, by another process if
+            # the heap still holds this schedule.
+            if self._current(schedule):
+                self.drop(server_id)
+            return False
+        if self._current(schedule):
+            self.push(schedule[:5] + (following,))
+
+        try:
+            user_id = await self.MM.select_winner(server_id, mode == 'fair')
+            message = f'The Minion Meister is now <@{user_id}>'
+        except error.DatabaseError as exc:
+            message = str(exc)
+        await self.announce(channel_id, message)
+        return True
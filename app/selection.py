@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Filename: selection.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Sampler class that picks a uniformly random participant in constant time.
+- AliasTable class that samples weighted indices in constant time (Vose).
+- FairSampler class that favours participants with low Minion Meister counts.
+- [TODO]
+"""
+
+import random
+
+
+class Sampler:
+    """ Set of user ids that supports O(1) add, remove and uniform choice.
+
+        The ids are kept in a dense list with a dict that maps every id to
+        its position in the list. Removing an id moves the last id into the
+        freed position, so the list never has holes.
+    """
+    def __init__(self, user_ids=(), rng: random.Random = None) -> None:
+        """ Initialise the sampler with user_ids. """
+        self._ids = []
+        self._positions = dict()
+        self._rng = rng if rng is not None else random.Random()
+        for user_id in user_ids:
+            self.add(user_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._positions
+
+    def add(self, user_id: int) -> None:
+        """ Add user_id, adding an id twice has no effect. """
+        if user_id in self._positions:
+            return
+        self._positions[user_id] = len(self._ids)
+        self._ids.append(user_id)
+
+    def remove(self, user_id: int) -> None:
+        """ Remove user_id, removing a missing id has no effect. """
+        position = self._positions.pop(user_id, None)
+        if position is None:
+            return
+        last = self._ids.pop()
+        if last != user_id:
+            self._ids[position] = last
+            self._positions[last] = position
+
+    def choice(self):
+        """ Pick a uniformly random user id.
+
+            Returns:
+                :user_id: int or None
+                    None if the sampler is empty.
+        """
+        if not self._ids:
+            return None
+        return self._ids[self._rng.randrange(len(self._ids))]
+
+
+class AliasTable:
+    """ Vose alias table to sample an index with given weights in O(1).
+
+        Building the table takes O(n) for n weights, every sample draws one
+        column uniformly and flips one biased coin.
+    """
+    def __init__(self, weights: list, rng: random.Random = None) -> None:
+        """ Build the table for non-negative weights with a positive sum. """
+        self._rng = rng if rng is not None else random.Random()
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self._probability = [1.0] * n
+        self._alias = list(range(n))
+
+        small = [i for i, weight in enumerate(scaled) if weight < 1.0]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._probability[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left over has probability 1 up to rounding errors.
+        for i in small + large:
+            self._probability[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self._probability)
+
+    def sample(self) -> int:
+        """ Pick an index with probability proportional to its weight. """
+        column = self._rng.randrange(len(self._probability))
+        if self._rng.random() < self._probability[column]:
+            return column
+        return self._alias[column]
+
+
+class FairSampler:
+    """ Pick participants that became Minion Meister less often more often.
+
+        A participant chosen :count: times has weight
+        1 / (1 + count - lowest), where lowest is the lowest count in the
+        guild. Participants are grouped in levels of equal count, each level
+        a Sampler. An AliasTable over the levels picks a level and the level
+        picks a participant, both in O(1).
+
+        Changing a count moves one participant between levels in O(1). The
+        alias table only spans the distinct counts in the guild and is
+        rebuilt lazily on the next choice after a level was added, removed
+        or resized.
+    """
+    def __init__(self, counts: dict = None, rng: random.Random = None) -> None:
+        """ Initialise the sampler with a dict that maps user id to count. """
+        self._rng = rng if rng is not None else random.Random()
+        self._counts = dict()
+        self._levels = dict()
+        self._keys = []
+        self._table = None
+        for user_id, count in (counts or dict()).items():
+            self.add(user_id, count)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._counts
+
+    def add(self, user_id: int, count: int) -> None:
+        """ Add user_id with count, or move it if it is already added. """
+        if user_id in self._counts:
+            self.remove(user_id)
+        self._counts[user_id] = count
+        level = self._levels.get(count)
+        if level is None:
+            level = self._levels[count] = Sampler(rng=self._rng)
+        level.add(user_id)
+        self._table = None
+
+    def remove(self, user_id: int) -> None:
+        """ Remove user_id, removing a missing id has no effect. """
+        count = self._counts.pop(user_id, None)
+        if count is None:
+            return
+        level = self._levels[count]
+        level.remove(user_id)
+        if not level:
+            del self._levels[count]
+        self._table = None
+
+    def update(self, user_id: int, count: int) -> None:
+        """ Change the count of user_id, if it is added. """
+        if user_id in self._counts and self._counts[user_id] != count:
+            self.add(user_id, count)
+
+    @staticmethod
+    def weight(count: int, lowest: int) -> float:
+        """ Get the weight of a participant with count in a guild with lowest.
+        """
+        return 1.0 / (1 + count - lowest)
+
+    def choice(self):
+        """ Pick a user id weighted towards low counts.
+
+            Returns:
+                :user_id: int or None
+                    None if the sampler is empty.
+        """
+        if not self._counts:
+            return None
+        if self._table is None:
+            self._rebuild()
+        level = self._levels[self._keys[self._table.sample()]]
+        return level.choice()
+
+    def _rebuild(self) -> None:
+        self._keys = list(self._levels)
+        lowest = min(self._keys)
+        weights = [len(self._levels[count]) * self.weight(count, lowest)
+                   for count in self._keys]
+        self._table = AliasTable(weights, self._rng)
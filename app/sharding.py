@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Filename: sharding.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- ShardRouter class that maps a server id to one of N database files with
+  consistent hashing.
+- Split an existing database into new shard files, or move the servers of
+  existing shards that change shard when the amount of shards changes.
+- Run from the app directory: python3 sharding.py --shards 4
+- [TODO]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from bisect import bisect
+
+from dotenv import load_dotenv
+
+SHARDS = 1
+VNODES = 64
+TABLES = ('users', 'admins', 'history', 'counts', 'schedules')
+
+CREATE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'database', 'create_database.py')
+
+_routers = dict()
+
+
+def shard_filenames(db_filename: str, shards: int) -> list:
+    """ Get the filenames of the shards of a database.
+
+        A single shard is the database file itself, more shards are named
+        after it: minion_meister.db becomes minion_meister.shard0.db, ...
+        Keep in step with database/create_database.py.
+    """
+    if shards <= 1:
+        return [db_filename]
+    stem, ext = os.path.splitext(db_filename)
+    return [f'{stem}.shard{index}{ext}' for index in range(shards)]
+
+
+def _hash(key: str) -> int:
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class ShardRouter:
+    """ Consistent hash ring that maps server ids to shard files.
+
+        Every shard owns :vnodes: points on the ring, named after its
+        position in the list of shards, and a server belongs to the first
+        point after the hash of its id. Adding a shard only moves the
+        servers that the new points take over, about 1/N of them, so
+        growing the amount of shards later moves as few servers as
+        possible.
+    """
+    def __init__(self, filenames: list, vnodes: int = VNODES) -> None:
+        """ Build the ring of the shard filenames. """
+        self.filenames = list(filenames)
+        points = sorted((_hash(f'shard{index}:{vnode}'), index)
+                        for index in range(len(self.filenames))
+                        for vnode in range(vnodes))
+        self._points = [point for point, _index in points]
+        self._owners = [index for _point, index in points]
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def index(self, server_id: int) -> int:
+        """ Get the position of the shard of server_id. """
+        if len(self.filenames) == 1:
+            return 0
+        position = bisect(self._points, _hash(str(server_id)))
+        return self._owners[position % len(self._points)]
+
+    def route(self, server_id: int) -> str:
+        """ Get the filename of the shard of server_id. """
+        return self.filenames[self.index(server_id)]
+
+
+def get_router(db_filename: str, shards: int = None) -> ShardRouter:
+    """ Get the router that is shared by all users of a database file.
+
+        Params:
+            db_filename: str, required
+                filename of the database that is sharded.
+            shards: int, optional
+                amount of shards (default: DATABASE_SHARDS environment
+                variable or SHARDS).
+    """
+    if shards is None:
+        shards = int(os.getenv('DATABASE_SHARDS', SHARDS))
+    router = _routers.get((db_filename, shards))
+    if router is None:
+        router = ShardRouter(shard_filenames(db_filename, shards))
+        _routers[(db_filename, shards)] = router
+    return router
+
+
+def create_shards(db_filename: str, shards: int) -> None:
+    """ Create the shard files of a database with the project schema. """
+    env = dict(os.environ, DATABASE_FILE=db_filename,
+               DATABASE_SHARDS=str(shards))
+    subprocess.run([sys.executable, CREATE_SCRIPT], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def _servers(con) -> set:
+    return {row[0] for table in TABLES
+            for row in con.execute(f"SELECT DISTINCT server FROM {table}")}
+
+
+def _copy(con, target: str, server_ids: list, delete: bool) -> None:
+    """ Copy the servers from the main database of con into target.
+
+        The history gets new ids in target, the ids of different sources
+        overlap. It is copied in id order before the counts, so every
+        server keeps the order of its history and the counts end up as in
+        the source and not twice as high from the history triggers.
+    """
+    con.execute("ATTACH DATABASE (?) AS shard", (target,))
+    con.execute("CREATE TEMP TABLE moved (server INTEGER PRIMARY KEY)")
+    con.executemany("INSERT INTO moved (server) VALUES (?)",
+                    ((server_id,) for server_id in server_ids))
+    where = "WHERE server IN (SELECT server FROM moved)"
+    for table in TABLES:
+        if table == 'history':
+            con.execute(f"INSERT INTO shard.history (server, user, date) "
+                        f"SELECT server, user, date FROM main.history "
+                        f"{where} ORDER BY id")
+            continue
+        verb = 'INSERT OR REPLACE' if table == 'counts' else 'INSERT'
+        con.execute(f"{verb} INTO shard.{table} "
+                    f"SELECT * FROM main.{table} {where}")
+    if delete:
+        for table in reversed(TABLES):
+            con.execute(f"DELETE FROM main.{table} {where}")
+    con.commit()
+    con.execute("DROP TABLE moved")
+    con.execute("DETACH DATABASE shard")
+
+
+def split(sources: list, router: ShardRouter) -> dict:
+    """ Copy every server of the source files into its shard of router.
+
+        Copy into empty shards: servers are copied as they are, records
+        that already exist in a shard are not merged.
+
+        Parameters:
+            :sources: list, required
+                filenames of the database or shards to split.
+            :router: ShardRouter, required
+                router of the new shards.
+
+        Returns:
+            :servers: dict
+                amount of servers copied into every shard file.
+    """
+    copied = {filename: 0 for filename in router.filenames}
+    for source in sources:
+        con = sqlite3.connect(source)
+        targets = dict()
+        for server_id in _servers(con):
+            targets.setdefault(router.route(server_id), []).append(server_id)
+
+        for target, server_ids in targets.items():
+            if os.path.abspath(target) == os.path.abspath(source):
+                raise ValueError(f'{target} is both source and shard.')
+            _copy(con, target, server_ids, delete=False)
+            copied[target] += len(server_ids)
+        con.close()
+    return copied
+
+
+def reshard(old: ShardRouter, new: ShardRouter) -> dict:
+    """ Move the servers whose shard changes from the old to the new shards.
+
+        Only the servers that the ring of new gives to another file move,
+        going from N to N + 1 shards that is about 1/(N + 1) of them, all
+        onto the new shard. A moved server is copied into its new shard and
+        deleted from its old one. Shard files that new no longer uses are
+        left empty. Run with the bot stopped, on shards created with the
+        project schema.
+
+        Parameters:
+            :old: ShardRouter, required
+                router of the shards the servers are in now.
+            :new: ShardRouter, required
+                router of the shards the servers should be in.
+
+        Returns:
+            :servers: dict
+                amount of servers moved into every shard file of new.
+    """
+    moved = {filename: 0 for filename in new.filenames}
+    for source in old.filenames:
+        con = sqlite3.connect(source)
+        targets = dict()
+        for server_id in _servers(con):
+            target = new.route(server_id)
+            if os.path.abspath(target) != os.path.abspath(source):
+                targets.setdefault(target, []).append(server_id)
+
+        for target, server_ids in targets.items():
+            _copy(con, target, server_ids, delete=True)
+            moved[target] += len(server_ids)
+        con.close()
+    return moved
+
+
+def argparser():
+    """ Check for commandline arguments. """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--shards', type=int, required=True,
+                        help="amount of shards to split into.")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    load_dotenv()
+    db_filename = os.getenv('DATABASE_FILE')
+    shards = int(os.getenv('DATABASE_SHARDS', SHARDS))
+    args = argparser()
+
+    old = ShardRouter(shard_filenames(db_filename, shards))
+    new = ShardRouter(shard_filenames(db_filename, args.shards))
+    if len(new) == 1:
+        raise SystemExit('Split into at least 2 shards.')
+    if len(old) == len(new):
+        raise SystemExit(f'{db_filename} already has {len(new)} shards.')
+
+    start = time.perf_counter()
+    if len(old) == 1:
+        # The unsharded database is copied and kept as it is.
+        for filename in new.filenames:
+            if os.path.exists(filename):
+                raise SystemExit(f'{filename} already exists.')
+        create_shards(db_filename, args.shards)
+        servers = split([db_filename], new)
+    else:
+        create_shards(db_filename, args.shards)
+        servers = reshard(old, new)
+    for filename, count in servers.items():
+        print(f'{filename}: {count} servers')
+    print(f'moved {db_filename} from {len(old)} to {len(new)} shards in '
+          f'{time.perf_counter() - start:.2f}s, '
+          f'set DATABASE_SHARDS={args.shards}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Filename: snapshot.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Snapshotter class that copies the live database with the SQLite online
+  backup API while the bot keeps handling commands.
+- Keep a configurable amount of rotated snapshots.
+- [TODO]
+"""
+
+import asyncio
+import os
+import time
+
+from aiosqlite import connect
+
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.05
+BACKUP_KEEP = 7
+
+
+class Snapshotter:
+    """ Take online snapshots of a database file and rotate old ones.
+
+        The copy runs on a dedicated aiosqlite connection, so its worker
+        thread does the I/O and the event loop keeps serving commands. The
+        database is copied :pages: pages per step; between steps the source
+        is unlocked, so writers are never stalled for a whole copy. The copy
+        is written to a temporary file and renamed when it is complete, so a
+        snapshot file is never partial.
+    """
+    def __init__(self, db_filename: str, directory: str,
+                 keep: int = BACKUP_KEEP, pages: int = BACKUP_PAGES) -> None:
+        """ Initialise the snapshotter, nothing is copied yet.
+
+            Parameters:
+                :db_filename: str, required
+                    filename of the live database.
+                :directory: str, required
+                    directory the snapshots are written to.
+                :keep: int, optional
+                    amount of snapshots to keep, at least 1 (default:
+                    BACKUP_KEEP).
+                :pages: int, optional
+                    pages copied per step (default: BACKUP_PAGES).
+
+            Raises:
+                ValueError, if keep is below 1.
+        """
+        if keep < 1:
+            raise ValueError(f'Keep at least 1 snapshot, not {keep}.')
+        self.database = db_filename
+        self.directory = directory
+        self.keep = keep
+        self.pages = pages
+        self.last = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        """ Check if a snapshot is being taken right now. """
+        return self._lock.locked()
+
+    def snapshots(self) -> list:
+        """ List the snapshot files of the database, oldest first. """
+        prefix, _ext = os.path.splitext(os.path.basename(self.database))
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(f'{prefix}-')
+                       and name.endswith('.db'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    async def snapshot(self) -> str:
+        """ Copy the live database into a new snapshot file.
+
+            Concurrent calls wait for the running snapshot and take their
+            own one afterwards.
+
+            Returns:
+                :filename: str
+                    filename of the new snapshot.
+        """
+        async with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            prefix, _ext = os.path.splitext(os.path.basename(self.database))
+            # Microseconds keep snapshots taken within one second apart,
+            # a name that is taken anyway moves on to the next one.
+            micros = time.time_ns() // 1000
+            while True:
+                seconds, fraction = divmod(micros, 1000000)
+                stamp = time.strftime('%Y%m%d-%H%M%S',
+                                      time.localtime(seconds))
+                filename = os.path.join(
+                    self.directory, f'{prefix}-{stamp}-{fraction:06}.db')
+                if not os.path.exists(filename):
+                    break
+                micros += 1
+            partial = f'{filename}.partial'
+
+            source = await connect(self.database)
+            target = await connect(partial)
+            try:
+                await source.backup(target, pages=self.pages,
+                                    sleep=BACKUP_SLEEP)
+            finally:
+                await target.close()
+                await source.close()
+            os.replace(partial, filename)
+
+            self.last = filename
+            self._rotate()
+            return filename
+
+    def _rotate(self) -> None:
+        snapshots = self.snapshots()
+        for filename in snapshots[:max(0, len(snapshots) - self.keep)]:
+            os.remove(filename)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Filename: startup.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- StartupTimer class that measures the phases of the startup of the bot,
+  from process launch until it is ready.
+- [TODO]
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+def process_launched() -> float:
+    """ Get the time.monotonic() time the process was launched.
+
+        Read from /proc on Linux, in clock ticks. Elsewhere the time of the
+        first call is used, which leaves out the start of the interpreter.
+    """
+    now = time.monotonic()
+    try:
+        with open('/proc/self/stat') as stat:
+            # The command name may contain spaces, the fields follow it.
+            fields = stat.read().rpartition(')')[2].split()
+        ticks = int(fields[19])
+        age = (time.clock_gettime(time.CLOCK_BOOTTIME)
+               - ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return now
+    return now - max(age, 0.0)
+
+
+class StartupTimer:
+    """ Phases of the startup, relative to the launch of the process.
+
+        Phases may overlap, a warm-up that runs concurrently with the login
+        is reported next to it. The startup ends when ready() is called.
+    """
+    def __init__(self, launched: float = None) -> None:
+        """ Initialise the timer of a process launched at :launched:
+            (time.monotonic(), default: read with process_launched).
+        """
+        self.launched = process_launched() if launched is None else launched
+        self.finished = None
+        self.phases = []
+
+    def record(self, name: str, start: float, end: float = None) -> None:
+        """ Record a phase that ran from start until end (default: now). """
+        if end is None:
+            end = time.monotonic()
+        self.phases.append((name, start, end))
+
+    @contextmanager
+    def phase(self, name: str):
+        """ Context manager that records the block as phase name. """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def ready(self) -> bool:
+        """ End the startup, only the first call counts.
+
+            Returns:
+                bool, True if this call ended the startup.
+        """
+        if self.finished is not None:
+            return False
+        self.finished = time.monotonic()
+        return True
+
+    def breakdown(self) -> dict:
+        """ Get the seconds from launch until ready and of every phase. """
+        end = self.finished if self.finished is not None \
+            else time.monotonic()
+        times = {'total': end - self.launched}
+        for name, start, stop in self.phases:
+            times[name] = times.get(name, 0.0) + stop - start
+        return times
+
+    def report(self) -> str:
+        """ Get the breakdown as one line, phases in the order they began. """
+        times = self.breakdown()
+        phases = sorted(self.phases, key=lambda phase: phase[1])
+        names = list(dict.fromkeys(name for name, _start, _end in phases))
+        parts = [f'{name} {times[name]:.3f}s' for name in names]
+        return f"startup {times['total']:.3f}s: {', '.join(parts)}"
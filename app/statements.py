@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Filename: statements.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Registry of every SQL statement the SQLite storage runs, by name.
+- The statements are constant strings, so every connection prepares each
+  of them once and reuses it from its statement cache.
+- tests/test_statements.py checks the query plan of every statement.
+- [TODO]
+"""
+
+STATEMENTS = dict()
+# Maps the SQL of every statement back to its name, to label its metrics.
+NAMES = dict()
+
+
+def register(name: str, sql: str) -> str:
+    """ Add a statement to the registry and return its SQL.
+
+        Parameters:
+            :name: str, required
+                unique name of the statement.
+            :sql: str, required
+                the statement, with (?) placeholders.
+
+        Raises:
+            ValueError, if the name is already registered.
+    """
+    if name in STATEMENTS:
+        raise ValueError(f'Statement {name} is already registered.')
+    STATEMENTS[name] = sql
+    NAMES[sql] = name
+    return sql
+
+
+PING = register('ping', "SELECT 1")
+
+SCHEMA_VERSION = register('schema_version', (
+    "SELECT MAX(version) "
+    "FROM schema_version"
+))
+
+IN_USERS = register('in_users', (
+    "SELECT EXISTS("
+    "SELECT 1 "
+    "FROM users "
+    "WHERE server = (?) "
+    "AND id = (?) "
+    "LIMIT 1"
+    ")"
+))
+
+LIST_USERS = register('list_users', (
+    "SELECT users.id, users.name, counts.count "
+    "FROM users "
+    "LEFT JOIN counts ON counts.user = users.id "
+    "AND counts.server = users.server "
+    "WHERE users.server = (?)"
+))
+
+INSERT_USER = register('insert_user', (
+    "INSERT INTO users (id, server, name) "
+    "VALUES (?, ?, ?)"
+))
+
+INSERT_USERS = register('insert_users', (
+    "INSERT OR IGNORE INTO users (id, server, name) "
+    "VALUES (?, ?, ?)"
+))
+
+DELETE_USER = register('delete_user', (
+    "DELETE FROM users "
+    "WHERE server = (?) "
+    "AND id = (?)"
+))
+
+IN_ADMINS = register('in_admins', (
+    "SELECT EXISTS("
+    "SELECT 1 "
+    "FROM admins "
+    "WHERE server = (?) "
+    "AND user = (?) "
+    "LIMIT 1"
+    ")"
+))
+
+LIST_ADMIN_IDS = register('list_admin_ids', (
+    "SELECT user "
+    "FROM admins "
+    "WHERE server = (?)"
+))
+
+INSERT_ADMIN = register('insert_admin', (
+    "INSERT INTO admins (server, user) "
+    "VALUES (?, ?)"
+))
+
+INSERT_ADMINS = register('insert_admins', (
+    "INSERT OR IGNORE INTO admins (server, user) "
+    "VALUES (?, ?)"
+))
+
+DELETE_ADMIN = register('delete_admin', (
+    "DELETE FROM admins "
+    "WHERE server = (?) "
+    "AND user = (?)"
+))
+
+INSERT_HISTORY = register('insert_history', (
+    "INSERT INTO history (server, user, date) "
+    "VALUES (?, ?, COALESCE((?), DATE()))"
+))
+
+INSERT_HISTORIES = register('insert_histories', (
+    "INSERT INTO history (server, user, date) "
+    "VALUES (?, ?, ?)"
+))
+
+DELETE_HISTORY = register('delete_history', (
+    "DELETE FROM history "
+    "WHERE server = (?) "
+    "AND user = (?) "
+    "AND date = (?)"
+))
+
+LIST_HISTORY = register('list_history', (
+    "SELECT users.name, history.date "
+    "FROM history "
+    "INNER JOIN users ON history.user = users.id "
+    "AND history.server = users.server "
+    "WHERE history.server = (?) "
+    "ORDER BY history.date DESC, history.id DESC "
+    "LIMIT (?)"
+))
+
+_PAGE = (
+    "SELECT history.id, users.name, history.date "
+    "FROM history "
+    "INNER JOIN users ON history.user = users.id "
+    "AND history.server = users.server "
+    "WHERE history.server = (?) "
+)
+
+PAGE_HISTORY = register('page_history', _PAGE + (
+    "ORDER BY history.date DESC, history.id DESC "
+    "LIMIT (?)"
+))
+
+PAGE_HISTORY_BEFORE = register('page_history_before', _PAGE + (
+    "AND (history.date, history.id) < ((?), (?)) "
+    "ORDER BY history.date DESC, history.id DESC "
+    "LIMIT (?)"
+))
+
+# Walks towards newer records, the caller flips the page.
+PAGE_HISTORY_AFTER = register('page_history_after', _PAGE + (
+    "AND (history.date, history.id) > ((?), (?)) "
+    "ORDER BY history.date ASC, history.id ASC "
+    "LIMIT (?)"
+))
+
+# Pages of participants and admins in name order, straight from the
+# users(server, name, id) index.
+PAGE_USERS = register('page_users', (
+    "SELECT id, name "
+    "FROM users "
+    "WHERE server = (?) "
+    "ORDER BY name, id "
+    "LIMIT (?)"
+))
+
+PAGE_USERS_AFTER = register('page_users_after', (
+    "SELECT id, name "
+    "FROM users "
+    "WHERE server = (?) "
+    "AND (name, id) > ((?), (?)) "
+    "ORDER BY name, id "
+    "LIMIT (?)"
+))
+
+_ADMIN = (
+    "AND EXISTS("
+    "SELECT 1 "
+    "FROM admins "
+    "WHERE admins.server = users.server "
+    "AND admins.user = users.id"
+    ") "
+)
+
+PAGE_ADMINS = register('page_admins', (
+    "SELECT id, name "
+    "FROM users "
+    "WHERE server = (?) "
+) + _ADMIN + (
+    "ORDER BY name, id "
+    "LIMIT (?)"
+))
+
+PAGE_ADMINS_AFTER = register('page_admins_after', (
+    "SELECT id, name "
+    "FROM users "
+    "WHERE server = (?) "
+    "AND (name, id) > ((?), (?)) "
+) + _ADMIN + (
+    "ORDER BY name, id "
+    "LIMIT (?)"
+))
+
+INITIALISE_COUNT = register('initialise_count', (
+    "INSERT OR IGNORE INTO counts (server, user, count) "
+    "VALUES (?, ?, 0)"
+))
+
+GET_COUNT = register('get_count', (
+    "SELECT count "
+    "FROM counts "
+    "WHERE server = (?) "
+    "AND user = (?)"
+))
+
+RECOUNT = register('recount', (
+    "INSERT INTO counts (server, user, count) "
+    "SELECT server, user, COUNT(*) "
+    "FROM history "
+    "WHERE server = (?) "
+    "GROUP BY user "
+    "ON CONFLICT (server, user) DO UPDATE "
+    "SET count = excluded.count "
+    "WHERE count != excluded.count"
+))
+
+RECOUNT_ZERO = register('recount_zero', (
+    "UPDATE counts "
+    "SET count = 0 "
+    "WHERE server = (?) "
+    "AND count != 0 "
+    "AND user NOT IN ("
+    "SELECT user FROM history WHERE server = (?))"
+))
+
+# Skips from server to server with one index seek per table each,
+# instead of reading every row of the servers in between.
+LIST_SERVERS = register('list_servers', (
+    "WITH RECURSIVE servers (server) AS ("
+    "SELECT (?) "
+    "UNION ALL "
+    "SELECT (SELECT MIN(next) FROM ("
+    "SELECT MIN(server) AS next FROM counts "
+    "WHERE server > servers.server "
+    "UNION ALL "
+    "SELECT MIN(server) FROM history "
+    "WHERE server > servers.server)) "
+    "FROM servers "
+    "WHERE servers.server IS NOT NULL "
+    "LIMIT (?) + 1) "
+    "SELECT server FROM servers "
+    "WHERE server IS NOT NULL "
+    "LIMIT -1 OFFSET 1"
+))
+
+GET_SCHEDULE = register('get_schedule', (
+    "SELECT server, channel, weekday, time, mode, next_run "
+    "FROM schedules "
+    "WHERE server = (?)"
+))
+
+SET_SCHEDULE = register('set_schedule', (
+    "INSERT OR REPLACE INTO schedules "
+    "(server, channel, weekday, time, mode, next_run) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+))
+
+DELETE_SCHEDULE = register('delete_schedule', (
+    "DELETE FROM schedules "
+    "WHERE server = (?)"
+))
+
+# Only moves a schedule that was not changed since it was read.
+ADVANCE_SCHEDULE = register('advance_schedule', (
+    "UPDATE schedules "
+    "SET next_run = (?) "
+    "WHERE server = (?) "
+    "AND next_run = (?)"
+))
+
+LIST_SCHEDULES = register('list_schedules', (
+    "SELECT server, channel, weekday, time, mode, next_run "
+    "FROM schedules "
+    "WHERE server > (?) "
+    "ORDER BY server "
+    "LIMIT (?)"
+))
@@ -0,0 +1,898 @@
+#!/usr/bin/env python3
+"""
+Filename: storage.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Storage and Records interfaces of the users, admins, history, counts and
+  schedules of every server.
+- SQLite engine: sharded database files, read through the connection pools
+  and changed through the Writer of every shard.
+- Memory engine: dicts and sorted lists per server, for tests, benchmarks
+  and deployments that do not need to keep their records.
+- Function to get the engine of a database file.
+- [TODO]
+"""
+
+import asyncio
+import heapq
+import math
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import sharding
+import statements
+import tools
+
+ENGINE = 'sqlite'
+
+_memory = dict()
+
+
+class Records(ABC):
+    """ Records of the users, admins, history, counts and schedules
+        tables.
+
+        Records are either read outside of a transaction, from
+        Storage.reader, or read and changed inside one, from
+        Storage.transaction. History is ordered on (date, id), the id of a
+        record grows with every insert. Every history record that is
+        inserted adds one to the count of its user, every deleted record
+        subtracts one from an existing count.
+    """
+    @abstractmethod
+    async def in_users(self, server_id: int, user_id: int) -> bool:
+        """ Check if the user is participating in the server. """
+
+    @abstractmethod
+    async def list_users(self, server_id: int) -> list:
+        """ List (user_id, name, count) of every participant of the server,
+            count is None if the user has no count.
+        """
+
+    @abstractmethod
+    async def insert_user(self, server_id: int, user_id: int,
+                          display_name: str) -> None:
+        """ Add a user that is not participating yet to the server. """
+
+    @abstractmethod
+    async def insert_users(self, server_id: int, users: list) -> int:
+        """ Add (user_id, name) users, skipping users that participate.
+
+            Returns:
+                :added: int
+                    amount of users that were added.
+        """
+
+    @abstractmethod
+    async def delete_user(self, server_id: int, user_id: int) -> None:
+        """ Remove a user from the participants of the server. """
+
+    @abstractmethod
+    async def in_admins(self, server_id: int, user_id: int) -> bool:
+        """ Check if the user is an admin of the server. """
+
+    @abstractmethod
+    async def list_admin_ids(self, server_id: int) -> list:
+        """ List the user ids of the admins of the server. """
+
+    @abstractmethod
+    async def insert_admin(self, server_id: int, user_id: int) -> None:
+        """ Add a user that is not admin yet to the admins of the server. """
+
+    @abstractmethod
+    async def insert_admins(self, server_id: int, user_ids: list) -> int:
+        """ Add users to the admins, skipping users that are admin.
+
+            Returns:
+                :added: int
+                    amount of admins that were added.
+        """
+
+    @abstractmethod
+    async def delete_admin(self, server_id: int, user_id: int) -> None:
+        """ Remove a user from the admins of the server. """
+
+    @abstractmethod
+    async def page_users(self, server_id: int, size: int,
+                         after: tuple = None) -> list:
+        """ List (user_id, name) of one page of participants of the
+            server, ordered on (name, id).
+
+            Parameters:
+                :size: int, required
+                    maximum amount of participants on the page.
+                :after: tuple, optional
+                    (name, id) key, only participants after it are listed.
+        """
+
+    @abstractmethod
+    async def page_admins(self, server_id: int, size: int,
+                          after: tuple = None) -> list:
+        """ List (user_id, name) of one page of the admins of the server
+            that participate, ordered on (name, id) like page_users.
+        """
+
+    @abstractmethod
+    async def insert_history(self, server_id: int, user_id: int,
+                             date: str = None) -> None:
+        """ Add a history record, dated today (UTC) if date is None. """
+
+    @abstractmethod
+    async def insert_histories(self, server_id: int, records: list) -> int:
+        """ Add (user_id, date) history records.
+
+            Returns:
+                :inserted: int
+                    amount of records that were inserted.
+        """
+
+    @abstractmethod
+    async def delete_history(self, server_id: int, user_id: int,
+                             date: str) -> int:
+        """ Remove every history record of the user on date.
+
+            Returns:
+                :deleted: int
+                    amount of records that were deleted.
+        """
+
+    @abstractmethod
+    async def list_history(self, server_id: int, limit: int) -> list:
+        """ List (name, date) of the newest history records of
+            participants, newest first.
+        """
+
+    @abstractmethod
+    async def page_history(self, server_id: int, size: int,
+                           before: tuple = None,
+                           after: tuple = None) -> list:
+        """ List (id, name, date) of one page of history records of
+            participants, newest first.
+
+            Parameters:
+                :before: tuple, optional
+                    (date, id) key, only older records are on the page.
+                :after: tuple, optional
+                    (date, id) key, only newer records are on the page.
+        """
+
+    @abstractmethod
+    async def initialise_count(self, server_id: int, user_id: int) -> None:
+        """ Give the user a count of 0 if it has no count. """
+
+    @abstractmethod
+    async def initialise_counts(self, server_id: int,
+                                user_ids: list) -> None:
+        """ Give every user a count of 0 if it has no count. """
+
+    @abstractmethod
+    async def get_count(self, server_id: int, user_id: int) -> int:
+        """ Get the count of the user, 0 if it has no count. """
+
+    @abstractmethod
+    async def recount(self, server_id: int) -> int:
+        """ Set every count of the server to the amount of history records
+            of its user.
+
+            Returns:
+                :fixed: int
+                    amount of counts that were corrected or added.
+        """
+
+    @abstractmethod
+    async def list_servers(self, after: int, limit: int) -> list:
+        """ List ids of servers with counts or history, ascending.
+
+            Parameters:
+                :after: int, required
+                    only servers with a higher id are listed, None for all.
+                :limit: int, required
+                    maximum amount of servers.
+        """
+
+    @abstractmethod
+    async def get_schedule(self, server_id: int) -> tuple:
+        """ Get the schedule (server_id, channel_id, weekday, time, mode,
+            next_run) of the server, None if it has no schedule.
+        """
+
+    @abstractmethod
+    async def set_schedule(self, server_id: int, channel_id: int,
+                           weekday: int, time: str, mode: str,
+                           next_run: str) -> None:
+        """ Add the schedule of the server, replacing its schedule. """
+
+    @abstractmethod
+    async def delete_schedule(self, server_id: int) -> int:
+        """ Remove the schedule of the server.
+
+            Returns:
+                :deleted: int
+                    amount of schedules that were removed, 0 or 1.
+        """
+
+    @abstractmethod
+    async def advance_schedule(self, server_id: int, previous: str,
+                               next_run: str) -> int:
+        """ Move the next run of the schedule of the server from previous
+            to next_run, unless the schedule changed in the meantime.
+
+            Returns:
+                :advanced: int
+                    amount of schedules that were moved, 0 or 1.
+        """
+
+    @abstractmethod
+    async def list_schedules(self, after: int, limit: int) -> list:
+        """ List the schedules of servers, ascending on server id.
+
+            Parameters:
+                :after: int, required
+                    only servers with a higher id are listed, None for all.
+                :limit: int, required
+                    maximum amount of schedules.
+        """
+
+
+class Storage(ABC):
+    """ Engine that keeps the records of every server. """
+    @abstractmethod
+    def reader(self, server_id: int) -> Records:
+        """ Get the records to read the server from, outside of a
+            transaction.
+        """
+
+    @abstractmethod
+    def transaction(self, server_id: int):
+        """ Context manager that reads and changes the records of the server
+            in one transaction.
+
+            The records yielded by the block are committed when the block
+            returns, and rolled back when it raises.
+
+            Returns:
+                :records: Records
+                    records of the server inside the transaction.
+        """
+
+    @abstractmethod
+    async def list_servers(self, after: int, limit: int) -> list:
+        """ List ids of servers with counts or history, ascending.
+
+            Parameters:
+                :after: int, required
+                    only servers with a higher id are listed, None for all.
+                :limit: int, required
+                    maximum amount of servers.
+        """
+
+    @abstractmethod
+    async def list_schedules(self, after: int, limit: int) -> list:
+        """ List the schedules of servers, ascending on server id.
+
+            Parameters:
+                :after: int, required
+                    only servers with a higher id are listed, None for all.
+                :limit: int, required
+                    maximum amount of schedules.
+        """
+
+    @abstractmethod
+    async def ping(self) -> None:
+        """ Probe the engine, raises if the records cannot be read. """
+
+    async def warm_up(self) -> None:
+        """ Prepare the engine before the first command, raises if the
+            records cannot be read.
+        """
+        await self.ping()
+
+    def partition(self, server_ids) -> list:
+        """ Group server ids that can be changed in one transaction.
+
+            Returns:
+                :groups: list
+                    lists of server ids, the first server of every group
+                    opens its transaction.
+        """
+        server_ids = list(server_ids)
+        return [server_ids] if server_ids else []
+
+
+class SQLiteRecords(Records):
+    """ Records of one SQLite shard, read and changed with SQL statements.
+
+        :con: is the connection pool of the shard for reads, or a
+        transaction of its Writer.
+    """
+    def __init__(self, con) -> None:
+        """ Initialise the records that are read through con. """
+        self.con = con
+
+    async def in_users(self, server_id: int, user_id: int) -> bool:
+        values = (server_id, user_id)
+        result = await self.con.read(statements.IN_USERS, values)
+        return bool(result[0][0])
+
+    async def list_users(self, server_id: int) -> list:
+        values = (server_id,)
+        return await self.con.read(statements.LIST_USERS, values)
+
+    async def insert_user(self, server_id: int, user_id: int,
+                          display_name: str) -> None:
+        values = (user_id, server_id, display_name)
+        await self.con.push(statements.INSERT_USER, values)
+
+    async def insert_users(self, server_id: int, users: list) -> int:
+        values = [(user_id, server_id, name) for user_id, name in users]
+        return await self.con.push_many(statements.INSERT_USERS, values)
+
+    async def delete_user(self, server_id: int, user_id: int) -> None:
+        values = (server_id, user_id)
+        await self.con.push(statements.DELETE_USER, values)
+
+    async def in_admins(self, server_id: int, user_id: int) -> bool:
+        values = (server_id, user_id)
+        result = await self.con.read(statements.IN_ADMINS, values)
+        return bool(result[0][0])
+
+    async def list_admin_ids(self, server_id: int) -> list:
+        values = (server_id,)
+        rows = await self.con.read(statements.LIST_ADMIN_IDS, values)
+        return [row[0] for row in rows]
+
+    async def insert_admin(self, server_id: int, user_id: int) -> None:
+        values = (server_id, user_id)
+        await self.con.push(statements.INSERT_ADMIN, values)
+
+    async def insert_admins(self, server_id: int, user_ids: list) -> int:
+        values = [(server_id, user_id) for user_id in user_ids]
+        return await self.con.push_many(statements.INSERT_ADMINS, values)
+
+    async def delete_admin(self, server_id: int, user_id: int) -> None:
+        values = (server_id, user_id)
+        await self.con.push(statements.DELETE_ADMIN, values)
+
+    async def page_users(self, server_id: int, size: int,
+                         after: tuple = None) -> list:
+        if after is not None:
+            values = (server_id, *after, size)
+            return await self.con.read(statements.PAGE_USERS_AFTER, values)
+        values = (server_id, size)
+        return await self.con.read(statements.PAGE_USERS, values)
+
+    async def page_admins(self, server_id: int, size: int,
+                          after: tuple = None) -> list:
+        if after is not None:
+            values = (server_id, *after, size)
+            return await self.con.read(statements.PAGE_ADMINS_AFTER,
+                                       values)
+        values = (server_id, size)
+        return await self.con.read(statements.PAGE_ADMINS, values)
+
+    async def insert_history(self, server_id: int, user_id: int,
+                             date: str = None) -> None:
+        values = (server_id, user_id, date)
+        await self.con.push(statements.INSERT_HISTORY, values)
+
+    async def insert_histories(self, server_id: int, records: list) -> int:
+        values = [(server_id, user_id, date) for user_id, date in records]
+        return await self.con.push_many(statements.INSERT_HISTORIES, values)
+
+    async def delete_history(self, server_id: int, user_id: int,
+                             date: str) -> int:
+        values = (server_id, user_id, date)
+        return await self.con.push(statements.DELETE_HISTORY, values)
+
+    async def list_history(self, server_id: int, limit: int) -> list:
+        values = (server_id, limit)
+        return await self.con.read(statements.LIST_HISTORY, values)
+
+    async def page_history(self, server_id: int, size: int,
+                           before: tuple = None,
+                           after: tuple = None) -> list:
+        if after is not None:
+            values = (server_id, *after, size)
+            page = await self.con.read(statements.PAGE_HISTORY_AFTER,
+                                       values)
+            return page[::-1]
+        if before is not None:
+            values = (server_id, *before, size)
+            return await self.con.read(statements.PAGE_HISTORY_BEFORE,
+                                       values)
+        values = (server_id, size)
+        return await self.con.read(statements.PAGE_HISTORY, values)
+
+    async def initialise_count(self, server_id: int, user_id: int) -> None:
+        values = (server_id, user_id)
+        await self.con.push(statements.INITIALISE_COUNT, values)
+
+    async def initialise_counts(self, server_id: int,
+                                user_ids: list) -> None:
+        values = [(server_id, user_id) for user_id in user_ids]
+        await self.con.push_many(statements.INITIALISE_COUNT, values)
+
+    async def get_count(self, server_id: int, user_id: int) -> int:
+        values = (server_id, user_id)
+        result = await self.con.read(statements.GET_COUNT, values)
+        return result[0][0] if result else 0
+
+    async def recount(self, server_id: int) -> int:
+        fixed = await self.con.push(statements.RECOUNT, (server_id,))
+        fixed += await self.con.push(statements.RECOUNT_ZERO,
+                                     (server_id, server_id))
+        return fixed
+
+    async def list_servers(self, after: int, limit: int) -> list:
+        values = (-1 if after is None else after, limit)
+        rows = await self.con.read(statements.LIST_SERVERS, values)
+        return [row[0] for row in rows]
+
+    async def get_schedule(self, server_id: int) -> tuple:
+        rows = await self.con.read(statements.GET_SCHEDULE, (server_id,))
+        return tuple(rows[0]) if rows else None
+
+    async def set_schedule(self, server_id: int, channel_id: int,
+                           weekday: int, time: str, mode: str,
+                           next_run: str) -> None:
+        values = (server_id, channel_id, weekday, time, mode, next_run)
+        await self.con.push(statements.SET_SCHEDULE, values)
+
+    async def delete_schedule(self, server_id: int) -> int:
+        return await self.con.push(statements.DELETE_SCHEDULE, (server_id,))
+
+    async def advance_schedule(self, server_id: int, previous: str,
+                               next_run: str) -> int:
+        values = (next_run, server_id, previous)
+        return await self.con.push(statements.ADVANCE_SCHEDULE, values)
+
+    async def list_schedules(self, after: int, limit: int) -> list:
+        values = (-1 if after is None else after, limit)
+        rows = await self.con.read(statements.LIST_SCHEDULES, values)
+        return [tuple(row) for row in rows]
+
+
+class SQLiteStorage(Storage):
+    """ Records in SQLite database files, partitioned over shards.
+
+        A ShardRouter picks the shard of every server by its id. Every
+        shard is read through its shared connection pool and changed
+        through its shared Writer, so writes to servers on different
+        shards commit in parallel.
+    """
+    def __init__(self, db_filename: str, shards: int = None) -> None:
+        """ Initialise the shards of the database file.
+
+            Parameters:
+                :db_filename: str, required
+                    filename of the database.
+                :shards: int, optional
+                    amount of shard files (default: DATABASE_SHARDS
+                    environment variable or 1).
+        """
+        self.database = db_filename
+        self.router = sharding.get_router(db_filename, shards)
+        self.pools = [tools.get_pool(filename)
+                      for filename in self.router.filenames]
+        self.writers = [tools.get_writer(filename)
+                        for filename in self.router.filenames]
+        self.shards = [SQLiteRecords(pool) for pool in self.pools]
+
+    def reader(self, server_id: int) -> SQLiteRecords:
+        return self.shards[self.router.index(server_id)]
+
+    @asynccontextmanager
+    async def transaction(self, server_id: int):
+        writer = self.writers[self.router.index(server_id)]
+        async with writer.transaction() as txn:
+            yield SQLiteRecords(txn)
+
+    async def list_servers(self, after: int, limit: int) -> list:
+        server_ids = []
+        for records in self.shards:
+            server_ids.extend(await records.list_servers(after, limit))
+        return sorted(server_ids)[:limit]
+
+    async def list_schedules(self, after: int, limit: int) -> list:
+        schedules = []
+        for records in self.shards:
+            schedules.extend(await records.list_schedules(after, limit))
+        return sorted(schedules)[:limit]
+
+    async def ping(self) -> None:
+        for pool in self.pools:
+            await pool.read(statements.PING)
+
+    async def warm_up(self) -> None:
+        """ Check the schema and open the connections of every shard.
+
+            Raises:
+                RuntimeError, if a shard has no migrated schema.
+        """
+        async def shard(pool, writer):
+            try:
+                rows = await pool.read(statements.SCHEMA_VERSION)
+            except sqlite3.Error:
+                rows = [(None,)]
+            if not rows[0][0]:
+                raise RuntimeError(f'{pool.database} has no schema, run '
+                                   f'database/create_database.py first.')
+            # An empty unit starts the writer and its connection.
+            async with writer.transaction():
+                pass
+
+        await asyncio.gather(*(shard(pool, writer) for pool, writer
+                               in zip(self.pools, self.writers)))
+
+    def partition(self, server_ids) -> list:
+        groups = dict()
+        for server_id in server_ids:
+            groups.setdefault(self.router.index(server_id),
+                              []).append(server_id)
+        return list(groups.values())
+
+
+class _Guild:
+    """ Records of one server in memory. """
+    __slots__ = ('users', 'admins', 'counts', 'history')
+
+    def __init__(self) -> None:
+        self.users = dict()
+        self.admins = set()
+        self.counts = dict()
+        # (date, id, user) of every record, sorted.
+        self.history = []
+
+
+_EMPTY = _Guild()
+
+
+class MemoryRecords(Records):
+    """ Records of a MemoryStorage, read and changed in place.
+
+        Inside a transaction every change appends its inverse to :undo:,
+        rollback applies them in reverse order.
+    """
+    def __init__(self, storage, undo: list = None) -> None:
+        """ Initialise the records of storage. """
+        self.storage = storage
+        self.undo = undo
+
+    def _read(self, server_id: int) -> _Guild:
+        return self.storage.guilds.get(server_id, _EMPTY)
+
+    def _write(self, server_id: int) -> _Guild:
+        guild = self.storage.guilds.get(server_id)
+        if guild is None:
+            guild = self.storage.guilds[server_id] = _Guild()
+        return guild
+
+    def _set(self, mapping: dict, key, value) -> None:
+        if self.undo is not None:
+            if key in mapping:
+                old = mapping[key]
+                self.undo.append(lambda: mapping.__setitem__(key, old))
+            else:
+                self.undo.append(lambda: mapping.pop(key, None))
+        mapping[key] = value
+
+    def _pop(self, mapping: dict, key) -> None:
+        if key not in mapping:
+            return
+        old = mapping.pop(key)
+        if self.undo is not None:
+            self.undo.append(lambda: mapping.__setitem__(key, old))
+
+    def _add(self, items: set, item) -> bool:
+        if item in items:
+            return False
+        items.add(item)
+        if self.undo is not None:
+            self.undo.append(lambda: items.discard(item))
+        return True
+
+    def _discard(self, items: set, item) -> None:
+        if item not in items:
+            return
+        items.discard(item)
+        if self.undo is not None:
+            self.undo.append(lambda: items.add(item))
+
+    def _insert_record(self, guild: _Guild, user_id: int, date: str) -> None:
+        self.storage.last_id += 1
+        record = (date, self.storage.last_id, user_id)
+        insort(guild.history, record)
+        if self.undo is not None:
+            self.undo.append(lambda: guild.history.remove(record))
+        self._set(guild.counts, user_id, guild.counts.get(user_id, 0) + 1)
+
+    def rollback(self) -> None:
+        """ Undo every change of the transaction, newest first. """
+        while self.undo:
+            self.undo.pop()()
+
+    async def in_users(self, server_id: int, user_id: int) -> bool:
+        return user_id in self._read(server_id).users
+
+    async def list_users(self, server_id: int) -> list:
+        guild = self._read(server_id)
+        return [(user_id, name, guild.counts.get(user_id))
+                for user_id, name in guild.users.items()]
+
+    async def insert_user(self, server_id: int, user_id: int,
+                          display_name: str) -> None:
+        self._set(self._write(server_id).users, user_id, display_name)
+
+    async def insert_users(self, server_id: int, users: list) -> int:
+        guild = self._write(server_id)
+        added = 0
+        for user_id, name in users:
+            if user_id not in guild.users:
+                self._set(guild.users, user_id, name)
+                added += 1
+        return added
+
+    async def delete_user(self, server_id: int, user_id: int) -> None:
+        self._pop(self._read(server_id).users, user_id)
+
+    async def in_admins(self, server_id: int, user_id: int) -> bool:
+        return user_id in self._read(server_id).admins
+
+    async def list_admin_ids(self, server_id: int) -> list:
+        return list(self._read(server_id).admins)
+
+    async def insert_admin(self, server_id: int, user_id: int) -> None:
+        self._add(self._write(server_id).admins, user_id)
+
+    async def insert_admins(self, server_id: int, user_ids: list) -> int:
+        admins = self._write(server_id).admins
+        return sum(self._add(admins, user_id) for user_id in user_ids)
+
+    async def delete_admin(self, server_id: int, user_id: int) -> None:
+        self._discard(self._read(server_id).admins, user_id)
+
+    def _page_users(self, guild: _Guild, user_ids, size: int,
+                    after: tuple) -> list:
+        keys = ((guild.users[user_id], user_id) for user_id in user_ids
+                if user_id in guild.users)
+        if after is not None:
+            keys = (key for key in keys if key > tuple(after))
+        return [(user_id, name)
+                for name, user_id in heapq.nsmallest(size, keys)]
+
+    async def page_users(self, server_id: int, size: int,
+                         after: tuple = None) -> list:
+        guild = self._read(server_id)
+        return self._page_users(guild, guild.users, size, after)
+
+    async def page_admins(self, server_id: int, size: int,
+                          after: tuple = None) -> list:
+        guild = self._read(server_id)
+        return self._page_users(guild, guild.admins, size, after)
+
+    async def insert_history(self, server_id: int, user_id: int,
+                             date: str = None) -> None:
+        if date is None:
+            date = datetime.now(timezone.utc).date().isoformat()
+        self._insert_record(self._write(server_id), user_id, date)
+
+    async def insert_histories(self, server_id: int, records: list) -> int:
+        guild = self._write(server_id)
+        inserted = 0
+        for user_id, date in records:
+            self._insert_record(guild, user_id, date)
+            inserted += 1
+        return inserted
+
+    async def delete_history(self, server_id: int, user_id: int,
+                             date: str) -> int:
+        guild = self._read(server_id)
+        start = bisect_left(guild.history, (date,))
+        end = bisect_left(guild.history, (date, math.inf))
+        records = [record for record in guild.history[start:end]
+                   if record[2] == user_id]
+        for record in records:
+            guild.history.remove(record)
+            if self.undo is not None:
+                self.undo.append(lambda record=record:
+                                 insort(guild.history, record))
+            if user_id in guild.counts:
+                self._set(guild.counts, user_id, guild.counts[user_id] - 1)
+        return len(records)
+
+    async def list_history(self, server_id: int, limit: int) -> list:
+        page = await self.page_history(server_id, limit)
+        return [(name, date) for _id, name, date in page]
+
+    async def page_history(self, server_id: int, size: int,
+                           before: tuple = None,
+                           after: tuple = None) -> list:
+        guild = self._read(server_id)
+        history = guild.history
+        page = []
+        if after is not None:
+            # Walk towards newer records and flip the page afterwards.
+            position = bisect_left(history, (after[0], after[1] + 1))
+            while position < len(history) and len(page) < size:
+                date, record_id, user_id = history[position]
+                if user_id in guild.users:
+                    page.append((record_id, guild.users[user_id], date))
+                position += 1
+            return page[::-1]
+        if before is not None:
+            position = bisect_left(history, tuple(before)) - 1
+        else:
+            position = len(history) - 1
+        while position >= 0 and len(page) < size:
+            date, record_id, user_id = history[position]
+            if user_id in guild.users:
+                page.append((record_id, guild.users[user_id], date))
+            position -= 1
+        return page
+
+    async def initialise_count(self, server_id: int, user_id: int) -> None:
+        counts = self._write(server_id).counts
+        if user_id not in counts:
+            self._set(counts, user_id, 0)
+
+    async def initialise_counts(self, server_id: int,
+                                user_ids: list) -> None:
+        for user_id in user_ids:
+            await self.initialise_count(server_id, user_id)
+
+    async def get_count(self, server_id: int, user_id: int) -> int:
+        return self._read(server_id).counts.get(user_id, 0)
+
+    async def recount(self, server_id: int) -> int:
+        guild = self._read(server_id)
+        amounts = dict()
+        for _date, _id, user_id in guild.history:
+            amounts[user_id] = amounts.get(user_id, 0) + 1
+        fixed = 0
+        for user_id, amount in amounts.items():
+            if guild.counts.get(user_id) != amount:
+                self._set(guild.counts, user_id, amount)
+                fixed += 1
+        for user_id, count in list(guild.counts.items()):
+            if user_id not in amounts and count != 0:
+                self._set(guild.counts, user_id, 0)
+                fixed += 1
+        return fixed
+
+    async def list_servers(self, after: int, limit: int) -> list:
+        server_ids = sorted(
+            server_id for server_id, guild in self.storage.guilds.items()
+            if (guild.counts or guild.history)
+            and (after is None or server_id > after))
+        return server_ids[:limit]
+
+    async def get_schedule(self, server_id: int) -> tuple:
+        return self.storage.schedules.get(server_id)
+
+    async def set_schedule(self, server_id: int, channel_id: int,
+                           weekday: int, time: str, mode: str,
+                           next_run: str) -> None:
+        self._set(self.storage.schedules, server_id,
+                  (server_id, channel_id, weekday, time, mode, next_run))
+
+    async def delete_schedule(self, server_id: int) -> int:
+        if server_id not in self.storage.schedules:
+            return 0
+        self._pop(self.storage.schedules, server_id)
+        return 1
+
+    async def advance_schedule(self, server_id: int, previous: str,
+                               next_run: str) -> int:
+        schedule = self.storage.schedules.get(server_id)
+        if schedule is None or schedule[5] != previous:
+            return 0
+        self._set(self.storage.schedules, server_id,
+                  schedule[:5] + (next_run,))
+        return 1
+
+    async def list_schedules(self, after: int, limit: int) -> list:
+        server_ids = sorted(
+            server_id for server_id in self.storage.schedules
+            if after is None or server_id > after)
+        return [self.storage.schedules[server_id]
+                for server_id in server_ids[:limit]]
+
+
+class MemoryStorage(Storage):
+    """ Records in memory, lost when the process ends.
+
+        Every server keeps its participants, admins and counts in dicts and
+        its history in a list sorted on (date, id), so reads cost no I/O.
+        The schedules of all servers are kept in one dict. Transactions
+        run one at a time and are rolled back with an undo log.
+    """
+    def __init__(self) -> None:
+        """ Initialise the storage without any records. """
+        self.guilds = dict()
+        self.schedules = dict()
+        self.last_id = 0
+        self._lock = asyncio.Lock()
+        self._reader = MemoryRecords(self)
+
+    def reader(self, server_id: int) -> MemoryRecords:
+        return self._reader
+
+    @asynccontextmanager
+    async def transaction(self, server_id: int):
+        async with self._lock:
+            records = MemoryRecords(self, undo=[])
+            try:
+                yield records
+            except BaseException:
+                records.rollback()
+                raise
+
+    async def list_servers(self, after: int, limit: int) -> list:
+        return await self._reader.list_servers(after, limit)
+
+    async def list_schedules(self, after: int, limit: int) -> list:
+        return await self._reader.list_schedules(after, limit)
+
+    async def ping(self) -> None:
+        pass
+
+    def load(self, db_filename: str) -> None:
+        """ Copy every record of an SQLite database into memory. """
+        con = sqlite3.connect(db_filename)
+        guild = self._reader._write
+        for user_id, server_id, name in con.execute(
+                "SELECT id, server, name FROM users"):
+            guild(server_id).users[user_id] = name
+        for server_id, user_id in con.execute(
+                "SELECT server, user FROM admins"):
+            guild(server_id).admins.add(user_id)
+        for server_id, user_id, count in con.execute(
+                "SELECT server, user, count FROM counts"):
+            guild(server_id).counts[user_id] = count
+        for record_id, server_id, user_id, date in con.execute(
+                "SELECT id, server, user, date FROM history ORDER BY id"):
+            guild(server_id).history.append((date, record_id, user_id))
+            self.last_id = max(self.last_id, record_id)
+        for schedule in con.execute(
+                "SELECT server, channel, weekday, time, mode, next_run "
+                "FROM schedules"):
+            self.schedules[schedule[0]] = schedule
+        con.close()
+        for records in self.guilds.values():
+            records.history.sort()
+
+
+def get_storage(db_filename: str, shards: int = None,
+                engine: str = None) -> Storage:
+    """ Get the storage engine of a database file.
+
+        The memory engine of a database file is shared by all its users,
+        the SQLite engine shares the pools and writers of its shards.
+
+        Params:
+            db_filename: str, required
+                filename of the database.
+            shards: int, optional
+                amount of SQLite shard files (default: DATABASE_SHARDS
+                environment variable or 1).
+            engine: str, optional
+                sqlite or memory (default: DATABASE_ENGINE environment
+                variable or ENGINE).
+    """
+    if engine is None:
+        engine = os.getenv('DATABASE_ENGINE', ENGINE)
+    if engine == 'sqlite':
+        return SQLiteStorage(db_filename, shards)
+    if engine == 'memory':
+        storage = _memory.get(db_filename)
+        if storage is None:
+            storage = _memory[db_filename] = MemoryStorage()
+        return storage
+    raise ValueError(f'Database engine {engine} is unknown.')
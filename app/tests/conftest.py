@@ -7,18 +7,25 @@ Date:     July 24th 2022
 
 Summary:
 - Contains test fixtures for the different test cases.
+- FakeBot stand-in for the Discord bot of the cogs and the web server.
 - [TODO]
 """
 
+import asyncio
 import os
 import sqlite3
+import subprocess
+import sys
 
 import minion_meister
 import pytest
+import tools
 from dotenv import load_dotenv
 
 load_dotenv()
 DB_FILE = os.getenv('DATABASE_FILE')
+CREATE_SCRIPT = os.path.join(os.path.dirname(__file__), '..', '..',
+                             'database', 'create_database.py')
 
 
 @pytest.fixture(scope='function')
@@ -31,9 +38,68 @@ def db_conn():
 
 
 @pytest.fixture(scope='function')
-def mm():
+async def mm():
     MM = minion_meister.MinionMeister(DB_FILE)
-    return MM
+
+    yield MM
+
+    await tools.close_pools()
+
+
+@pytest.fixture(scope='function')
+def tmp_db(tmp_path):
+    """ Fresh database with the project schema for a single test. """
+    db_file = str(tmp_path / 'minion_meister.db')
+    env = dict(os.environ, DATABASE_FILE=db_file)
+    subprocess.run([sys.executable, CREATE_SCRIPT], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return db_file
+
+
+@pytest.fixture(scope='function')
+async def tmp_mm(tmp_db):
+    """ MinionMeister on a fresh database for a single test. """
+    MM = minion_meister.MinionMeister(tmp_db)
+
+    yield MM
+
+    await tools.close_pools()
+
+
+class FakeBot:
+    """ Stand-in for the Discord bot that the cogs and the web server use.
+    """
+    def __init__(self, MM, latency: float = 0.0, closed: bool = False,
+                 owner_id: int = None) -> None:
+        self.MM = MM
+        self.latency = latency
+        self.closed = closed
+        self.owner_id = owner_id
+        self.scheduler = None
+        # Arguments of the events wait_for hands out, in order.
+        self.events = []
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def is_owner(self, user) -> bool:
+        return user.id == self.owner_id
+
+    async def wait_for(self, event: str, timeout: float = None, check=None):
+        """ Get the first queued event that passes check, or time out when
+            no event is left.
+        """
+        while self.events:
+            args = self.events.pop(0)
+            if check is None or check(*args):
+                return args
+        raise asyncio.TimeoutError
+
+
+@pytest.fixture(scope='function')
+def fake_bot(tmp_mm):
+    """ FakeBot around the MinionMeister of a fresh database. """
+    return FakeBot(tmp_mm)
 
 
 @pytest.fixture(scope='function')
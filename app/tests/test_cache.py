@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Filename: test_cache.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the guild cache.
+- Contains unit tests for the permission cache.
+- [TODO]
+"""
+
+import pytest
+from cache import GuildCache, GuildState, TTLCache
+
+
+def test_cache_hit_miss():
+    """ Test if lookups are counted as hits and misses. """
+    guilds = GuildCache(size=2)
+    assert guilds.get(1) is None
+    guilds.put(1, GuildState({}, set()))
+    assert guilds.get(1) is not None
+    assert guilds.hits == 1
+    assert guilds.misses == 1
+
+
+def test_cache_lru_eviction():
+    """ Test if the least recently used guild is evicted first. """
+    guilds = GuildCache(size=2)
+    guilds.put(1, GuildState({}, set()))
+    guilds.put(2, GuildState({}, set()))
+    guilds.get(1)
+    guilds.put(3, GuildState({}, set()))
+    assert guilds.peek(1) is not None
+    assert guilds.peek(2) is None
+    assert guilds.peek(3) is not None
+    assert guilds.evictions == 1
+
+
+def test_cache_versions():
+    """ Test if committed changes move the version of their guild only. """
+    guilds = GuildCache(size=1)
+    assert guilds.version(1) == 0
+    guilds.updated(1)
+    guilds.updated(1)
+    guilds.updated(2)
+    assert guilds.version(1) == 2
+    assert guilds.version(2) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_write_through(tmp_mm):
+    """ Test if writes keep a cached guild current. """
+    await tmp_mm.add_user(1, 10, 'alice')
+    assert await tmp_mm.show_participants(1) == ['alice']
+    misses = tmp_mm.cache.misses
+
+    await tmp_mm.add_user(1, 11, 'bob')
+    await tmp_mm.admin_user(1, 11, 'bob')
+    assert await tmp_mm.show_participants(1) == ['alice', 'bob']
+    assert await tmp_mm.show_admins(1) == ['bob']
+    assert await tmp_mm.is_admin(1, 11)
+
+    await tmp_mm.unadmin_user(1, 11, 'bob')
+    await tmp_mm.remove_user(1, 10, 'alice')
+    assert not await tmp_mm.is_admin(1, 11)
+    assert not await tmp_mm.is_user(1, 10)
+    assert await tmp_mm.show_participants(1) == ['bob']
+    assert tmp_mm.cache.misses == misses
+
+
+def test_ttl_cache_expiry():
+    """ Test if remembered permissions expire after the ttl. """
+    now = [0.0]
+    permissions = TTLCache(ttl=10, clock=lambda: now[0])
+    permissions.put((1, 2), True)
+    now[0] = 9.0
+    assert permissions.get((1, 2)) is True
+    now[0] = 10.0
+    assert permissions.get((1, 2)) is None
+    assert len(permissions) == 0
+
+
+def test_ttl_cache_discard():
+    """ Test if a discarded permission is checked again. """
+    permissions = TTLCache(ttl=10)
+    permissions.put((1, 2), False)
+    assert permissions.get((1, 2)) is False
+    permissions.discard((1, 2))
+    assert permissions.get((1, 2)) is None
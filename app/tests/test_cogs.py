@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Filename: test_cogs.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the commands of the cogs, run on a fake bot.
+- Contains unit tests for paging through the history with reactions.
+- Contains unit tests for the remembered permission checks of the admin and
+  owner commands.
+- Contains unit tests for the backup command of the memory engine.
+- Contains unit tests for the roll command and its modes.
+- Contains unit tests for scheduling and unscheduling the weekly roll.
+- [TODO]
+"""
+
+from types import SimpleNamespace
+
+import error
+import pytest
+import minion_meister
+import scheduler
+from cogs import admin, member, owner
+
+ALICE = SimpleNamespace(id=10, display_name='alice')
+BOB = SimpleNamespace(id=11, display_name='bob')
+OWNER = SimpleNamespace(id=99, display_name='owner')
+# Saturday 2022-07-23 12:00 UTC.
+SATURDAY_NOON = scheduler.timestamp('2022-07-23 12:00')
+
+
+class Message:
+    """ Stand-in for a sent message that remembers its edits. """
+    def __init__(self, content: str) -> None:
+        self.id = 1
+        self.content = content
+        self.edits = []
+        self.reactions = []
+        self.cleared = False
+
+    async def add_reaction(self, emoji: str) -> None:
+        self.reactions.append(emoji)
+
+    async def edit(self, content: str) -> None:
+        self.content = content
+        self.edits.append(content)
+
+    async def remove_reaction(self, reaction, user) -> None:
+        pass
+
+    async def clear_reactions(self) -> None:
+        self.cleared = True
+
+
+class Context:
+    """ Stand-in for the context of a command of author in a guild. """
+    def __init__(self, guild_id: int, author=ALICE) -> None:
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = SimpleNamespace(id=100)
+        self.author = author
+        self.messages = []
+
+    async def send(self, content: str) -> Message:
+        message = Message(content)
+        self.messages.append(message)
+        return message
+
+
+def reaction(emoji: str, user=ALICE) -> tuple:
+    """ Arguments of a reaction_add event on the first message. """
+    return SimpleNamespace(emoji=emoji, message=SimpleNamespace(id=1)), user
+
+
+def history(*dates) -> str:
+    return 'Previous Minion Meisters:' + ''.join(
+        f'\n{date}, alice' for date in dates)
+
+
+@pytest.mark.asyncio
+async def test_history_paging(tmp_mm, fake_bot):
+    """ Test if the invoker pages both ways, stops at the ends and is the
+        only one who pages, until the reactions time out.
+    """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.bulk_insert_history(1, [(10, f'2022-07-0{day}')
+                                         for day in range(1, 6)])
+    fake_bot.events = [
+        reaction(member.NEXT, BOB),
+        reaction(member.PREVIOUS),
+        reaction(member.NEXT),
+        reaction(member.NEXT),
+        reaction(member.NEXT),
+        reaction('\U0001f44d'),
+        reaction(member.PREVIOUS),
+    ]
+    cog = member.MemberCog(fake_bot)
+    ctx = Context(1)
+    await cog.show_history.callback(cog, ctx, 2)
+
+    message, = ctx.messages
+    assert message.reactions == [member.PREVIOUS, member.NEXT]
+    # Paging past either end keeps the page, BOB and other emoji are
+    # ignored.
+    assert message.edits == [history('2022-07-03', '2022-07-02'),
+                             history('2022-07-01'),
+                             history('2022-07-03', '2022-07-02')]
+    assert fake_bot.events == []
+    assert message.cleared
+
+
+@pytest.fixture(scope='function')
+def checks(tmp_mm, fake_bot, tmp_path, monkeypatch):
+    """ Count the admin and owner lookups behind the permission checks. """
+    calls = {'is_admin': 0, 'is_owner': 0}
+    is_admin, is_owner = tmp_mm.is_admin, fake_bot.is_owner
+
+    async def counted_is_admin(server_id, user_id):
+        calls['is_admin'] += 1
+        return await is_admin(server_id, user_id)
+
+    async def counted_is_owner(user):
+        calls['is_owner'] += 1
+        return await is_owner(user)
+
+    monkeypatch.setattr(tmp_mm, 'is_admin', counted_is_admin)
+    monkeypatch.setattr(fake_bot, 'is_owner', counted_is_owner)
+    monkeypatch.setattr(owner, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    monkeypatch.setattr(owner, 'BACKUP_INTERVAL', 0)
+    fake_bot.owner_id = OWNER.id
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_permission_cache(tmp_mm, fake_bot, checks):
+    """ Test if repeated checks are answered from the permission cache. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.bulk_admin_users(1, [10])
+    admins = admin.AdminCog(fake_bot)
+    owners = owner.OwnerCog(fake_bot)
+
+    for _ in range(3):
+        assert await admins.cog_check(Context(1))
+        assert not await admins.cog_check(Context(1, BOB))
+        assert await owners.cog_check(Context(1, OWNER))
+        assert not await owners.cog_check(Context(1))
+    # Once per user for admins, the owner check of the admins included.
+    assert checks == {'is_admin': 2, 'is_owner': 4}
+    # Another guild is another key.
+    assert await admins.cog_check(Context(2)) is False
+    assert checks['is_admin'] == 3
+
+
+@pytest.mark.asyncio
+async def test_backup_memory_engine(fake_bot, checks, tmp_path,
+                                    monkeypatch):
+    """ Test if the memory engine gets no snapshots and no backup loop. """
+    monkeypatch.setattr(owner, 'BACKUP_INTERVAL', 24)
+    fake_bot.MM = minion_meister.MinionMeister(
+        str(tmp_path / 'minion_meister.db'), engine='memory')
+    owners = owner.OwnerCog(fake_bot)
+    assert owners.snapshots == []
+    assert not owners.scheduled_backup.is_running()
+    owners.cog_unload()
+
+    ctx = Context(1, OWNER)
+    await owners.backup.callback(owners, ctx)
+    assert [message.content for message in ctx.messages] == \
+        ['This database engine keeps no file, it has no snapshots.']
+    assert not (tmp_path / 'backups').exists()
+
+
+@pytest.mark.asyncio
+async def test_admin_invalidates_permissions(tmp_mm, fake_bot, checks):
+    """ Test if !admin and !unadmin forget the check of their user. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    admins = admin.AdminCog(fake_bot)
+    owners = owner.OwnerCog(fake_bot)
+    assert not await admins.cog_check(Context(1, BOB))
+    assert not await admins.cog_check(Context(1))
+
+    await owners.admin.callback(owners, Context(1, OWNER), BOB)
+    assert await admins.cog_check(Context(1, BOB))
+    # The checks of other users are still remembered.
+    assert not await admins.cog_check(Context(1))
+    assert checks['is_admin'] == 3
+
+    await owners.unadmin.callback(owners, Context(1, OWNER), BOB)
+    assert not await admins.cog_check(Context(1, BOB))
+    assert checks['is_admin'] == 4
+
+
+@pytest.mark.asyncio
+async def test_roll(tmp_mm, fake_bot, monkeypatch):
+    """ Test if !roll and !roll fair pick a winner in their mode. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    modes = []
+    select_winner = tmp_mm.select_winner
+
+    async def recorded_select_winner(server_id, fair=False):
+        modes.append(fair)
+        return await select_winner(server_id, fair)
+
+    monkeypatch.setattr(tmp_mm, 'select_winner', recorded_select_winner)
+    cog = admin.AdminCog(fake_bot)
+    ctx = Context(1)
+    await cog.select_winner.callback(cog, ctx)
+    await cog.select_winner.callback(cog, ctx, 'fair')
+
+    assert modes == [False, True]
+    assert [message.content for message in ctx.messages] == \
+        ['The Minion Meister is now <@10>'] * 2
+    assert await tmp_mm.show_count(1) == (('alice',), (2,))
+
+
+@pytest.mark.asyncio
+async def test_roll_invalid_mode(tmp_mm, fake_bot):
+    """ Test if an unknown mode is refused before anything is rolled. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    cog = admin.AdminCog(fake_bot)
+    ctx = Context(1)
+    with pytest.raises(error.InvalidRollModeError):
+        await cog.select_winner.callback(cog, ctx, 'unfair')
+    assert ctx.messages == []
+    assert await tmp_mm.show_count(1) == (('alice',), (0,))
+
+
+@pytest.fixture(scope='function')
+def schedule_cog(tmp_mm, fake_bot):
+    """ AdminCog whose bot runs a scheduler on a clock at SATURDAY_NOON. """
+    async def announce(channel_id: int, message: str) -> None:
+        pass
+
+    fake_bot.scheduler = scheduler.Scheduler(tmp_mm, announce,
+                                             now=lambda: SATURDAY_NOON)
+    return admin.AdminCog(fake_bot)
+
+
+@pytest.mark.asyncio
+async def test_schedule_validation(tmp_mm, schedule_cog):
+    """ Test if invalid schedules are refused and nothing is stored. """
+    cog = schedule_cog
+    ctx = Context(1)
+    for args in (('someday', '18:00'), ('sat', '18:60'), ('sat', None)):
+        with pytest.raises(error.InvalidScheduleError):
+            await cog.schedule.callback(cog, ctx, *args)
+    with pytest.raises(error.InvalidRollModeError):
+        await cog.schedule.callback(cog, ctx, 'sat', '18:00', 'unfair')
+    with pytest.raises(error.NoScheduleError):
+        await cog.schedule.callback(cog, ctx)
+    assert ctx.messages == []
+    assert len(cog.bot.scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_schedule(tmp_mm, schedule_cog):
+    """ Test if !schedule stores the schedule and shows it. """
+    cog = schedule_cog
+    ctx = Context(1)
+    await cog.schedule.callback(cog, ctx, 'Saturday', '9:30')
+    await cog.schedule.callback(cog, ctx, 'sat', '18:00', 'fair')
+    await cog.schedule.callback(cog, ctx)
+
+    stored = (1, 100, 5, '18:00', 'fair', '2022-07-23 18:00')
+    assert await tmp_mm.show_schedule(1) == stored
+    assert [message.content for message in ctx.messages] == [
+        'A roll is scheduled every Saturday at 09:30 UTC in <#100>, '
+        'next on 2022-07-30 09:30 UTC.'] + [scheduler.describe(stored)] * 2
+    assert cog.bot.scheduler.next_due() == \
+        scheduler.timestamp('2022-07-23 18:00')
+
+
+@pytest.mark.asyncio
+async def test_unschedule(tmp_mm, schedule_cog):
+    """ Test if !unschedule removes the schedule and its roll. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    cog = schedule_cog
+    ctx = Context(1)
+    await cog.schedule.callback(cog, ctx, 'sat', '18:00')
+    await cog.unschedule.callback(cog, ctx)
+
+    assert ctx.messages[-1].content == \
+        'The weekly roll is no longer scheduled.'
+    with pytest.raises(error.NoScheduleError):
+        await tmp_mm.show_schedule(1)
+    with pytest.raises(error.NoScheduleError):
+        await cog.unschedule.callback(cog, ctx)
+    week = 7 * 24 * 3600
+    assert await cog.bot.scheduler.run_due(SATURDAY_NOON + week) == 0
+    assert await tmp_mm.show_count(1) == (('alice',), (0,))
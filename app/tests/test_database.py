@@ -10,6 +10,8 @@ Summary:
 - [TODO]
 """
 
+import sqlite3
+
 
 def test_connection(db_conn):
     """ Test if the database connection fixture works. """
@@ -77,3 +79,12 @@ def test_admins_table(db_conn):
     for sid, uid in cur:
         assert isinstance(sid, int)
         assert isinstance(uid, int)
+
+
+def test_migrations_recorded(tmp_db):
+    """ Test if every migration is recorded in schema_version. """
+    conn = sqlite3.connect(tmp_db)
+    versions = conn.execute("SELECT version FROM schema_version").fetchall()
+    conn.close()
+    assert versions == [(1,), (2,), (3,), (4,), (5,)]
+
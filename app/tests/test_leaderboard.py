@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Filename: test_leaderboard.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the leaderboard and its sorted keys.
+- Contains unit tests for counts and ranks served from the leaderboard.
+- [TODO]
+"""
+
+import random
+
+import error
+import pytest
+from leaderboard import BLOCK_SIZE, Leaderboard, SortedKeys
+
+
+def test_leaderboard_order():
+    """ Test if participants are sorted by count, then by name. """
+    board = Leaderboard({1: 'carol', 2: 'alice', 3: 'bob'},
+                        {1: 2, 2: 0, 3: 2})
+    assert board.top() == [('bob', 2), ('carol', 2), ('alice', 0)]
+    assert board.top(1) == [('bob', 2)]
+
+
+def test_leaderboard_update():
+    """ Test if changed counts move participants and ties share a rank. """
+    board = Leaderboard({1: 'carol', 2: 'alice', 3: 'bob'})
+    board.update(2, 3)
+    board.update(1, 1)
+    board.update(3, 1)
+    assert board.rank(2) == (1, 3)
+    assert board.rank(1) == (2, 1)
+    assert board.rank(3) == (2, 1)
+
+    board.add(4, 'dave', 5)
+    board.remove(2)
+    assert board.top() == [('dave', 5), ('bob', 1), ('carol', 1)]
+    assert board.rank(2) is None
+    assert len(board) == 3
+
+
+def test_leaderboard_page():
+    """ Test if pages follow the order of top after a moved key. """
+    board = Leaderboard({1: 'carol', 2: 'alice', 3: 'bob'},
+                        {1: 2, 2: 0, 3: 2})
+    first = board.page(2)
+    assert first == [(3, 'bob', 2), (1, 'carol', 2)]
+    # Moving a participant of the first page does not repeat it.
+    board.update(3, 1)
+    assert board.page(2, after=(2, 'carol', 1)) == [(3, 'bob', 1),
+                                                    (2, 'alice', 0)]
+    assert board.page(2, after=(0, 'alice', 2)) == []
+
+
+def test_sorted_keys_blocks():
+    """ Test if keys stay sorted while blocks split and empty. """
+    rng = random.Random(7)
+    keys = SortedKeys()
+    expected = []
+    for key in rng.sample(range(10 * BLOCK_SIZE), 5 * BLOCK_SIZE):
+        keys.add(key)
+        expected.append(key)
+    expected.sort()
+    assert list(keys) == expected
+    for key in rng.sample(expected, 4 * BLOCK_SIZE):
+        keys.remove(key)
+        expected.remove(key)
+    assert list(keys) == expected and len(keys) == len(expected)
+    for probe in rng.sample(range(10 * BLOCK_SIZE), 200):
+        start = keys.bisect_right(probe)
+        assert keys.bisect_left(probe) == sum(key < probe for key in expected)
+        assert keys.slice(start, start + 50) == expected[start:start + 50]
+    for key in list(expected):
+        keys.remove(key)
+    assert list(keys) == [] and keys.slice(0) == []
+    keys.add(1)
+    assert keys.slice(0, 5) == [1]
+
+
+@pytest.mark.asyncio
+async def test_show_rank(tmp_mm):
+    """ Test if counts and ranks follow rolls and history writes. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    await tmp_mm.insert_history(1, 11, '2022-07-02')
+    assert await tmp_mm.show_rank(1, 11, 'bob') == (1, 1, 2)
+    assert await tmp_mm.show_count(1) == (('bob', 'alice'), (1, 0))
+
+    await tmp_mm.insert_history(1, 10, '2022-07-09')
+    await tmp_mm.insert_history(1, 10, '2022-07-16')
+    assert await tmp_mm.show_rank(1, 11, 'bob') == (2, 1, 2)
+    assert await tmp_mm.show_count(1, 1) == (('alice',), (2,))
+    for limit in (0, -1):
+        with pytest.raises(error.InvalidLimitError):
+            await tmp_mm.show_count(1, limit)
+
+    winner = await tmp_mm.select_winner(1)
+    names, count = await tmp_mm.show_count(1)
+    assert sum(count) == 4
+    assert (await tmp_mm.show_rank(1, winner, ''))[1] >= 2
+
+    await tmp_mm.remove_user(1, 11, 'bob')
+    with pytest.raises(error.NotParticipatingError):
+        await tmp_mm.show_rank(1, 11, 'bob')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Filename: test_metrics.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the Prometheus metrics.
+- Contains unit tests for the query metrics of MinionMeister methods.
+- [TODO]
+"""
+
+import sqlite3
+
+import metrics
+import pytest
+
+
+def test_render():
+    """ Test if counters and histograms render in the text format. """
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter('test_total', 'Test.',
+                                                ('name',)))
+    histogram = registry.register(metrics.Histogram(
+        'test_seconds', 'Test.', ('name',), buckets=(0.1, 1.0)))
+    counter.inc('a"b')
+    histogram.observe(0.05, 'x')
+    histogram.observe(0.5, 'x')
+    histogram.observe(5, 'x')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_total counter' in lines
+    assert 'test_total{name="a\\"b"} 1' in lines
+    assert 'test_seconds_bucket{name="x",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{name="x",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{name="x",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{name="x"} 3' in lines
+
+
+@pytest.mark.asyncio
+async def test_query_metrics(tmp_mm):
+    """ Test if statements are labelled with the method and their name. """
+    page = ('history_page', 'page_history', 'read')
+    insert = ('bulk_add_users', 'insert_users', 'push_many')
+    reads = metrics.QUERY_SECONDS.count(*page)
+    pushes = metrics.QUERY_SECONDS.count(*insert)
+    rows = metrics.QUERY_ROWS.value(*insert)
+
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    await tmp_mm.bulk_insert_history(1, [(10, '2022-07-02')])
+    await tmp_mm.history_page(1)
+
+    assert metrics.QUERY_SECONDS.count(*page) == reads + 1
+    assert metrics.QUERY_SECONDS.count(*insert) == pushes + 1
+    assert metrics.QUERY_ROWS.value(*insert) == rows + 2
+    assert metrics.current_method() == ''
+
+
+@pytest.mark.asyncio
+async def test_query_errors(tmp_mm):
+    """ Test if failing statements are counted as errors. """
+    errors = metrics.QUERY_ERRORS.value('', '', 'read')
+    with pytest.raises(sqlite3.OperationalError):
+        await tmp_mm.storage.pools[0].read("SELECT * FROM missing")
+    assert metrics.QUERY_ERRORS.value('', '', 'read') == errors + 1
+
+
+def test_collected():
+    """ Test if collected values are read when they are rendered. """
+    values = {('a',): 1}
+    registry = metrics.Registry()
+    registry.register(metrics.Collected('test_total', 'Test.',
+                                        lambda: values.items(), ('name',),
+                                        kind='counter'))
+    values[('a',)] = 2
+    lines = registry.render().splitlines()
+    assert '# TYPE test_total counter' in lines
+    assert 'test_total{name="a"} 2' in lines
@@ -10,6 +10,7 @@ Summary:
 - [TODO]
 """
 
+import error
 import pytest
 from discord import DiscordException
 
@@ -161,3 +162,55 @@ async def test_remove_user_error(mm, mm_data: dict):
         assert False
     except DiscordException:
         assert True
+
+
+@pytest.mark.asyncio
+async def test_bulk_import(tmp_mm):
+    """ Test if bulk imports add records and count history per user. """
+    added = await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    assert added == 2
+    assert await tmp_mm.bulk_add_users(1, [(10, 'alice')]) == 0
+    assert await tmp_mm.bulk_admin_users(1, [11]) == 1
+    records = [(10, '2022-07-02'), (11, '2022-07-09'), (10, '2022-07-16')]
+    assert await tmp_mm.bulk_insert_history(1, records) == 3
+
+    assert await tmp_mm.show_participants(1) == ['alice', 'bob']
+    assert await tmp_mm.show_admins(1) == ['bob']
+    names, count = await tmp_mm.show_count(1)
+    assert dict(zip(names, count)) == {'alice': 2, 'bob': 1}
+
+
+@pytest.mark.asyncio
+async def test_history_page(tmp_mm):
+    """ Test if keyset pages walk the history in both directions. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    # Two records share a date, so the id has to break the tie.
+    records = [(10, '2022-07-02'), (11, '2022-07-09'), (10, '2022-07-09'),
+               (11, '2022-07-16'), (10, '2022-07-23')]
+    await tmp_mm.bulk_insert_history(1, records)
+
+    first = await tmp_mm.history_page(1, size=2)
+    assert [date for _id, _name, date in first] == ['2022-07-23',
+                                                    '2022-07-16']
+    last_id, _name, last_date = first[-1]
+    second = await tmp_mm.history_page(1, size=2,
+                                       before=(last_date, last_id))
+    assert [date for _id, _name, date in second] == ['2022-07-09',
+                                                     '2022-07-09']
+    assert second[0][0] > second[1][0]
+    last_id, _name, last_date = second[-1]
+    third = await tmp_mm.history_page(1, size=2, before=(last_date, last_id))
+    assert [name for _id, name, _date in third] == ['alice']
+    assert await tmp_mm.history_page(1, size=2,
+                                     before=(third[0][2], third[0][0])) == []
+
+    first_id, _name, first_date = second[0]
+    assert await tmp_mm.history_page(
+        1, size=2, after=(first_date, first_id)) == first
+
+
+@pytest.mark.asyncio
+async def test_history_page_empty(tmp_mm):
+    """ Test if the first page of an empty history raises an error. """
+    with pytest.raises(error.NoMinionMeisterError):
+        await tmp_mm.history_page(1)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Filename: test_reconcile.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the triggers that maintain the counts table.
+- Contains unit tests for the counts reconcile tool.
+- [TODO]
+"""
+
+import sqlite3
+
+import pytest
+from reconcile import reconcile
+
+
+async def counts(MM, server_id: int) -> dict:
+    names, count = await MM.show_count(server_id)
+    return dict(zip(names, count))
+
+
+@pytest.mark.asyncio
+async def test_triggers_count_history(tmp_mm):
+    """ Test if history writes update the counts without drifting. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    await tmp_mm.insert_history(1, 10, '2022-07-02')
+    await tmp_mm.bulk_insert_history(1, [(10, '2022-07-09'),
+                                         (11, '2022-07-16')])
+    assert await counts(tmp_mm, 1) == {'alice': 2, 'bob': 1}
+
+    assert await tmp_mm.delete_history(1, 11, '2022-07-16') == 1
+    # Deleting a missing record must not decrement the count again.
+    assert await tmp_mm.delete_history(1, 11, '2022-07-16') == 0
+    assert await counts(tmp_mm, 1) == {'alice': 2, 'bob': 0}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fixes_drift(tmp_mm):
+    """ Test if reconcile rebuilds drifted counts and skips correct ones. """
+    for server_id in (1, 2, 3):
+        await tmp_mm.bulk_add_users(server_id, [(10, 'alice'),
+                                                (11, 'bob')])
+        await tmp_mm.bulk_insert_history(server_id, [(10, '2022-07-02')])
+
+    conn = sqlite3.connect(tmp_mm.database)
+    conn.execute("UPDATE counts SET count = 5 WHERE server = 1 AND user = 11")
+    conn.execute("DELETE FROM counts WHERE server = 3 AND user = 10")
+    conn.commit()
+    conn.close()
+
+    result = await reconcile(tmp_mm, batch=2)
+    assert result == {'servers': 3, 'fixed': 2}
+    for server_id in (1, 2, 3):
+        assert await counts(tmp_mm, server_id) == {'alice': 1, 'bob': 0}
+    assert await reconcile(tmp_mm, [1, 2]) == {'servers': 2, 'fixed': 0}
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Filename: test_render.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for rendering streamed lists into messages below the
+  Discord size limit.
+- Contains unit tests for streaming the lists of large guilds.
+- Contains unit tests for the list commands of members.
+- [TODO]
+"""
+
+import functools
+import time
+from types import SimpleNamespace
+
+import error
+import pytest
+import render
+from cogs.member import MemberCog
+
+
+class Channel:
+    """ Stand-in for a channel that remembers every message. """
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message: str) -> None:
+        self.messages.append(message)
+
+
+class Context(Channel):
+    """ Stand-in for the context of a command in a guild. """
+    def __init__(self, guild_id: int):
+        super().__init__()
+        self.guild = SimpleNamespace(id=guild_id)
+
+
+async def stream(lines):
+    for line in lines:
+        yield line
+
+
+async def collect(chunks) -> list:
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_chunks():
+    """ Test if lines are split over messages below the limit. """
+    lines = [f'user{number}' for number in range(100)]
+    chunks = await collect(render.chunks('Participants:', stream(lines),
+                                         limit=100))
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert '\n'.join(chunks).split('\n') == ['Participants:'] + lines
+
+    assert await collect(render.chunks('Admins:', stream([]))) == ['Admins:']
+    long = await collect(render.chunks('', stream(['x' * 500]), limit=100))
+    assert len(long) == 1 and len(long[0]) <= 100
+
+
+@pytest.mark.asyncio
+async def test_chunks_max_messages():
+    """ Test if the rest of the lines is left out after max_messages. """
+    lines = [f'user{number}' for number in range(1000)]
+    chunks = await collect(render.chunks('Participants:', stream(lines),
+                                         limit=100, max_messages=3))
+    assert len(chunks) == 3
+    assert chunks[-1].endswith(f'\n{render.MORE}')
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
+@pytest.mark.asyncio
+async def test_send_lines_paced():
+    """ Test if messages are sent no closer than the interval. """
+    channel = Channel()
+    lines = stream(['x' * 1500, 'y' * 1500, 'z' * 1500])
+    start = time.monotonic()
+    assert await render.send_lines(channel, 'Header:', lines,
+                                   interval=0.05) == 3
+    assert time.monotonic() - start >= 0.1
+    assert all(len(message) <= render.MESSAGE_LIMIT
+               for message in channel.messages)
+
+
+@pytest.mark.asyncio
+async def test_stream_large_guild(tmp_mm):
+    """ Test if every participant of a large guild is streamed in pages. """
+    users = [(user_id, f'user{user_id:04}') for user_id in range(1, 1001)]
+    await tmp_mm.bulk_add_users(1, users)
+    await tmp_mm.bulk_admin_users(1, [1, 2, 999])
+    await tmp_mm.bulk_insert_history(1, [(5, '2022-07-02')])
+
+    by_name = functools.partial(tmp_mm.participants_page, 1)
+    rows = render.rows(by_name, key=lambda row: (row[1], row[0]), size=64)
+    assert [row async for row in rows] == users
+
+    by_name = functools.partial(tmp_mm.admins_page, 1)
+    rows = render.rows(by_name, key=lambda row: (row[1], row[0]), size=2)
+    assert [name async for _id, name in rows] == \
+        ['user0001', 'user0002', 'user0999']
+
+    by_count = functools.partial(tmp_mm.count_page, 1)
+    rows = render.rows(by_count, key=lambda row: (row[2], row[1], row[0]),
+                       size=64)
+    counts = [row async for row in rows]
+    assert len(counts) == 1000
+    assert counts[0] == (5, 'user0005', 1)
+
+    channel = Channel()
+    rows = render.rows(functools.partial(tmp_mm.participants_page, 1),
+                       key=lambda row: (row[1], row[0]))
+    await render.send_lines(channel, 'Participants:',
+                            (name async for _id, name in rows), interval=0)
+    assert len(channel.messages) == 5
+    assert all(len(message) <= render.MESSAGE_LIMIT
+               for message in channel.messages)
+
+
+@pytest.mark.asyncio
+async def test_stream_empty_guild(tmp_mm):
+    """ Test if an empty guild raises before anything is sent. """
+    with pytest.raises(error.NoParticipantsError):
+        await tmp_mm.participants_page(1)
+    with pytest.raises(error.NoAdminsError):
+        await tmp_mm.admins_page(1)
+    with pytest.raises(error.NoMinionMeisterError):
+        await tmp_mm.count_page(1)
+
+
+@pytest.mark.asyncio
+async def test_member_commands(tmp_mm, fake_bot):
+    """ Test if the list commands stream their lists. """
+    await tmp_mm.bulk_add_users(1, [(10, 'bob'), (11, 'alice')])
+    await tmp_mm.bulk_admin_users(1, [10])
+    await tmp_mm.bulk_insert_history(1, [(10, '2022-07-02')])
+    cog = MemberCog(fake_bot)
+    ctx = Context(1)
+
+    await cog.list_participants.callback(cog, ctx)
+    await cog.show_admins.callback(cog, ctx)
+    await cog.show_count.callback(cog, ctx)
+    await cog.show_count.callback(cog, ctx, 1)
+    assert ctx.messages == ['Participants:\nalice\nbob', 'Admins:\nbob',
+                            'Times selected as Minion Meister:\n1, bob\n'
+                            '0, alice',
+                            'Times selected as Minion Meister:\n1, bob']
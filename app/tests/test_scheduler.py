@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Filename: test_scheduler.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for parsing and computing the runs of schedules.
+- Contains unit tests for the Scheduler: due rolls, catch-up after
+  downtime, retried failures, changed schedules and the timer of the
+  running task.
+- [TODO]
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import error
+import metrics
+import pytest
+import scheduler
+
+# Saturday 2022-07-23 12:00 UTC.
+SATURDAY_NOON = scheduler.timestamp('2022-07-23 12:00')
+WEEK = 7 * 24 * 3600
+
+
+class Announcements:
+    """ Stand-in for the bot that remembers every announcement. """
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, channel_id: int, message: str) -> None:
+        self.messages.append((channel_id, message))
+
+
+def test_parse_schedule():
+    """ Test if weekdays and times are parsed and checked. """
+    assert scheduler.parse_schedule('Saturday', '18:00') == (5, '18:00')
+    assert scheduler.parse_schedule('mon', '9:05') == (0, '09:05')
+    for weekday, time_ in (('sa', '18:00'), ('someday', '18:00'),
+                           ('sat', '25:00'), ('sat', None), (None, None)):
+        with pytest.raises(error.InvalidScheduleError):
+            scheduler.parse_schedule(weekday, time_)
+
+
+def test_next_run():
+    """ Test if the next run is the first one strictly after a moment. """
+    assert scheduler.next_run(5, '18:00', SATURDAY_NOON) == '2022-07-23 18:00'
+    assert scheduler.next_run(5, '12:00', SATURDAY_NOON) == '2022-07-30 12:00'
+    assert scheduler.next_run(0, '09:00', SATURDAY_NOON) == '2022-07-25 09:00'
+    assert scheduler.next_run(4, '23:59', SATURDAY_NOON) == '2022-07-29 23:59'
+
+
+@pytest.mark.asyncio
+async def test_run_due(tmp_mm):
+    """ Test if only due schedules roll and move on one week. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.bulk_add_users(2, [(20, 'bob')])
+    announce = Announcements()
+    timer = scheduler.Scheduler(tmp_mm, announce, now=lambda: SATURDAY_NOON)
+    await timer.schedule(1, 100, 5, '18:00')
+    await timer.schedule(2, 200, 6, '18:00', 'fair')
+
+    assert await timer.run_due(SATURDAY_NOON + 3600) == 0
+    assert await timer.run_due(SATURDAY_NOON + 7 * 3600) == 1
+    assert announce.messages == [(100, 'The Minion Meister is now <@10>')]
+    assert (await tmp_mm.show_schedule(1))[5] == '2022-07-30 18:00'
+    assert timer.next_due() == scheduler.timestamp('2022-07-24 18:00')
+    assert await tmp_mm.show_history(1, 5) is not None
+
+
+@pytest.mark.asyncio
+async def test_catch_up(tmp_mm):
+    """ Test if a schedule missed for weeks rolls once after a restart. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.set_schedule(1, 100, 5, '18:00', None, '2022-07-02 18:00')
+    await tmp_mm.set_schedule(2, 200, 5, '18:00', None, '2022-07-02 18:00')
+    announce = Announcements()
+    timer = scheduler.Scheduler(tmp_mm, announce, now=lambda: SATURDAY_NOON)
+
+    assert await timer.load() == 2
+    assert await timer.run_due() == 2
+    assert await timer.run_due() == 0
+    # A server without participants is told so in its channel.
+    assert sorted(announce.messages) == [
+        (100, 'The Minion Meister is now <@10>'),
+        (200, str(error.NoParticipantsError()))]
+    assert (await tmp_mm.show_schedule(1))[5] == '2022-07-23 18:00'
+
+
+@pytest.mark.asyncio
+async def test_failed_roll_is_retried(tmp_mm, monkeypatch):
+    """ Test if a roll that fails to store its next run rolls later. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    announce = Announcements()
+    timer = scheduler.Scheduler(tmp_mm, announce, now=lambda: SATURDAY_NOON)
+    await timer.schedule(1, 100, 5, '18:00')
+    advance_schedule = tmp_mm.advance_schedule
+    failures = [sqlite3.OperationalError('database is locked')]
+
+    async def flaky_advance_schedule(*args):
+        if failures:
+            raise failures.pop()
+        return await advance_schedule(*args)
+
+    monkeypatch.setattr(tmp_mm, 'advance_schedule', flaky_advance_schedule)
+    due = scheduler.timestamp('2022-07-23 18:00')
+    failed = metrics.SCHEDULED_ROLL_FAILURES.value('OperationalError')
+    assert await timer.run_due(due) == 0
+    assert metrics.SCHEDULED_ROLL_FAILURES.value('OperationalError') == \
+        failed + 1
+    assert timer.next_due() == due + scheduler.RETRY_DELAY
+    assert await timer.run_due(due + scheduler.RETRY_DELAY) == 1
+    assert announce.messages == [(100, 'The Minion Meister is now <@10>')]
+    assert (await tmp_mm.show_schedule(1))[5] == '2022-07-30 18:00'
+    assert timer.next_due() == scheduler.timestamp('2022-07-30 18:00')
+
+
+@pytest.mark.asyncio
+async def test_changed_schedules(tmp_mm):
+    """ Test if replaced and removed schedules leave no roll behind. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    announce = Announcements()
+    timer = scheduler.Scheduler(tmp_mm, announce, now=lambda: SATURDAY_NOON)
+    await timer.schedule(1, 100, 5, '18:00')
+    await timer.schedule(1, 100, 0, '18:00')
+    await timer.schedule(2, 200, 5, '18:00')
+    await timer.unschedule(2)
+    with pytest.raises(error.NoScheduleError):
+        await timer.unschedule(2)
+
+    assert await timer.run_due(SATURDAY_NOON + 2 * 24 * 3600) == 0
+    assert await timer.run_due(SATURDAY_NOON + WEEK) == 1
+    assert len(timer) == 1
+    assert len(announce.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_wakes_up_when_due(tmp_mm):
+    """ Test if the running task sleeps until the earliest roll. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.set_schedule(1, 100, 5, '18:00', None, '2022-07-30 18:00')
+    # A clock that reaches the roll in 0.1 seconds.
+    offset = scheduler.timestamp('2022-07-30 18:00') - 0.1 - time.time()
+    announce = Announcements()
+    timer = scheduler.Scheduler(tmp_mm, announce,
+                                now=lambda: time.time() + offset)
+
+    task = asyncio.ensure_future(timer.run())
+    await asyncio.sleep(0.05)
+    assert announce.messages == []
+    await asyncio.sleep(0.25)
+    task.cancel()
+    assert announce.messages == [(100, 'The Minion Meister is now <@10>')]
+    assert (await tmp_mm.show_schedule(1))[5] == '2022-08-06 18:00'
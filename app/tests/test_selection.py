@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Filename: test_selection.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the winner selection.
+- [TODO]
+"""
+
+import random
+from collections import Counter
+
+import pytest
+from selection import AliasTable, FairSampler, Sampler
+
+# Chi-squared critical value for 19 degrees of freedom at p = 0.001.
+CHI2_CRITICAL_19 = 43.82
+
+
+def chi_squared(counter: Counter, keys: list, draws: int) -> float:
+    expected = draws / len(keys)
+    return sum((counter[key] - expected) ** 2 / expected for key in keys)
+
+
+def test_sampler_add_remove():
+    """ Test if the sampler keeps the right set of ids. """
+    sampler = Sampler([1, 2, 3])
+    sampler.add(3)
+    sampler.remove(1)
+    sampler.remove(4)
+    assert len(sampler) == 2
+    assert 1 not in sampler
+    assert {sampler.choice() for _ in range(100)} == {2, 3}
+
+
+def test_sampler_empty():
+    """ Test if an empty sampler has no choice. """
+    assert Sampler().choice() is None
+
+
+def test_sampler_uniform():
+    """ Test if every participant is equally likely to be chosen. """
+    keys = list(range(20))
+    sampler = Sampler(keys, rng=random.Random(42))
+    draws = 20000
+    counter = Counter(sampler.choice() for _ in range(draws))
+    assert chi_squared(counter, keys, draws) < CHI2_CRITICAL_19
+
+
+def test_sampler_uniform_after_removals():
+    """ Test if the choice stays uniform after ids moved on removal. """
+    sampler = Sampler(range(30), rng=random.Random(7))
+    for user_id in range(0, 30, 3):
+        sampler.remove(user_id)
+    keys = [user_id for user_id in range(30) if user_id % 3]
+    draws = 20000
+    counter = Counter(sampler.choice() for _ in range(draws))
+    assert set(counter) == set(keys)
+    assert chi_squared(counter, keys, draws) < CHI2_CRITICAL_19
+
+
+@pytest.mark.asyncio
+async def test_select_winner_removed_user(tmp_mm):
+    """ Test if a removed participant is never selected. """
+    await tmp_mm.add_user(1, 10, 'alice')
+    await tmp_mm.add_user(1, 11, 'bob')
+    await tmp_mm.remove_user(1, 10, 'alice')
+    for _ in range(10):
+        assert await tmp_mm.select_winner(1) == 11
+
+
+def test_alias_table_proportions():
+    """ Test if the alias table samples indices proportional to weight. """
+    weights = [1, 2, 3, 4]
+    table = AliasTable(weights, rng=random.Random(1))
+    draws = 40000
+    counter = Counter(table.sample() for _ in range(draws))
+    for index, weight in enumerate(weights):
+        expected = draws * weight / sum(weights)
+        assert abs(counter[index] - expected) < 0.05 * expected
+
+
+def test_fair_sampler_weights():
+    """ Test if participants with lower counts are chosen more often. """
+    sampler = FairSampler({1: 0, 2: 0, 3: 1, 4: 3}, rng=random.Random(3))
+    draws = 40000
+    counter = Counter(sampler.choice() for _ in range(draws))
+    # Weights 1, 1, 1/2 and 1/4 out of a total of 2.75.
+    for user_id, weight in ((1, 1), (2, 1), (3, 0.5), (4, 0.25)):
+        expected = draws * weight / 2.75
+        assert abs(counter[user_id] - expected) < 0.05 * expected
+
+
+def test_fair_sampler_update():
+    """ Test if count changes move participants between levels. """
+    sampler = FairSampler({1: 0, 2: 5}, rng=random.Random(5))
+    sampler.update(2, 0)
+    sampler.remove(1)
+    assert len(sampler) == 1
+    assert {sampler.choice() for _ in range(50)} == {2}
+
+
+@pytest.mark.asyncio
+async def test_select_winner_fair(tmp_mm):
+    """ Test if a fair roll keeps the cached counts in step. """
+    await tmp_mm.add_user(1, 10, 'alice')
+    await tmp_mm.add_user(1, 11, 'bob')
+    for _ in range(6):
+        await tmp_mm.select_winner(1, fair=True)
+    names, count = await tmp_mm.show_count(1)
+    state = await tmp_mm._guild_(1)
+    assert sum(count) == 6
+    assert sorted(state.counts.values()) == sorted(count)
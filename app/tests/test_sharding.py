@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Filename: test_sharding.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the consistent hash ring of the shards.
+- Contains unit tests for splitting a database into shards.
+- Contains unit tests for moving servers when shards are added.
+- Contains unit tests for a MinionMeister on sharded storage.
+- [TODO]
+"""
+
+import sqlite3
+
+import minion_meister
+import pytest
+import sharding
+import tools
+
+SERVERS = range(1, 2001)
+
+
+def test_router_is_stable():
+    """ Test if every router of the same shards routes alike. """
+    filenames = sharding.shard_filenames('mm.db', 4)
+    assert filenames[1] == 'mm.shard1.db'
+    first = sharding.ShardRouter(filenames)
+    second = sharding.ShardRouter(filenames)
+    assert [first.route(sid) for sid in SERVERS] == \
+        [second.route(sid) for sid in SERVERS]
+    assert set(first.index(sid) for sid in SERVERS) == {0, 1, 2, 3}
+
+
+def test_router_moves_few_servers():
+    """ Test if adding a shard only moves servers onto the new shard. """
+    old = sharding.ShardRouter(sharding.shard_filenames('mm.db', 4))
+    new = sharding.ShardRouter(sharding.shard_filenames('mm.db', 5))
+    moved = [sid for sid in SERVERS if old.index(sid) != new.index(sid)]
+    assert all(new.index(sid) == 4 for sid in moved)
+    # About a fifth of the servers, far from the 4/5 of id % shards.
+    assert len(moved) < 0.35 * len(SERVERS)
+
+
+@pytest.fixture(scope='function')
+async def shard_mm(tmp_path):
+    """ MinionMeister on two fresh shards for a single test. """
+    db_file = str(tmp_path / 'minion_meister.db')
+    sharding.create_shards(db_file, 2)
+    MM = minion_meister.MinionMeister(db_file, shards=2)
+
+    yield MM
+
+    await tools.close_pools()
+
+
+@pytest.mark.asyncio
+async def test_sharded_minion_meister(shard_mm):
+    """ Test if every server is kept in its own shard only. """
+    router = shard_mm.storage.router
+    server_ids = list(SERVERS[:20])
+    for sid in server_ids:
+        await shard_mm.add_user(sid, 10, 'alice')
+        await shard_mm.insert_history(sid, 10, '2022-07-02')
+
+    for index, filename in enumerate(router.filenames):
+        conn = sqlite3.connect(filename)
+        stored = {row[0] for row in conn.execute("SELECT server FROM users")}
+        conn.close()
+        assert stored == {sid for sid in server_ids
+                          if router.index(sid) == index}
+
+    assert await shard_mm.list_servers(limit=5) == server_ids[:5]
+    assert await shard_mm.list_servers(after=15) == server_ids[15:]
+    assert await shard_mm.show_count(server_ids[0]) == (('alice',), (1,))
+    assert await shard_mm.reconcile_counts(server_ids) == 0
+    await shard_mm.ping()
+
+
+@pytest.mark.asyncio
+async def test_split(tmp_path):
+    """ Test if split copies every server into its shard unchanged. """
+    db_file = str(tmp_path / 'minion_meister.db')
+    sharding.create_shards(db_file, 1)
+    MM = minion_meister.MinionMeister(db_file, shards=1)
+    for sid in SERVERS[:10]:
+        await MM.bulk_add_users(sid, [(10, 'alice'), (11, 'bob')])
+        await MM.bulk_admin_users(sid, [10])
+        await MM.bulk_insert_history(sid, [(10, '2022-07-02'),
+                                           (11, '2022-07-09'),
+                                           (11, '2022-07-16')])
+    await tools.close_pools()
+
+    sharding.create_shards(db_file, 3)
+    router = sharding.ShardRouter(sharding.shard_filenames(db_file, 3))
+    copied = sharding.split([db_file], router)
+    assert sum(copied.values()) == 10
+
+    sharded = minion_meister.MinionMeister(db_file, shards=3)
+    assert sorted(await sharded.list_servers()) == list(SERVERS[:10])
+    for sid in SERVERS[:10]:
+        names, count = await sharded.show_count(sid)
+        assert dict(zip(names, count)) == {'alice': 1, 'bob': 2}
+        assert await sharded.is_admin(sid, 10)
+    # The counts were copied, not doubled by the history triggers.
+    assert await sharded.reconcile_counts(SERVERS[:10]) == 0
+    await tools.close_pools()
+
+
+@pytest.mark.asyncio
+async def test_reshard(tmp_path):
+    """ Test if adding a shard moves only the servers of the new shard. """
+    db_file = str(tmp_path / 'minion_meister.db')
+    sharding.create_shards(db_file, 2)
+    MM = minion_meister.MinionMeister(db_file, shards=2)
+    server_ids = list(SERVERS[:60])
+    for sid in server_ids:
+        await MM.bulk_add_users(sid, [(10, 'alice'), (11, 'bob')])
+        await MM.bulk_admin_users(sid, [10])
+        await MM.bulk_insert_history(sid, [(10, '2022-07-02'),
+                                           (11, '2022-07-09'),
+                                           (11, '2022-07-16')])
+    pages = {sid: await MM.history_page(sid) for sid in server_ids}
+    await tools.close_pools()
+
+    old = sharding.ShardRouter(sharding.shard_filenames(db_file, 2))
+    new = sharding.ShardRouter(sharding.shard_filenames(db_file, 3))
+    sharding.create_shards(db_file, 3)
+    moved = sharding.reshard(old, new)
+    changed = [sid for sid in server_ids if old.index(sid) != new.index(sid)]
+    assert 0 < len(changed) < len(server_ids)
+    assert moved == {new.filenames[0]: 0, new.filenames[1]: 0,
+                     new.filenames[2]: len(changed)}
+
+    for index, filename in enumerate(new.filenames):
+        conn = sqlite3.connect(filename)
+        stored = {row[0] for row in conn.execute("SELECT server FROM users")}
+        conn.close()
+        assert stored == {sid for sid in server_ids
+                          if new.index(sid) == index}
+
+    sharded = minion_meister.MinionMeister(db_file, shards=3)
+    for sid in server_ids:
+        names, count = await sharded.show_count(sid)
+        assert dict(zip(names, count)) == {'alice': 1, 'bob': 2}
+        assert await sharded.is_admin(sid, 10)
+        page = await sharded.history_page(sid)
+        assert [row[1:] for row in page] == [row[1:] for row in pages[sid]]
+    assert await sharded.reconcile_counts(server_ids) == 0
+    await tools.close_pools()
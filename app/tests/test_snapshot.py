@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Filename: test_snapshot.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the online database snapshots.
+- Contains unit tests for the snapshots of every shard by the owner.
+- [TODO]
+"""
+
+import asyncio
+import sqlite3
+
+import minion_meister
+import pytest
+import sharding
+import tools
+from cogs import owner
+from snapshot import Snapshotter
+
+
+@pytest.mark.asyncio
+async def test_snapshot_copies_database(tmp_mm, tmp_path):
+    """ Test if a snapshot holds the records of the live database. """
+    await tmp_mm.bulk_add_users(1, [(user_id, f'user{user_id}')
+                                    for user_id in range(2000)])
+    snapshots = Snapshotter(tmp_mm.database, str(tmp_path / 'backups'),
+                            pages=4)
+    filename = await snapshots.snapshot()
+
+    conn = sqlite3.connect(filename)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone() == (2000,)
+    conn.close()
+    assert snapshots.snapshots() == [filename]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_does_not_block_loop(tmp_mm, tmp_path):
+    """ Test if the database can be read while a snapshot is taken. """
+    await tmp_mm.bulk_add_users(1, [(user_id, f'user{user_id}')
+                                    for user_id in range(2000)])
+    snapshots = Snapshotter(tmp_mm.database, str(tmp_path / 'backups'),
+                            pages=1)
+    task = asyncio.create_task(snapshots.snapshot())
+    await asyncio.sleep(0)
+    await tmp_mm.ping()
+    assert not task.done()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rotation(tmp_mm, tmp_path, monkeypatch):
+    """ Test if snapshots of the same moment get their own name and only the
+        newest snapshots are kept.
+    """
+    monkeypatch.setattr('snapshot.time.time_ns', lambda: 1656720000 * 10**9)
+    snapshots = Snapshotter(tmp_mm.database, str(tmp_path / 'backups'),
+                            keep=2)
+    filenames = [await snapshots.snapshot() for _ in range(3)]
+    assert len(set(filenames)) == 3
+    assert snapshots.snapshots() == filenames[1:]
+    assert [name.rsplit('-', 1)[1] for name in filenames[1:]] == \
+        ['000001.db', '000002.db']
+
+
+def test_snapshot_keeps_one(tmp_path):
+    """ Test if a snapshotter that would delete its own snapshot fails. """
+    with pytest.raises(ValueError):
+        Snapshotter(str(tmp_path / 'minion_meister.db'), str(tmp_path),
+                    keep=0)
+
+
+@pytest.mark.asyncio
+async def test_owner_snapshots_every_shard(fake_bot, tmp_path, monkeypatch):
+    """ Test if the owner takes a snapshot of every shard file. """
+    db_file = str(tmp_path / 'minion_meister.db')
+    sharding.create_shards(db_file, 2)
+    MM = minion_meister.MinionMeister(db_file, shards=2)
+    await MM.bulk_add_users(1, [(10, 'alice')])
+    await MM.bulk_add_users(2, [(20, 'bob')])
+    monkeypatch.setattr(owner, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    monkeypatch.setattr(owner, 'BACKUP_INTERVAL', 0)
+    fake_bot.MM = MM
+    cog = owner.OwnerCog(fake_bot)
+
+    filenames = await cog.take_snapshots()
+    await tools.close_pools()
+    assert [name.rsplit('-', 3)[0] for name in filenames] == \
+        [str(tmp_path / 'backups' / f'minion_meister.shard{index}')
+         for index in range(2)]
+    users = set()
+    for filename in filenames:
+        conn = sqlite3.connect(filename)
+        users.update(conn.execute("SELECT id FROM users"))
+        conn.close()
+    assert users == {(10,), (20,)}
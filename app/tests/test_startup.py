@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Filename: test_startup.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the startup timer.
+- Contains unit tests for warming up the storage and the guild cache.
+- Contains unit tests for the MinionMeister the cogs share.
+- [TODO]
+"""
+
+import time
+
+import minion_meister
+import pytest
+import startup
+from cogs.admin import AdminCog
+from cogs.member import MemberCog
+
+
+def test_startup_timer():
+    """ Test if the breakdown adds up phases and ends once. """
+    now = time.monotonic()
+    timer = startup.StartupTimer(launched=now - 2.0)
+    timer.record('imports', now - 2.0, now - 1.5)
+    timer.record('login', now - 1.0, now - 0.5)
+    timer.record('warm_up', now - 1.2, now - 0.9)
+    assert timer.ready()
+    assert not timer.ready()
+
+    times = timer.breakdown()
+    assert times['total'] == pytest.approx(2.0, abs=0.1)
+    assert times['login'] == pytest.approx(0.5)
+    report = timer.report()
+    assert report.index('imports') < report.index('warm_up') \
+        < report.index('login')
+
+
+def test_process_launched():
+    """ Test if the process was launched before the test ran. """
+    assert startup.process_launched() <= time.monotonic()
+
+
+@pytest.mark.asyncio
+async def test_warm_up(tmp_mm):
+    """ Test if warm-up loads the guilds into the cache. """
+    for server_id in (1, 2, 3):
+        await tmp_mm.bulk_add_users(server_id, [(10, 'alice')])
+        await tmp_mm.insert_history(server_id, 10, '2022-07-02')
+    tmp_mm.cache.clear()
+
+    assert await tmp_mm.warm_up(guilds=2) == 2
+    assert tmp_mm.cache.get(1) is not None
+    assert tmp_mm.cache.get(3) is None
+
+
+@pytest.mark.asyncio
+async def test_warm_up_without_schema(tmp_path):
+    """ Test if warm-up refuses a database that was never migrated. """
+    MM = minion_meister.MinionMeister(str(tmp_path / 'empty.db'))
+    with pytest.raises(RuntimeError):
+        await MM.warm_up()
+
+
+def test_cogs_share_minion_meister(fake_bot):
+    """ Test if every cog uses the MinionMeister of the bot. """
+    assert MemberCog(fake_bot).MM is fake_bot.MM
+    assert AdminCog(fake_bot).MM is fake_bot.MM
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Filename: test_statements.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the statement registry.
+- Check the query plan of every registered statement against a database
+  the size of a busy bot, with and without ANALYZE statistics.
+- [TODO]
+"""
+
+import sqlite3
+
+import pytest
+import statements
+from benchmarks.common import create_database, seed_guilds
+
+TABLES = ('users', 'history', 'counts', 'admins', 'schedules',
+          'schema_version')
+
+# Plan steps that are expected, with the reason they are acceptable.
+ALLOWED = {
+    # Maintenance over the history of one guild, never on a command path.
+    ('recount', 'USE TEMP B-TREE FOR GROUP BY'),
+}
+
+
+@pytest.fixture(scope='module')
+def large_db(tmp_path_factory):
+    """ Database with 200 guilds of 50 participants and 200 records. """
+    db_file = str(tmp_path_factory.mktemp('statements') / 'large.db')
+    create_database(db_file)
+    seed_guilds(db_file, guilds=200, participants=50, history=200)
+    return db_file
+
+
+def bad_steps(conn, name: str, sql: str) -> list:
+    """ List the steps of the plan of sql that read more than they need.
+
+        Parameters:
+            :conn: sqlite3.Connection, required
+                connection to the database to plan against.
+            :name: str, required
+                registered name of the statement.
+            :sql: str, required
+                the statement, every placeholder is bound to 1.
+
+        Returns:
+            list, details of the full table scans and temporary B-trees.
+    """
+    values = (1,) * sql.count('?')
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", values).fetchall()
+    bad = []
+    for _id, _parent, _notused, detail in plan:
+        scan = detail.split(' ')[:2] in (['SCAN', table] for table in TABLES)
+        if scan or 'TEMP B-TREE' in detail:
+            if (name, detail) not in ALLOWED:
+                bad.append(detail)
+    return bad
+
+
+def test_register_twice():
+    """ Test if a name cannot be registered twice. """
+    with pytest.raises(ValueError):
+        statements.register('ping', "SELECT 1")
+    assert statements.STATEMENTS['ping'] == statements.PING
+
+
+@pytest.mark.parametrize('analyze', (False, True))
+def test_statement_plans(large_db, analyze):
+    """ Test if no registered statement scans a table or sorts. """
+    conn = sqlite3.connect(large_db)
+    if analyze:
+        conn.execute("ANALYZE")
+    try:
+        for name, sql in statements.STATEMENTS.items():
+            assert bad_steps(conn, name, sql) == [], name
+    finally:
+        # The other parameter plans without statistics.
+        if analyze:
+            conn.execute("DROP TABLE IF EXISTS sqlite_stat1")
+            conn.commit()
+        conn.close()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Filename: test_storage.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains conformance tests that every storage engine has to pass.
+- Contains unit tests for a MinionMeister on every storage engine.
+- [TODO]
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+import error
+import minion_meister
+import pytest
+import storage
+import tools
+
+ENGINES = ('sqlite', 'memory')
+
+
+@pytest.fixture(scope='function', params=ENGINES)
+async def engine(request, tmp_db):
+    """ Empty storage of every engine for a single test. """
+    if request.param == 'sqlite':
+        yield storage.SQLiteStorage(tmp_db, shards=1)
+    else:
+        yield storage.MemoryStorage()
+    await tools.close_pools()
+
+
+def drift(engine, server_id: int, user_id: int, count: int) -> None:
+    """ Set a count behind the back of the storage. """
+    if isinstance(engine, storage.MemoryStorage):
+        engine.guilds[server_id].counts[user_id] = count
+        return
+    conn = sqlite3.connect(engine.database)
+    conn.execute("UPDATE counts SET count = (?) "
+                 "WHERE server = (?) AND user = (?)",
+                 (count, server_id, user_id))
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_users(engine):
+    """ Test if users are added, listed and removed per server. """
+    async with engine.transaction(1) as records:
+        await records.insert_user(1, 10, 'alice')
+        await records.initialise_count(1, 10)
+        assert await records.insert_users(1, [(10, 'alice'), (11, 'bob')]) \
+            == 1
+    async with engine.transaction(2) as records:
+        await records.insert_user(2, 10, 'alice')
+
+    reader = engine.reader(1)
+    assert await reader.in_users(1, 11)
+    assert not await reader.in_users(3, 11)
+    assert sorted(await reader.list_users(1)) == [(10, 'alice', 0),
+                                                  (11, 'bob', None)]
+
+    async with engine.transaction(1) as records:
+        await records.delete_user(1, 10)
+    assert await engine.reader(1).list_users(1) == [(11, 'bob', None)]
+    assert await engine.reader(2).list_users(2) == [(10, 'alice', None)]
+
+
+@pytest.mark.asyncio
+async def test_admins(engine):
+    """ Test if admins are added, listed and removed per server. """
+    async with engine.transaction(1) as records:
+        await records.insert_admin(1, 10)
+        assert await records.insert_admins(1, [10, 11, 12]) == 2
+        await records.delete_admin(1, 12)
+    reader = engine.reader(1)
+    assert sorted(await reader.list_admin_ids(1)) == [10, 11]
+    assert await reader.in_admins(1, 11)
+    assert not await reader.in_admins(2, 11)
+
+
+@pytest.mark.asyncio
+async def test_user_pages(engine):
+    """ Test if participants and admins are paged on (name, id). """
+    async with engine.transaction(1) as records:
+        await records.insert_users(1, [(10, 'carol'), (11, 'alice'),
+                                       (12, 'bob'), (13, 'alice')])
+        await records.insert_admins(1, [12, 13, 14])
+    reader = engine.reader(1)
+    assert await reader.page_users(1, 3) == [(11, 'alice'), (13, 'alice'),
+                                             (12, 'bob')]
+    assert await reader.page_users(1, 3, after=('alice', 13)) == \
+        [(12, 'bob'), (10, 'carol')]
+    assert await reader.page_users(2, 3) == []
+    assert await reader.page_admins(1, 1) == [(13, 'alice')]
+    assert await reader.page_admins(1, 5, after=('alice', 13)) == \
+        [(12, 'bob')]
+
+
+@pytest.mark.asyncio
+async def test_history_counts(engine):
+    """ Test if history records keep the counts in step. """
+    async with engine.transaction(1) as records:
+        await records.insert_users(1, [(10, 'alice'), (11, 'bob')])
+        await records.initialise_counts(1, [10, 11])
+        await records.insert_history(1, 10)
+        assert await records.insert_histories(
+            1, [(10, '2022-07-02'), (11, '2022-07-02'),
+                (11, '2022-07-02')]) == 3
+    reader = engine.reader(1)
+    assert await reader.get_count(1, 10) == 2
+    assert await reader.get_count(1, 11) == 2
+    assert await reader.get_count(1, 12) == 0
+
+    async with engine.transaction(1) as records:
+        assert await records.delete_history(1, 11, '2022-07-02') == 2
+        assert await records.delete_history(1, 11, '2022-07-02') == 0
+    assert await reader.get_count(1, 11) == 0
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    assert await reader.list_history(1, 5) == [('alice', today),
+                                               ('alice', '2022-07-02')]
+
+
+@pytest.mark.asyncio
+async def test_history_pages(engine):
+    """ Test if history pages are ordered on (date, id) both ways. """
+    dates = [f'2022-07-{day:02}' for day in range(1, 11)]
+    async with engine.transaction(1) as records:
+        await records.insert_users(1, [(10, 'alice'), (11, 'bob')])
+        await records.insert_histories(
+            1, [(10, date) for date in dates] + [(11, dates[4])])
+        # A record of a user that stopped participating is not listed.
+        await records.insert_histories(1, [(12, dates[5])])
+    reader = engine.reader(1)
+
+    first = await reader.page_history(1, 4)
+    assert [date for _id, _name, date in first] == dates[:-5:-1]
+    second = await reader.page_history(1, 4, before=first[-1][2::-2])
+    assert [(name, date) for _id, name, date in second] == \
+        [('alice', dates[5]), ('bob', dates[4]), ('alice', dates[4]),
+         ('alice', dates[3])]
+    assert await reader.page_history(1, 4, after=second[0][2::-2]) == first
+    assert await reader.page_history(1, 4, after=first[0][2::-2]) == []
+    assert await reader.page_history(2, 4) == []
+    assert await reader.list_history(1, 2) == [('alice', dates[-1]),
+                                               ('alice', dates[-2])]
+
+
+@pytest.mark.asyncio
+async def test_recount(engine):
+    """ Test if recount fixes drifted counts only. """
+    async with engine.transaction(1) as records:
+        await records.insert_users(1, [(10, 'alice'), (11, 'bob')])
+        await records.initialise_counts(1, [10, 11])
+        await records.insert_histories(1, [(10, '2022-07-02')])
+    drift(engine, 1, 10, 3)
+    drift(engine, 1, 11, 2)
+
+    async with engine.transaction(1) as records:
+        assert await records.recount(1) == 2
+        assert await records.recount(1) == 0
+    assert await engine.reader(1).get_count(1, 10) == 1
+    assert await engine.reader(1).get_count(1, 11) == 0
+
+
+@pytest.mark.asyncio
+async def test_rollback(engine):
+    """ Test if a failing transaction leaves no change behind. """
+    async with engine.transaction(1) as records:
+        await records.insert_users(1, [(10, 'alice')])
+        await records.insert_histories(1, [(10, '2022-07-02')])
+
+    with pytest.raises(error.InsertUserError):
+        async with engine.transaction(1) as records:
+            await records.insert_users(1, [(11, 'bob')])
+            await records.insert_admins(1, [11])
+            await records.insert_history(1, 11, '2022-07-03')
+            await records.delete_history(1, 10, '2022-07-02')
+            await records.delete_user(1, 10)
+            raise error.InsertUserError('bob')
+
+    reader = engine.reader(1)
+    assert await reader.list_users(1) == [(10, 'alice', 1)]
+    assert await reader.list_admin_ids(1) == []
+    assert await reader.list_history(1, 5) == [('alice', '2022-07-02')]
+
+
+@pytest.mark.asyncio
+async def test_list_servers(engine):
+    """ Test if servers with counts or history are listed in order. """
+    for server_id in (5, 3, 9, 7):
+        async with engine.transaction(server_id) as records:
+            await records.insert_histories(server_id, [(10, '2022-07-02')])
+    async with engine.transaction(4) as records:
+        await records.insert_users(4, [(10, 'alice')])
+    assert await engine.list_servers(None, 10) == [3, 5, 7, 9]
+    assert await engine.list_servers(3, 2) == [5, 7]
+    assert await engine.list_servers(9, 10) == []
+    assert engine.partition([]) == []
+    groups = engine.partition([3, 5, 7])
+    assert sorted(sum(groups, [])) == [3, 5, 7]
+    await engine.ping()
+
+
+@pytest.mark.asyncio
+async def test_schedules(engine):
+    """ Test if schedules are replaced, advanced and listed in order. """
+    for server_id in (5, 3, 9):
+        async with engine.transaction(server_id) as records:
+            await records.set_schedule(server_id, 50, 5, '18:00', None,
+                                       '2022-07-23 18:00')
+    async with engine.transaction(3) as records:
+        await records.set_schedule(3, 51, 0, '09:30', 'fair',
+                                   '2022-07-25 09:30')
+        assert await records.advance_schedule(3, '2022-07-25 09:30',
+                                              '2022-08-01 09:30') == 1
+        assert await records.advance_schedule(3, '2022-07-25 09:30',
+                                              '2022-08-08 09:30') == 0
+    assert await engine.reader(3).get_schedule(3) == \
+        (3, 51, 0, '09:30', 'fair', '2022-08-01 09:30')
+
+    with pytest.raises(error.InsertUserError):
+        async with engine.transaction(5) as records:
+            assert await records.delete_schedule(5) == 1
+            raise error.InsertUserError('bob')
+    async with engine.transaction(9) as records:
+        assert await records.delete_schedule(9) == 1
+        assert await records.delete_schedule(9) == 0
+    assert await engine.reader(9).get_schedule(9) is None
+
+    schedules = await engine.list_schedules(None, 10)
+    assert [schedule[0] for schedule in schedules] == [3, 5]
+    assert await engine.list_schedules(3, 10) == [
+        (5, 50, 5, '18:00', None, '2022-07-23 18:00')]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('engine_name', ENGINES)
+async def test_minion_meister_engines(tmp_db, engine_name):
+    """ Test if MinionMeister behaves alike on every engine. """
+    MM = minion_meister.MinionMeister(tmp_db, engine=engine_name)
+    await MM.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    await MM.admin_user(1, 10, 'alice')
+    await MM.insert_history(1, 11, '2022-07-02')
+    winner = await MM.select_winner(1)
+    assert winner in (10, 11)
+    with pytest.raises(error.InsertUserError):
+        await MM.add_user(1, 10, 'alice')
+
+    MM.cache.clear()
+    assert await MM.show_participants(1) == ['alice', 'bob']
+    assert await MM.show_admins(1) == ['alice']
+    names, counts = await MM.show_count(1)
+    assert sum(counts) == 2
+    assert (await MM.show_rank(1, 11, 'bob'))[2] == 2
+    assert len(await MM.history_page(1)) == 2
+    assert await MM.list_servers() == [1]
+    assert await MM.reconcile_counts([1]) == 0
+    await tools.close_pools()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Filename: test_tools.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the shared database connection pool.
+- Contains unit tests for the group committing writer and its transactions.
+- [TODO]
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+import tools
+
+
+@pytest.fixture(scope='function')
+async def pool(tmp_path):
+    pool = tools.ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+
+    yield pool
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_lazy_open(pool):
+    """ Test if connections are only opened when they are needed. """
+    assert pool.opened == 0
+    await pool.read("SELECT 1")
+    assert pool.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connection(pool):
+    """ Test if sequential queries reuse the same connection. """
+    async with pool.connection() as first:
+        pass
+    async with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_size(pool):
+    """ Test if the pool never opens more connections than its size. """
+    async def query():
+        async with pool.connection() as con:
+            await asyncio.sleep(0.01)
+            await con.execute_fetchall("SELECT 1")
+
+    await asyncio.gather(*(query() for _ in range(10)))
+    assert pool.opened == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_dead_connection(pool, monkeypatch):
+    """ Test if a dead idle connection is replaced on acquire. """
+    monkeypatch.setattr(tools, 'HEALTH_CHECK_INTERVAL', 0)
+    async with pool.connection() as con:
+        pass
+    await con.close()
+    async with pool.connection() as replacement:
+        assert replacement is not con
+    assert pool.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_failed_connection(pool):
+    """ Test if a connection is replaced after a query on it fails, and
+        kept after an SQL error.
+    """
+    async with pool.connection() as con:
+        pass
+    with pytest.raises(sqlite3.OperationalError):
+        await pool.read("SELECT * FROM missing")
+    async with pool.connection() as same:
+        assert same is con
+    await con.close()
+    with pytest.raises(ValueError):
+        await pool.read("SELECT 1")
+    async with pool.connection() as replacement:
+        assert replacement is not con
+    assert pool.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_close(pool):
+    """ Test if a closed pool closes its connections and refuses work. """
+    await pool.read("SELECT 1")
+    await pool.close()
+    assert pool.opened == 0
+    with pytest.raises(RuntimeError):
+        await pool.read("SELECT 1")
+
+
+@pytest.fixture(scope='function')
+async def writer(pool):
+    conn = sqlite3.connect(pool.database)
+    conn.execute("CREATE TABLE test (id INTEGER)")
+    conn.close()
+    writer = tools.Writer(pool.database, window=0.01)
+
+    yield writer
+
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_push_and_read(pool, writer):
+    """ Test if pushed records can be read back from the pool. """
+    await writer.push("INSERT INTO test (id) VALUES (?)", (1,))
+    assert await pool.read("SELECT id FROM test") == [(1,)]
+
+
+@pytest.mark.asyncio
+async def test_transaction_commit(pool, writer):
+    """ Test if all statements of a transaction are committed together. """
+    async with writer.transaction() as txn:
+        await txn.push("INSERT INTO test (id) VALUES (?)", (1,))
+        await txn.push("INSERT INTO test (id) VALUES (?)", (2,))
+        assert await txn.read("SELECT COUNT(*) FROM test") == [(2,)]
+    assert await pool.read("SELECT id FROM test ORDER BY id") == [(1,), (2,)]
+
+
+@pytest.mark.asyncio
+async def test_transaction_rollback(pool, writer):
+    """ Test if no statement of a failed transaction is committed. """
+    with pytest.raises(ValueError):
+        async with writer.transaction() as txn:
+            await txn.push("INSERT INTO test (id) VALUES (?)", (1,))
+            raise ValueError
+    assert await pool.read("SELECT id FROM test") == []
+    await writer.push("INSERT INTO test (id) VALUES (?)", (2,))
+    assert await pool.read("SELECT id FROM test") == [(2,)]
+
+
+@pytest.mark.asyncio
+async def test_writer_group_commit(pool, writer):
+    """ Test if concurrent units are committed in one transaction. """
+    async def insert(value):
+        async with writer.transaction() as txn:
+            await txn.push("INSERT INTO test (id) VALUES (?)", (value,))
+
+    await asyncio.gather(*(insert(value) for value in range(20)))
+    assert writer.units == 20
+    assert writer.commits < 20
+    assert await pool.read("SELECT COUNT(*) FROM test") == [(20,)]
+
+
+@pytest.mark.asyncio
+async def test_writer_failed_unit(pool, writer):
+    """ Test if a failing unit is rolled back without its batch. """
+    async def insert(value):
+        async with writer.transaction() as txn:
+            await txn.push("INSERT INTO test (id) VALUES (?)", (value,))
+            if value == 1:
+                raise ValueError
+
+    results = await asyncio.gather(*(insert(value) for value in range(3)),
+                                   return_exceptions=True)
+    assert isinstance(results[1], ValueError)
+    assert writer.failed == 1
+    rows = await pool.read("SELECT id FROM test ORDER BY id")
+    assert rows == [(0,), (2,)]
+
+
+@pytest.mark.asyncio
+async def test_writer_push_and_stats(pool, writer):
+    """ Test if single statements are committed and counted. """
+    assert await writer.push("INSERT INTO test (id) VALUES (1)") == 1
+    stats = writer.stats()
+    assert stats['units'] == 1
+    assert stats['commits'] == 1
+    assert stats['latency_seconds_max'] > 0
+
+
+@pytest.mark.asyncio
+async def test_writer_reopens_failed_connection(tmp_path):
+    """ Test if a connection that failed to open is not reused. """
+    directory = tmp_path / 'missing'
+    writer = tools.Writer(str(directory / 'writer.db'))
+    with pytest.raises(sqlite3.OperationalError):
+        await writer.push("CREATE TABLE test (id INTEGER)")
+    assert writer.failed == 1
+
+    directory.mkdir()
+    await writer.push("CREATE TABLE test (id INTEGER)")
+    assert await writer.push("INSERT INTO test (id) VALUES (1)") == 1
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_close(writer):
+    """ Test if a closed writer refuses new units. """
+    await writer.push("INSERT INTO test (id) VALUES (1)")
+    await writer.close()
+    with pytest.raises(RuntimeError):
+        await writer.push("INSERT INTO test (id) VALUES (2)")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Filename: test_webserver.py
+Authors:  Yoshi Fu
+Project:  Minion Meister Discord Bot
+Date:     July 24th 2022
+
+Summary:
+- Contains unit tests for the health and metrics endpoints.
+- [TODO]
+"""
+
+import minion_meister
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from webserver import WebServer
+
+
+async def get(bot, path: str):
+    app = WebServer(bot).create_app()
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get(path)
+        if response.content_type == 'application/json':
+            return response.status, await response.json()
+        return response.status, await response.text()
+
+
+@pytest.mark.asyncio
+async def test_health(fake_bot):
+    """ Test if health reports the gateway latency and the probe. """
+    fake_bot.latency = 0.042
+    status, report = await get(fake_bot, '/health')
+    assert status == 200
+    assert report['status'] == 'ok'
+    assert report['gateway_latency_seconds'] == 0.042
+    assert report['database_seconds'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_health_unhealthy(fake_bot, tmp_path):
+    """ Test if health responds 503 when the database cannot be read. """
+    fake_bot.MM = minion_meister.MinionMeister(str(tmp_path / 'missing.db'))
+    fake_bot.latency = float('nan')
+    status, report = await get(fake_bot, '/health')
+    assert status == 503
+    assert report['database'] != 'ok'
+    assert report['gateway_latency_seconds'] is None
+
+
+@pytest.mark.asyncio
+async def test_metrics(fake_bot):
+    """ Test if metrics are served in the Prometheus text format. """
+    status, text = await get(fake_bot, '/metrics')
+    assert status == 200
+    assert '# TYPE minion_meister_query_seconds histogram' in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_stats(tmp_mm, fake_bot):
+    """ Test if the writer and cache stats are served as metrics. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.show_participants(1)
+    await tmp_mm.show_participants(1)
+    status, text = await get(fake_bot, '/metrics')
+    lines = text.splitlines()
+    assert '# TYPE minion_meister_writer_units_total counter' in lines
+    assert 'minion_meister_writer_units_total{database="minion_meister.db"}' \
+        ' 1' in lines
+    assert '# TYPE minion_meister_cache_hit_rate gauge' in lines
+    hits = tmp_mm.cache.stats()['hits']
+    assert f'minion_meister_cache_hits_total {hits}' in lines
+
+
+@pytest.mark.asyncio
+async def test_api_etag(tmp_mm, fake_bot):
+    """ Test if unchanged guilds are answered with 304 until a change. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    app = WebServer(fake_bot).create_app()
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get('/api/guilds/1/participants')
+        assert response.status == 200
+        assert (await response.json())['participants'] == ['alice', 'bob']
+        etag = response.headers['ETag']
+
+        response = await client.get('/api/guilds/1/counts',
+                                    headers={'If-None-Match': etag})
+        assert response.status == 304
+
+        await tmp_mm.insert_history(1, 11, '2022-07-02')
+        response = await client.get('/api/guilds/1/counts',
+                                    headers={'If-None-Match': etag})
+        assert response.status == 200
+        assert response.headers['ETag'] != etag
+        counts = (await response.json())['counts']
+        assert counts[0] == {'name': 'bob', 'count': 1}
+
+
+@pytest.mark.asyncio
+async def test_api_counts_limit(tmp_mm, fake_bot):
+    """ Test if the counts are limited and a limit below 1 is refused. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice'), (11, 'bob')])
+    await tmp_mm.insert_history(1, 11, '2022-07-02')
+    app = WebServer(fake_bot).create_app()
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get('/api/guilds/1/counts?limit=1')
+        counts = (await response.json())['counts']
+        assert counts == [{'name': 'bob', 'count': 1}]
+        for limit in ('0', '-1'):
+            response = await client.get('/api/guilds/1/counts',
+                                        params={'limit': limit})
+            assert response.status == 400
+
+
+@pytest.mark.asyncio
+async def test_api_history_pages(tmp_mm, fake_bot):
+    """ Test if the history is paged with the cursors of the response. """
+    await tmp_mm.bulk_add_users(1, [(10, 'alice')])
+    await tmp_mm.bulk_insert_history(1, [(10, '2022-07-02'),
+                                         (10, '2022-07-09'),
+                                         (10, '2022-07-16')])
+    app = WebServer(fake_bot).create_app()
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get('/api/guilds/1/history?size=2')
+        page = await response.json()
+        assert [r['date'] for r in page['history']] == ['2022-07-16',
+                                                        '2022-07-09']
+        response = await client.get('/api/guilds/1/history',
+                                    params={'size': 2,
+                                            'before': page['before']})
+        older = await response.json()
+        assert [r['date'] for r in older['history']] == ['2022-07-02']
+
+        response = await client.get('/api/guilds/1/history?before=x')
+        assert response.status == 400
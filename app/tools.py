@@ -6,13 +6,552 @@ Project:  Minion Meister Discord Bot
 Date:     July 24th 2022
 
 Summary:
+- Pool of long-lived database connections shared by the whole bot.
+- Transactions that run several statements as one unit of work.
+- Single writer task that group commits all database mutations.
+- Write-ahead logging, so readers never wait for the writer.
 - Function to read from database.
 - Function to push to database.
+- Every statement is recorded in the query metrics.
+- Prepared statements are cached per connection.
 - [TODO]
 """
 
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 from aiosqlite import connect
 
+import metrics
+
+POOL_SIZE = 5
+HEALTH_CHECK_INTERVAL = 30.0
+HEALTH_CHECK_TIMEOUT = 1.0
+BUSY_TIMEOUT = 5.0
+JOURNAL_MODE = 'WAL'
+COMMIT_WINDOW = 0.002
+COMMIT_BATCH_SIZE = 256
+# Prepared statements kept per connection, room for the whole registry.
+CACHED_STATEMENTS = 256
+
+_pools = dict()
+_writers = dict()
+
+
+class Transaction:
+    """ Unit of work that runs statements on the write connection.
+
+        Created by Writer.transaction, which runs the statements inside a
+        savepoint of its current BEGIN IMMEDIATE ... COMMIT batch, so they
+        are committed or rolled back together.
+    """
+    def __init__(self, con) -> None:
+        """ Initialise the transaction on connection con. """
+        self.con = con
+
+    async def read(self, sql: str, values=None) -> list:
+        """ Perform a SQL Query that reads inside the transaction.
+
+            Params:
+                sql: str, required
+                    sql part of query with optional named colon parameters.
+                values: dict or tuple, optional
+                    dictionary that maps named colon parameter to value.
+        """
+        if values is None:
+            values = dict()
+
+        with metrics.query('read', sql) as query:
+            res = list(await self.con.execute_fetchall(sql, values))
+            query.rows = len(res)
+        return res
+
+    async def push(self, sql: str, values=None) -> int:
+        """ Perform a SQL Query that alters the database in the transaction.
+
+            Params:
+                sql: str, required
+                    sql part of query with optional named colon parameters.
+                values: dict or tuple, optional
+                    dictionary that maps named colon parameter to value.
+
+            Returns:
+                :rowcount: int
+                    amount of rows the statement changed.
+        """
+        if values is None:
+            values = dict()
+
+        with metrics.query('push', sql) as query:
+            cur = await self.con.execute(sql, values)
+            rowcount = query.rows = cur.rowcount
+            await cur.close()
+        return rowcount
+
+    async def push_many(self, sql: str, values: list) -> int:
+        """ Perform a SQL Query once for every set of values (executemany).
+
+            Params:
+                sql: str, required
+                    sql part of query with optional named colon parameters.
+                values: list, required
+                    list of dicts or tuples, one per execution.
+
+            Returns:
+                :rowcount: int
+                    amount of rows the executions changed together.
+        """
+        with metrics.query('push_many', sql) as query:
+            cur = await self.con.executemany(sql, values)
+            rowcount = query.rows = cur.rowcount
+            await cur.close()
+        return rowcount
+
+
+class ConnectionPool:
+    """ Pool of long-lived aiosqlite connections to one database file.
+
+        Connections are opened lazily up to :size:, handed out one
+        coroutine at a time and returned to the pool afterwards. A
+        connection that has been idle for longer than the health check
+        interval is probed with SELECT 1 before it is reused and replaced if
+        the probe fails or times out. A connection whose query fails with
+        anything but an SQLite error is replaced when it is released.
+
+        The pool only reads, all writes go through the Writer. A :readonly:
+        pool opens its connections with mode=ro, as the shared pools do.
+    """
+    def __init__(self, db_filename: str, size: int = POOL_SIZE,
+                 readonly: bool = False) -> None:
+        """ Initialise the pool, no connection is opened yet. """
+        self.database = db_filename
+        self.size = size
+        self.readonly = readonly
+        self.opened = 0
+        self._idle = []
+        self._available = asyncio.Semaphore(size)
+        self._closed = False
+
+    async def acquire(self):
+        """ Take a connection from the pool, opening one if needed.
+
+            Returns:
+                :con: aiosqlite.Connection
+                    connection reserved for the caller until release.
+
+            Raises:
+                RuntimeError, if the pool has been closed.
+        """
+        if self._closed:
+            raise RuntimeError(f'Connection pool {self.database} is closed.')
+
+        await self._available.acquire()
+        try:
+            while self._idle:
+                con, released = self._idle.pop()
+                if await self._healthy(con, released):
+                    return con
+                await self._discard(con)
+            return await self._open()
+        except BaseException:
+            self._available.release()
+            raise
+
+    async def release(self, con, discard: bool = False) -> None:
+        """ Return a connection to the pool.
+
+            Parameters:
+                :con: aiosqlite.Connection, required
+                    connection obtained from acquire.
+                :discard: bool, optional
+                    close the connection instead of reusing it.
+        """
+        try:
+            if discard or self._closed:
+                await self._discard(con)
+            else:
+                self._idle.append((con, time.monotonic()))
+        finally:
+            self._available.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        """ Context manager that acquires and releases a connection. """
+        con = await self.acquire()
+        discard = False
+        try:
+            yield con
+        except BaseException as exc:
+            # SQL errors leave the connection usable, anything else, like a
+            # closed connection, may not.
+            discard = not isinstance(exc, sqlite3.Error)
+            try:
+                if not discard and con.in_transaction:
+                    await con.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            await self.release(con, discard)
+
+    async def read(self, sql: str, values=None) -> list:
+        """ Perform a SQL Query that reads from the database.
+
+            Params:
+                sql: str, required
+                    sql part of query with optional named colon parameters.
+                values: dict or tuple, optional
+                    dictionary that maps named colon parameter to value.
+        """
+        if values is None:
+            values = dict()
+
+        with metrics.query('read', sql) as query:
+            async with self.connection() as con:
+                res = list(await con.execute_fetchall(sql, values))
+            query.rows = len(res)
+        return res
+
+    async def close(self) -> None:
+        """ Close all idle connections and refuse new acquisitions.
+
+            Connections that are in use are closed when they are released.
+        """
+        self._closed = True
+        while self._idle:
+            con, _released = self._idle.pop()
+            await self._discard(con)
+
+    async def _open(self):
+        if self.readonly:
+            uri = f'{Path(self.database).resolve().as_uri()}?mode=ro'
+            con = connect(uri, uri=True, timeout=BUSY_TIMEOUT,
+                          cached_statements=CACHED_STATEMENTS)
+        else:
+            con = connect(self.database, timeout=BUSY_TIMEOUT,
+                          cached_statements=CACHED_STATEMENTS)
+        # Never let a forgotten pool keep the interpreter alive at exit.
+        con.daemon = True
+        await con
+        self.opened += 1
+        return con
+
+    async def _discard(self, con) -> None:
+        self.opened -= 1
+        try:
+            await con.close()
+        except Exception:
+            pass
+
+    async def _healthy(self, con, released: float) -> bool:
+        if time.monotonic() - released < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            await asyncio.wait_for(con.execute_fetchall("SELECT 1"),
+                                   HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+
+class _Unit:
+    """ One transaction submitted to a Writer. """
+    def __init__(self, loop) -> None:
+        self.submitted = time.monotonic()
+        self.granted = loop.create_future()
+        self.done = loop.create_future()
+        self.committed = loop.create_future()
+
+
+class Writer:
+    """ Single writer task that owns the only write connection of a database.
+
+        Callers submit a unit of work with transaction() and await its
+        commit. The writer runs units one after another, each inside its own
+        SAVEPOINT, so a failing unit is rolled back without touching the
+        others. Units that arrive while a batch runs, or within :window:
+        seconds of its first unit, join that batch and are committed
+        together: one BEGIN IMMEDIATE ... COMMIT and one fsync per batch
+        (group commit). The writer switches the database to JOURNAL_MODE
+        (write-ahead logging), so readers keep reading the last committed
+        state while a batch runs and commits.
+
+        Attributes:
+            :units: int
+                units that were committed.
+            :failed: int
+                units that were rolled back.
+            :commits: int
+                batches that were committed.
+            :commit_seconds: float
+                time spent in COMMIT.
+            :latency_seconds: float
+                time from submitting a unit until its commit, summed.
+            :latency_max: float
+                longest time from submitting a unit until its commit.
+    """
+    def __init__(self, db_filename: str, window: float = COMMIT_WINDOW,
+                 batch_size: int = COMMIT_BATCH_SIZE) -> None:
+        """ Initialise the writer, the connection and task start lazily. """
+        self.database = db_filename
+        self.window = window
+        self.batch_size = batch_size
+        self.units = 0
+        self.failed = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.latency_seconds = 0.0
+        self.latency_max = 0.0
+        self.started = time.monotonic()
+        self._con = None
+        self._queue = None
+        self._task = None
+        self._closed = False
+
+    @asynccontextmanager
+    async def transaction(self):
+        """ Context manager that runs its statements on the write connection.
+
+            The block runs inside its own savepoint of the current batch.
+            Leaving the block waits until the batch is committed, so the
+            changes are durable when the block returns.
+
+            Returns:
+                :txn: Transaction
+                    unit of work with read, push and push_many methods.
+
+            Raises:
+                RuntimeError, if the writer has been closed.
+        """
+        if self._closed:
+            raise RuntimeError(f'Writer {self.database} is closed.')
+        if self._task is None:
+            self._start()
+
+        unit = _Unit(asyncio.get_running_loop())
+        self._queue.put_nowait(unit)
+        try:
+            txn = await unit.granted
+        except BaseException as exc:
+            # Cancelled after the grant: let the writer roll the unit back.
+            if not unit.granted.cancel() and not unit.granted.exception():
+                unit.done.set_result(exc)
+            raise
+
+        try:
+            yield txn
+        except BaseException as exc:
+            unit.done.set_result(exc)
+            raise
+        unit.done.set_result(None)
+        await unit.committed
+
+    async def push(self, sql: str, values=None) -> int:
+        """ Perform a SQL Query that alters the database as its own unit.
+
+            Returns:
+                :rowcount: int
+                    amount of rows the statement changed.
+        """
+        async with self.transaction() as txn:
+            return await txn.push(sql, values)
+
+    def stats(self) -> dict:
+        """ Get the throughput and commit latency counters of the writer. """
+        elapsed = time.monotonic() - self.started
+        return {
+            'units': self.units,
+            'failed': self.failed,
+            'commits': self.commits,
+            'units_per_commit': self.units / self.commits
+            if self.commits else 0.0,
+            'units_per_second': self.units / elapsed if elapsed else 0.0,
+            'commit_seconds_mean': self.commit_seconds / self.commits
+            if self.commits else 0.0,
+            'latency_seconds_mean': self.latency_seconds / self.units
+            if self.units else 0.0,
+            'latency_seconds_max': self.latency_max,
+        }
+
+    async def close(self) -> None:
+        """ Finish the queued units, then close the write connection. """
+        self._closed = True
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        if self._con is not None:
+            await self._con.close()
+            self._con = None
+
+    def _start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            unit = await self._queue.get()
+            if unit is None:
+                return
+            batch = []
+            try:
+                start = await self._batch(unit, batch)
+            except Exception as exc:
+                # Never let one broken batch stop the writer.
+                await self._abort(batch, exc)
+                continue
+            self._committed(batch, start)
+
+    async def _batch(self, unit: _Unit, batch: list) -> float:
+        batch.append(unit)
+        if self._con is None:
+            self._con = connect(self.database, isolation_level=None,
+                                timeout=BUSY_TIMEOUT,
+                                cached_statements=CACHED_STATEMENTS)
+            self._con.daemon = True
+            await self._con
+            await self._con.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        await self._con.execute("BEGIN IMMEDIATE")
+
+        deadline = asyncio.get_running_loop().time() + self.window
+        while True:
+            if not await self._apply(unit):
+                batch.pop()
+            if len(batch) >= self.batch_size:
+                break
+            unit = await self._next(deadline)
+            if unit is None:
+                break
+            batch.append(unit)
+
+        start = time.monotonic()
+        await self._con.execute("COMMIT")
+        return start
+
+    async def _abort(self, batch: list, exc: Exception) -> None:
+        if self._con is not None and not await self._rollback():
+            # The connection failed to open or set up, or is stuck: the
+            # next batch opens a fresh one.
+            con, self._con = self._con, None
+            try:
+                await con.close()
+            except Exception:
+                pass
+        self.failed += len(batch)
+        for pending in batch:
+            if not pending.granted.done():
+                # The caller never got the unit, it only awaits the grant.
+                pending.granted.set_exception(exc)
+                pending.committed.cancel()
+            elif not pending.committed.done():
+                pending.committed.set_exception(exc)
+
+    async def _rollback(self) -> bool:
+        try:
+            if self._con.in_transaction:
+                await self._con.execute("ROLLBACK")
+                return True
+        except Exception:
+            pass
+        return False
+
+    def _committed(self, batch: list, start: float) -> None:
+        now = time.monotonic()
+        self.commits += 1
+        self.commit_seconds += now - start
+        for unit in batch:
+            latency = now - unit.submitted
+            self.units += 1
+            self.latency_seconds += latency
+            self.latency_max = max(self.latency_max, latency)
+            if not unit.committed.done():
+                unit.committed.set_result(None)
+
+    async def _next(self, deadline: float):
+        try:
+            unit = self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                return None
+            try:
+                unit = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if unit is None:
+            # Closing, commit this batch first and stop afterwards.
+            self._queue.put_nowait(None)
+        return unit
+
+    async def _apply(self, unit: _Unit) -> bool:
+        if unit.granted.cancelled():
+            return False
+        await self._con.execute("SAVEPOINT unit")
+        unit.granted.set_result(Transaction(self._con))
+        exc = await unit.done
+        if exc is None:
+            await self._con.execute("RELEASE unit")
+            return True
+        await self._con.execute("ROLLBACK TO unit")
+        await self._con.execute("RELEASE unit")
+        self.failed += 1
+        return False
+
+
+def get_pool(db_filename: str, size: int = None) -> ConnectionPool:
+    """ Get the shared read-only connection pool of a database file.
+
+        The pool is created on first use, all later callers that use the
+        same database file share it.
+
+        Params:
+            db_filename: str, required
+                filename of the database for aiosqlite to connect to.
+            size: int, optional
+                maximum amount of connections (default: DATABASE_POOL_SIZE
+                environment variable or POOL_SIZE).
+    """
+    pool = _pools.get(db_filename)
+    if pool is None or pool._closed:
+        if size is None:
+            size = int(os.getenv('DATABASE_POOL_SIZE', POOL_SIZE))
+        pool = ConnectionPool(db_filename, size, readonly=True)
+        _pools[db_filename] = pool
+    return pool
+
+
+def get_writer(db_filename: str, window: float = None) -> Writer:
+    """ Get the shared writer of a database file.
+
+        Params:
+            db_filename: str, required
+                filename of the database for aiosqlite to connect to.
+            window: float, optional
+                seconds a batch waits for more units (default:
+                DATABASE_COMMIT_WINDOW environment variable or COMMIT_WINDOW).
+    """
+    writer = _writers.get(db_filename)
+    if writer is None or writer._closed:
+        if window is None:
+            window = float(os.getenv('DATABASE_COMMIT_WINDOW', COMMIT_WINDOW))
+        writer = Writer(db_filename, window)
+        _writers[db_filename] = writer
+    return writer
+
+
+async def close_pools() -> None:
+    """ Gracefully close every shared writer and connection pool. """
+    while _writers:
+        _filename, writer = _writers.popitem()
+        await writer.close()
+    while _pools:
+        _filename, pool = _pools.popitem()
+        await pool.close()
+
 
 async def read_from_db(db_filename: str, sql: str, values=None) -> list:
     """ Perform a SQL Query that reads from the database.
@@ -29,22 +568,7 @@ async def read_from_db(db_filename: str, sql: str, values=None) -> list:
             values: dict or tuple, optional
                 dictionary that maps named colon parameter to value.
     """
-    if values is None:
-        values = dict()
-
-    con = await connect(db_filename)
-    cur = await con.cursor()
-
-    await cur.execute(sql, values)
-    await con.commit()
-
-    res = await cur.fetchall()
-    res = [line for line in res]
-
-    await cur.close()
-    await con.close()
-
-    return res
+    return await get_pool(db_filename).read(sql, values)
 
 
 async def push_to_db(db_filename: str, sql: str, values=None) -> None:
@@ -62,14 +586,4 @@ async def push_to_db(db_filename: str, sql: str, values=None) -> None:
             values: dict or tuple, optional
                 dictionary that maps named colon parameter to value.
     """
-    if values is None:
-        values = dict()
-
-    con = await connect(db_filename)
-    cur = await con.cursor()
-
-    await cur.execute(sql, values)
-    await con.commit()
-
-    await cur.close()
-    await con.close()
+    await get_writer(db_filename).push(sql, values)
@@ -6,25 +6,284 @@ Project:  Minion Meister Discord Bot
 Date:     July 24th 2022
 
 Summary:
+- Web server that runs on the event loop of the bot (aiohttp).
+- Keep alive endpoint.
+- Health endpoint with the gateway latency and a timed database probe.
+- Prometheus /metrics endpoint, with the stats of the database writers and
+  the guild cache.
+- Read-only JSON API of the participants, counts and history of a guild,
+  with a per-guild ETag so unchanged guilds are answered with 304.
 - [TODO]
 """
 
-from threading import Thread
+import asyncio
+import functools
+import math
+import os
+import time
 
-from flask import Flask
+from aiohttp import web
 
-app = Flask('')
+import error
+import metrics
+import minion_meister
 
+HOST = '0.0.0.0'
+PORT = 8080
+PROBE_TIMEOUT = 1.0
+MAX_PAGE_SIZE = 100
 
-@app.route('/')
-def home():
-    return "I'm alive"
+# (key, kind, documentation) of the exported stats of every writer.
+WRITER_STATS = (
+    ('units', 'counter', 'Units committed by the database writer.'),
+    ('failed', 'counter', 'Units rolled back by the database writer.'),
+    ('commits', 'counter', 'Batches committed by the database writer.'),
+    ('units_per_second', 'gauge',
+     'Units committed per second since the writer started.'),
+    ('units_per_commit', 'gauge', 'Mean amount of units per batch.'),
+    ('commit_seconds_mean', 'gauge', 'Mean duration of a COMMIT.'),
+    ('latency_seconds_mean', 'gauge',
+     'Mean time from submitting a unit until its commit.'),
+    ('latency_seconds_max', 'gauge',
+     'Longest time from submitting a unit until its commit.'),
+)
+# (key, kind, documentation) of the exported stats of the guild cache.
+CACHE_STATS = (
+    ('hits', 'counter', 'Guild lookups served from the cache.'),
+    ('misses', 'counter', 'Guild lookups that missed the cache.'),
+    ('evictions', 'counter', 'Guilds evicted from the cache.'),
+    ('guilds', 'gauge', 'Guilds in the cache.'),
+    ('size', 'gauge', 'Maximum amount of guilds in the cache.'),
+    ('hit_rate', 'gauge', 'Share of guild lookups served from the cache.'),
+)
 
+# Part of every ETag, so tags of an earlier process never match.
+BOOT = f'{time.time_ns():x}'
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
 
+class WebServer:
+    """ HTTP endpoints of the bot, served on the event loop of the bot. """
+    def __init__(self, bot) -> None:
+        """ Initialise the endpoints of bot.
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+            Parameters:
+                :bot: commands.Bot, required
+                    bot whose health is reported, its MinionMeister serves
+                    the records and is probed.
+        """
+        self.bot = bot
+        self.MM = bot.MM
+        self.registry = self.stats_registry()
+
+    def stats_registry(self) -> metrics.Registry:
+        """ Registry of the writer and cache stats of the MinionMeister. """
+        registry = metrics.Registry()
+        for key, kind, documentation in WRITER_STATS:
+            suffix = '_total' if kind == 'counter' else ''
+            registry.register(metrics.Collected(
+                f'minion_meister_writer_{key}{suffix}', documentation,
+                functools.partial(self.writer_stats, key), ('database',),
+                kind))
+        for key, kind, documentation in CACHE_STATS:
+            suffix = '_total' if kind == 'counter' else ''
+            registry.register(metrics.Collected(
+                f'minion_meister_cache_{key}{suffix}', documentation,
+                functools.partial(self.cache_stats, key), (), kind))
+        return registry
+
+    def writer_stats(self, key: str) -> list:
+        """ Get one stat of the writer of every shard, by database file. """
+        # The memory engine has no writers.
+        writers = getattr(self.MM.storage, 'writers', [])
+        return [((os.path.basename(writer.database),), writer.stats()[key])
+                for writer in writers]
+
+    def cache_stats(self, key: str) -> list:
+        """ Get one stat of the guild cache. """
+        return [((), self.MM.cache.stats()[key])]
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response(text="I'm alive")
+
+    async def health(self, request: web.Request) -> web.Response:
+        """ Report the gateway latency of the bot and probe the database.
+
+            Responds 503 when the bot is closed or the probe fails or takes
+            longer than PROBE_TIMEOUT seconds.
+        """
+        latency = self.bot.latency
+        if math.isnan(latency) or math.isinf(latency):
+            latency = None
+        report = {
+            'status': 'ok',
+            'gateway_latency_seconds': latency,
+            'database': 'ok',
+            'database_seconds': None,
+        }
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.MM.ping(), PROBE_TIMEOUT)
+        except Exception as exc:
+            report['status'] = 'error'
+            report['database'] = f'{type(exc).__name__}: {exc}'
+        report['database_seconds'] = time.perf_counter() - start
+        if self.bot.is_closed():
+            report['status'] = 'error'
+        status = 200 if report['status'] == 'ok' else 503
+        return web.json_response(report, status=status)
+
+    async def prometheus_metrics(self, request: web.Request) -> web.Response:
+        """ Expose the database, cache and command metrics to Prometheus. """
+        body = metrics.REGISTRY.render() + self.registry.render()
+        return web.Response(body=body,
+                            headers={'Content-Type': metrics.CONTENT_TYPE})
+
+    def etag(self, server_id: int) -> str:
+        """ Get the ETag of the records of a guild.
+
+            The tag changes with every change this process commits to the
+            guild, changes made by other processes (backup.py, reconcile.py)
+            show up after a restart.
+        """
+        return f'"{BOOT}-{server_id}-{self.MM.cache.version(server_id)}"'
+
+    def not_modified(self, request: web.Request, etag: str) -> bool:
+        """ Check if the If-None-Match header of request matches etag. """
+        header = request.headers.get('If-None-Match')
+        if header is None:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == etag
+                                  for tag in tags)
+
+    async def guild_json(self, request: web.Request, read) -> web.Response:
+        """ Respond with the JSON that read gets for the requested guild.
+
+            Responds 304 without calling read if the client already has
+            the current version of the guild.
+        """
+        try:
+            server_id = int(request.match_info['guild'])
+        except ValueError:
+            raise web.HTTPBadRequest(text='guild must be an integer')
+        # Tag before reading: a change committed in between makes the next
+        # request miss and read again, it never hides the change.
+        etag = self.etag(server_id)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self.not_modified(request, etag):
+            return web.Response(status=304, headers=headers)
+        body = await read(server_id)
+        return web.json_response(body, headers=headers)
+
+    async def participants(self, request: web.Request) -> web.Response:
+        """ List the names of the participants of a guild. """
+        async def read(server_id):
+            try:
+                names = await self.MM.show_participants(server_id)
+            except error.NoParticipantsError:
+                names = []
+            return {'guild': server_id, 'participants': names}
+        return await self.guild_json(request, read)
+
+    async def counts(self, request: web.Request) -> web.Response:
+        """ List how often participants became Minion Meister, highest
+            first. The limit query parameter keeps only the top entries.
+        """
+        limit = self.integer(request, 'limit')
+        if limit is not None and limit < 1:
+            raise web.HTTPBadRequest(text='limit must be at least 1')
+
+        async def read(server_id):
+            try:
+                names, count = await self.MM.show_count(server_id, limit)
+            except error.NoMinionMeisterError:
+                names, count = (), ()
+            return {'guild': server_id,
+                    'counts': [{'name': name, 'count': n}
+                               for name, n in zip(names, count)]}
+        return await self.guild_json(request, read)
+
+    async def history(self, request: web.Request) -> web.Response:
+        """ Get one page of the history of a guild, newest first.
+
+            The size query parameter sets the page size. The next (older)
+            and previous (newer) pages are requested by passing the cursor
+            from the response as the before or after query parameter.
+        """
+        size = self.integer(request, 'size') or minion_meister.HISTORY_PAGE
+        size = max(1, min(size, MAX_PAGE_SIZE))
+        before = self.cursor(request, 'before')
+        after = self.cursor(request, 'after')
+
+        async def read(server_id):
+            try:
+                page = await self.MM.history_page(server_id, size,
+                                                  before, after)
+            except error.NoMinionMeisterError:
+                page = []
+            return {
+                'guild': server_id,
+                'history': [{'id': record_id, 'name': name, 'date': date}
+                            for record_id, name, date in page],
+                'before': f'{page[-1][2]}:{page[-1][0]}' if page else None,
+                'after': f'{page[0][2]}:{page[0][0]}' if page else None,
+            }
+        return await self.guild_json(request, read)
+
+    @staticmethod
+    def integer(request: web.Request, name: str):
+        value = request.query.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise web.HTTPBadRequest(text=f'{name} must be an integer')
+
+    @staticmethod
+    def cursor(request: web.Request, name: str):
+        value = request.query.get(name)
+        if value is None:
+            return None
+        date, _sep, record_id = value.rpartition(':')
+        try:
+            return date, int(record_id)
+        except ValueError:
+            raise web.HTTPBadRequest(text=f'{name} must be date:id')
+
+    def create_app(self) -> web.Application:
+        """ Create the web application with all endpoints. """
+        app = web.Application()
+        app.router.add_get('/', self.home)
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/metrics', self.prometheus_metrics)
+        app.router.add_get('/api/guilds/{guild}/participants',
+                           self.participants)
+        app.router.add_get('/api/guilds/{guild}/counts', self.counts)
+        app.router.add_get('/api/guilds/{guild}/history', self.history)
+        return app
+
+
+async def start(bot, host: str = HOST, port: int = None) -> web.AppRunner:
+    """ Serve the web application on the running event loop.
+
+        Parameters:
+            :bot: commands.Bot, required
+                bot whose health is reported.
+            :host: str, optional
+                address to listen on (default: HOST).
+            :port: int, optional
+                port to listen on (default: WEB_PORT environment variable
+                or PORT).
+
+        Returns:
+            :runner: web.AppRunner
+                runner to clean up when the bot shuts down.
+    """
+    if port is None:
+        port = int(os.getenv('WEB_PORT', PORT))
+    app = WebServer(bot).create_app()
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -8,6 +8,12 @@ Date:     July 24th 2022
 Summary:
 - Create database minion_meister.
 - Create tables servers, users, history.
+- Create table schedules of the scheduled rolls.
+- Triggers on history keep the counts table in step.
+- Versioned migrations: every migration runs once, in order, in its own
+  transaction and is recorded in the schema_version table.
+- main.sh and test.sh run the migrations at startup.
+- Every shard file is migrated when DATABASE_SHARDS is set.
 - [TODO]
 """
 
@@ -20,6 +26,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 DB_FILE = os.getenv('DATABASE_FILE')
+DB_SHARDS = int(os.getenv('DATABASE_SHARDS', 1))
 
 
 def argparser():
@@ -41,7 +48,6 @@ async def create_users_table(con, cur) -> None:
         "PRIMARY KEY (id, server)"
         ");"
     )
-    await con.commit()
 
 
 async def create_history_table(con, cur) -> None:
@@ -55,7 +61,6 @@ async def create_history_table(con, cur) -> None:
         "FOREIGN KEY (user) REFERENCES users(id)"
         ");"
     )
-    await con.commit()
 
 
 async def create_counts_table(con, cur) -> None:
@@ -69,7 +74,6 @@ async def create_counts_table(con, cur) -> None:
         "FOREIGN KEY (user) REFERENCES users(id)"
         ");"
     )
-    await con.commit()
 
 
 async def create_admins_table(con, cur) -> None:
@@ -82,25 +86,185 @@ async def create_admins_table(con, cur) -> None:
         "FOREIGN KEY (user) REFERENCES users(id)"
         ");"
     )
+
+
+async def create_tables(con, cur) -> None:
+    """ Migration 1: create the tables of the first release. """
+    await create_users_table(con, cur)
+    await create_history_table(con, cur)
+    await create_counts_table(con, cur)
+    await create_admins_table(con, cur)
+
+
+async def create_indexes(con, cur) -> None:
+    """ Migration 2: add indexes so no hot query scans a whole table.
+
+        - users(server, name, id): list a guild's participants by name.
+        - history(server, date, user): recent history of a guild, newest
+          first, covering the join on user.
+        - counts(server, count, user): counts of a guild, highest first.
+    """
+    await cur.execute(
+        "CREATE INDEX IF NOT EXISTS users_server_name "
+        "ON users (server, name, id);"
+    )
+    await cur.execute(
+        "CREATE INDEX IF NOT EXISTS history_server_date "
+        "ON history (server, date, user);"
+    )
+    await cur.execute(
+        "CREATE INDEX IF NOT EXISTS counts_server_count "
+        "ON counts (server, count, user);"
+    )
+
+
+async def create_history_page_index(con, cur) -> None:
+    """ Migration 3: order the history index on (date, id) for paging.
+
+        history(server, date, id, user) serves the keyset pages of a
+        guild's history in both directions without sorting, and still
+        covers the join on user. It replaces history(server, date, user).
+    """
+    await cur.execute(
+        "CREATE INDEX IF NOT EXISTS history_server_date_id "
+        "ON history (server, date, id, user);"
+    )
+    await cur.execute("DROP INDEX IF EXISTS history_server_date;")
+
+
+async def create_count_triggers(con, cur) -> None:
+    """ Migration 4: keep counts in step with history using triggers.
+
+        Every insert into history adds one to the count of its user, every
+        deleted record subtracts one, inside the statement that changed
+        history. Counts that drifted before this migration are fixed with
+        app/reconcile.py.
+    """
+    await cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS history_count_insert "
+        "AFTER INSERT ON history "
+        "BEGIN "
+        "INSERT INTO counts (server, user, count) "
+        "VALUES (NEW.server, NEW.user, 1) "
+        "ON CONFLICT (server, user) DO UPDATE SET count = count + 1; "
+        "END;"
+    )
+    await cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS history_count_delete "
+        "AFTER DELETE ON history "
+        "BEGIN "
+        "UPDATE counts SET count = count - 1 "
+        "WHERE server = OLD.server AND user = OLD.user; "
+        "END;"
+    )
+
+
+async def create_schedules_table(con, cur) -> None:
+    """ Migration 5: create the table of the scheduled rolls.
+
+        Every server has at most one schedule: a roll in channel on a
+        weekday (0 is Monday) at a time (HH:MM), both in UTC. next_run is
+        the UTC datetime (YYYY-MM-DD HH:MM) of the next roll, a next_run
+        in the past was missed and is caught up when the bot starts.
+    """
+    await cur.execute(
+        "CREATE TABLE IF NOT EXISTS schedules("
+        "server INTEGER PRIMARY KEY, "
+        "channel INTEGER NOT NULL, "
+        "weekday INTEGER NOT NULL, "
+        "time TEXT(5) NOT NULL, "
+        "mode TEXT(8), "
+        "next_run TEXT(16) NOT NULL"
+        ");"
+    )
+
+
+# Ordered up-migrations, the version of a migration is its position + 1.
+# Never change or reorder a released migration, append a new one instead.
+MIGRATIONS = [
+    create_tables,
+    create_indexes,
+    create_history_page_index,
+    create_count_triggers,
+    create_schedules_table,
+]
+
+
+async def create_schema_version_table(con, cur) -> None:
+    """ Create the table that records the applied migrations. """
+    await cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version("
+        "version INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied TEXT NOT NULL DEFAULT (DATETIME())"
+        ");"
+    )
     await con.commit()
 
 
+async def get_schema_version(cur) -> int:
+    """ Get the version of the last applied migration (0 if none). """
+    await cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    row = await cur.fetchone()
+    return row[0]
+
+
+async def migrate(con, cur) -> list:
+    """ Apply all migrations that have not been applied yet.
+
+        Returns:
+            :applied: list
+                names of the migrations that were applied.
+    """
+    await create_schema_version_table(con, cur)
+    version = await get_schema_version(cur)
+
+    applied = []
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        await cur.execute("BEGIN IMMEDIATE")
+        try:
+            await migration(con, cur)
+            await cur.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (number, migration.__name__)
+            )
+            await con.commit()
+        except BaseException:
+            await con.rollback()
+            raise
+        applied.append(migration.__name__)
+    return applied
+
+
+def shard_filenames(db_filename: str, shards: int) -> list:
+    """ Get the filenames of the shards of a database.
+
+        Keep in step with app/sharding.py.
+    """
+    if shards <= 1:
+        return [db_filename]
+    stem, ext = os.path.splitext(db_filename)
+    return [f'{stem}.shard{index}{ext}' for index in range(shards)]
+
+
 async def main():
     args = argparser()
 
-    if args.delete:
-        os.remove(DB_FILE)
+    for filename in shard_filenames(DB_FILE, DB_SHARDS):
+        if args.delete and os.path.exists(filename):
+            os.remove(filename)
 
-    con = await aiosqlite.connect(DB_FILE)
-    cur = await con.cursor()
+        con = await aiosqlite.connect(filename)
+        cur = await con.cursor()
 
-    await create_users_table(con, cur)
-    await create_history_table(con, cur)
-    await create_counts_table(con, cur)
-    await create_admins_table(con, cur)
+        # Readers and the writer of the bot never block each other in WAL.
+        await cur.execute("PRAGMA journal_mode=WAL")
+
+        for name in await migrate(con, cur):
+            print(f'applied migration {name} to {filename}')
 
-    await cur.close()
-    await con.close()
+        await cur.close()
+        await con.close()
 
 
 if __name__ == "__main__":